@@ -0,0 +1,117 @@
+"""Large-maze benchmarks: maze generation, distance fields and processor overhead per step.
+
+Run from the src directory:
+    python -m benchmarks.bench_maze --size 1000 --algorithm binary_tree
+    python -m benchmarks.bench_maze --size 200 --steps 5000
+
+The agent is a scripted client that replies with the optimal move, so the
+step timings measure the processor and environment overhead only. Its
+efficiency (optimal moves / moves taken) is 1.0 by construction. Real agents
+report the same metric through MazeEnvironment.efficiency().
+"""
+from typing import List
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from examples.maze_solver.maze import MazeEnvironment, GENERATORS
+from examples.maze_solver.main import initialize_processor, is_goal_achieved
+from benchmarks.bench_processor import _Namespace
+
+MOVE_COMMAND_ID = 1
+
+
+class ScriptedMazeClient:
+    """Async client stub that answers every request with the next move of a fixed path"""
+
+    def __init__(self, path: List[str]):
+        self.path = path
+        self.calls = 0
+
+        async def create(**kwargs):
+            direction = self.path[min(self.calls, len(self.path) - 1)]
+            self.calls += 1
+            content = json.dumps({
+                "analysis": {"current_situation": "", "history_consideration": "",
+                             "reasoning": f"The exit is closer to the {direction}"},
+                "action": {"command_id": MOVE_COMMAND_ID, "parameters": {"direction": direction}},
+            })
+            return _Namespace(
+                choices=[_Namespace(message=_Namespace(content=content, tool_calls=None))],
+                usage=_Namespace(prompt_tokens=0, completion_tokens=0, total_tokens=0,
+                                 prompt_tokens_details=None),
+            )
+
+        self.chat = _Namespace(completions=_Namespace(create=create))
+
+    async def close(self):
+        pass
+
+
+async def run_agent(env: MazeEnvironment, path: List[str], max_steps: int):
+    processor = await initialize_processor(
+        env, client=ScriptedMazeClient(path), ui_visibility=False,
+        background_summary=False, summary_interval=10 ** 9)
+    steps = 0
+    started = time.perf_counter()
+    while steps < max_steps:
+        await processor.step()
+        steps += 1
+        if is_goal_achieved(processor.execution_history):
+            break
+    elapsed = time.perf_counter() - started
+    stats = processor.get_stats()
+    await processor.aclose()
+    return steps, elapsed, stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000, help="Rooms per side of the generated maze")
+    parser.add_argument("--algorithm", choices=GENERATORS, default="backtracker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=2000, help="Maximum agent steps to run")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    env = MazeEnvironment.generate(args.size, args.size, seed=args.seed, algorithm=args.algorithm)
+    generated = time.perf_counter() - started
+    started = time.perf_counter()
+    bfs_env = MazeEnvironment(env.grid)
+    bfs = time.perf_counter() - started
+    started = time.perf_counter()
+    path = env.optimal_path()
+    solved = time.perf_counter() - started
+    height, width = env.grid.shape
+
+    print(f"{'grid':40s} {width} x {height}")
+    print(f"{'generate + distance field':40s} {generated * 1000:12.1f} ms")
+    print(f"{'distance field by BFS':40s} {bfs * 1000:12.1f} ms")
+    print(f"{'optimal path':40s} {solved * 1000:12.1f} ms ({len(path)} moves)")
+    if not (bfs_env.distances == env.distances).all():
+        print("Distance fields differ")
+        return 1
+
+    # The processor prints every prompt and reply
+    with contextlib.redirect_stdout(io.StringIO()):
+        steps, elapsed, stats = asyncio.run(run_agent(env, path, args.steps))
+    print(f"{'agent steps':40s} {steps:12d} ({steps / elapsed:.0f} steps/s)")
+    for span in ("prompt_build", "parse", "tool"):
+        if span in stats["spans"]:
+            print(f"{span + ' p50 / p99':40s} {stats['spans'][span]['p50'] * 1e6:9.1f} us / "
+                  f"{stats['spans'][span]['p99'] * 1e6:.1f} us")
+    if env.distance_to_exit() == 0:
+        print(f"{'efficiency':40s} {env.efficiency(steps):12.2f}")
+    else:
+        print(f"{'distance left':40s} {env.distance_to_exit():12d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""Micro-benchmarks for the hot paths of LLMProcessor.
+
+Run from the src directory:
+    python -m benchmarks.bench_processor --save baseline.json
+    python -m benchmarks.bench_processor --compare baseline.json
+
+All LLM calls go to an in-process fake client, so results measure only the
+processor's own overhead.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.llm_processor import LLMProcessor, ExecutionHistoryEntry
+from examples.coffee_maker.main import check_command_possibility, is_goal_achieved
+
+HISTORY_SIZES = [10, 100, 1_000, 10_000, 100_000]
+CATALOG_SIZES = [4, 50, 500]
+QUICK_HISTORY_SIZES = [10, 1_000]
+QUICK_CATALOG_SIZES = [4, 50]
+
+CANNED_REPLY = """Let me think about this.
+
+```json
+{
+  "analysis": {
+    "current_situation": "The machine is heating",
+    "history_consideration": "Power was turned on in the previous step",
+    "reasoning": "Waiting lets the machine reach the right temperature"
+  },
+  "action": {
+    "command_id": 0,
+    "parameters": {"reason": "heating", "wait_time": 60},
+    "expected_outcome": "Machine heated"
+  }
+}
+```"""
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class MockLLMClient:
+    """Async client stub that returns a canned completion immediately"""
+
+    def __init__(self, content: str = CANNED_REPLY):
+        response = _Namespace(
+            choices=[_Namespace(message=_Namespace(content=content, tool_calls=None))],
+            usage=_Namespace(prompt_tokens=0, completion_tokens=0, total_tokens=0,
+                             prompt_tokens_details=None),
+        )
+
+        async def create(**kwargs):
+            return response
+
+        self.chat = _Namespace(completions=_Namespace(create=create))
+
+    async def close(self):
+        pass
+
+
+def make_catalog(size: int) -> Dict[str, Any]:
+    """Synthetic functions catalog; id 0 is the coffee maker throttle command"""
+    functions = [{
+        "id": 0,
+        "name": "throttle",
+        "description": "Pause execution for the next step",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "reason": {"type": "string", "description": "Why to wait"},
+                "wait_time": {"type": "integer", "description": "Seconds to wait"}
+            },
+            "required": ["reason", "wait_time"]
+        }
+    }]
+    for i in range(1, size):
+        functions.append({
+            "id": i,
+            "name": f"command_{i}",
+            "description": f"Synthetic command number {i}",
+            "parameters": {
+                "value": {"type": "integer", "description": "A value", "required": True},
+                "label": {"type": "string", "description": "A label"}
+            }
+        })
+    return {"functions": functions}
+
+
+def make_history(size: int) -> List[ExecutionHistoryEntry]:
+    """Coffee maker style history: power on followed by throttles and other commands"""
+    start = datetime(2024, 1, 1)
+    history = [ExecutionHistoryEntry(
+        timestamp=start, command_id=1, command_name="power_coffee_machine",
+        parameters={"power": "on"}, result={"status": "success", "message": "Machine powered on"},
+        status="success", context="Turn the machine on first")]
+    for i in range(1, size):
+        history.append(ExecutionHistoryEntry(
+            timestamp=start + timedelta(seconds=i),
+            command_id=0,
+            command_name="throttle",
+            parameters={"reason": "heating", "wait_time": 1},
+            result={"status": "accepted"},
+            status="success",
+            context=f"Waiting for the machine to heat up, step {i}"))
+    return history
+
+
+def make_processor(tmp_dir: str, catalog_size: int, history: List[ExecutionHistoryEntry]) -> LLMProcessor:
+    functions_file = os.path.join(tmp_dir, f"functions_{catalog_size}.json")
+    goal_file = os.path.join(tmp_dir, "goal.yaml")
+    if not os.path.exists(functions_file):
+        with open(functions_file, "w") as f:
+            json.dump(make_catalog(catalog_size), f)
+    if not os.path.exists(goal_file):
+        with open(goal_file, "w") as f:
+            f.write('goal: "Make 2 cups of coffee"\nsuccess_criteria:\n  - "Brewing started"\n')
+
+    processor = LLMProcessor(functions_file, goal_file, client=MockLLMClient(),
+                             background_summary=False, summary_interval=10 ** 9)
+    for entry in history:
+        processor.execution_history.append(entry)
+
+    async def noop(params):
+        return {"status": "accepted"}
+
+    processor.register_function("throttle", noop)
+    return processor
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, repeat: int = 5) -> Dict[str, float]:
+    """Time a callable, returning per-call statistics in microseconds"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat or number >= 1_000_000:
+            break
+        number *= 2
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number * 1e6)
+    return {"median_us": statistics.median(samples), "min_us": min(samples), "calls": number * repeat}
+
+
+def run_benchmarks(history_sizes: List[int], catalog_sizes: List[int], min_time: float) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    loop = asyncio.new_event_loop()
+    quiet = io.StringIO()
+
+    def record(name: str, func: Callable[[], Any]):
+        results[name] = measure(func, min_time)
+        print(f"{name:55s} {results[name]['median_us']:12.2f} us")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        histories = {size: make_history(size) for size in history_sizes}
+
+        for catalog_size in catalog_sizes:
+            for history_size in history_sizes:
+                processor = make_processor(tmp_dir, catalog_size, histories[history_size])
+                record(f"generate_prompt[catalog={catalog_size},history={history_size}]",
+                       processor.generate_prompt)
+
+            processor = make_processor(tmp_dir, catalog_size, [])
+
+            def dispatch():
+                loop.run_until_complete(processor.execute_command(
+                    0, {"reason": "heating", "wait_time": 1}, "benchmark"))
+                # Keep the history from growing while measuring dispatch alone
+                processor.execution_history.clear()
+            record(f"execute_command[catalog={catalog_size}]", dispatch)
+
+            def next_action():
+                with contextlib.redirect_stdout(quiet):
+                    loop.run_until_complete(processor.get_next_action())
+                quiet.seek(0)
+                quiet.truncate()
+            record(f"get_next_action[catalog={catalog_size}]", next_action)
+
+        entry = histories[history_sizes[0]][-1]
+        processor = make_processor(tmp_dir, catalog_sizes[0], [])
+        record("_entry_to_dict", lambda: processor._entry_to_dict(entry))
+
+        for history_size in history_sizes:
+            # The processor's history keeps its index up to date, as in a real run
+            history = make_processor(tmp_dir, catalog_sizes[0], histories[history_size]).execution_history
+            record(f"check_command_possibility[add_coffee,history={history_size}]",
+                   lambda: check_command_possibility(history, "add_coffee"))
+            record(f"is_goal_achieved[history={history_size}]", lambda: is_goal_achieved(history))
+
+    loop.close()
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline_file: str, threshold: float) -> List[str]:
+    """Return the benchmarks that got slower than the baseline by more than threshold"""
+    with open(baseline_file) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        ratio = stats["median_us"] / baseline[name]["median_us"]
+        if ratio > threshold:
+            regressions.append(f"{name}: {baseline[name]['median_us']:.2f} us -> "
+                               f"{stats['median_us']:.2f} us ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Use small history and catalog sizes")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent per benchmark")
+    parser.add_argument("--save", help="Write results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="Compare results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        QUICK_HISTORY_SIZES if args.quick else HISTORY_SIZES,
+        QUICK_CATALOG_SIZES if args.quick else CATALOG_SIZES,
+        args.min_time,
+    )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "created": datetime.now().isoformat(),
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print("Performance regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No performance regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Cold-start benchmarks: importing core.llm_processor and creating processors.
+
+Run from the src directory:
+    python -m benchmarks.bench_startup --save startup.json
+    python -m benchmarks.bench_startup --compare startup.json
+
+Imports are timed in fresh interpreters. The run also fails if importing the
+processor loads one of the dependencies that are meant to be imported lazily.
+"""
+from datetime import datetime
+from typing import Dict, Any, List
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SRC_DIR)
+from benchmarks.bench_processor import MockLLMClient, compare, measure
+
+CONFIG_DIR = os.path.join(SRC_DIR, "examples", "coffee_maker", "config")
+# Only imported when a client, cache, display, pool or config file needs them
+LAZY_MODULES = ("yaml", "dotenv", "openai", "httpx", "flask", "sqlite3", "multiprocessing")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import core.llm_processor
+import_us = (time.perf_counter() - started) * 1e6
+lazy_loaded = [m for m in {lazy!r} if m in sys.modules]
+started = time.perf_counter()
+core.llm_processor.LLMProcessor({functions!r}, {goal!r}, client=object())
+init_us = (time.perf_counter() - started) * 1e6
+print(json.dumps({{"import_us": import_us, "init_us": init_us,
+                  "lazy_loaded": lazy_loaded}}))
+"""
+
+
+def run_cold(runs: int) -> Dict[str, Any]:
+    """Import the processor and create one processor in `runs` fresh interpreters"""
+    script = IMPORT_SCRIPT.format(
+        functions=os.path.join(CONFIG_DIR, "functions.json"),
+        goal=os.path.join(CONFIG_DIR, "goal.yaml"),
+        lazy=LAZY_MODULES,
+    )
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", script], cwd=SRC_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    return {
+        "import": {"median_us": statistics.median(s["import_us"] for s in samples),
+                   "min_us": min(s["import_us"] for s in samples), "calls": runs},
+        "first_processor": {"median_us": statistics.median(s["init_us"] for s in samples),
+                            "min_us": min(s["init_us"] for s in samples), "calls": runs},
+        "lazy_loaded": samples[0]["lazy_loaded"],
+    }
+
+
+def run_benchmarks(runs: int, min_time: float) -> Dict[str, Dict]:
+    from core.llm_processor import LLMProcessor
+
+    cold = run_cold(runs)
+    results = {
+        "import core.llm_processor (cold)": cold["import"],
+        "LLMProcessor() first in process": cold["first_processor"],
+    }
+    functions_file = os.path.join(CONFIG_DIR, "functions.json")
+    goal_file = os.path.join(CONFIG_DIR, "goal.yaml")
+    client = MockLLMClient()
+    results["LLMProcessor() with cached config"] = measure(
+        lambda: LLMProcessor(functions_file, goal_file, client=client), min_time)
+    for name, stats in results.items():
+        print(f"{name:55s} {stats['median_us']:12.2f} us")
+    return {"results": results, "lazy_loaded": cold["lazy_loaded"]}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters for the cold timings")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent per in-process benchmark")
+    parser.add_argument("--save", help="Write results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="Compare results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks(args.runs, args.min_time)
+    results = run["results"]
+    failures: List[str] = []
+    if run["lazy_loaded"]:
+        failures.append(f"importing core.llm_processor loaded {', '.join(run['lazy_loaded'])}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "created": datetime.now().isoformat(),
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        failures.extend(compare(results, args.compare, args.threshold))
+
+    if failures:
+        print("Startup regressions:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    if args.compare:
+        print("No startup regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
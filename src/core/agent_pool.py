@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import List, Optional, Callable, Any
+import asyncio
+import time
+
+from .llm_processor import LLMProcessor
+
+GoalPredicate = Callable[[Any], bool]
+
+
+@dataclass
+class EpisodeResult:
+    """Outcome of one agent episode run by the pool"""
+    name: str
+    processor: LLMProcessor
+    success: bool
+    steps: int
+    elapsed: float
+    error: Optional[str] = None
+
+
+@dataclass
+class _Episode:
+    name: str
+    processor: LLMProcessor
+    goal_predicate: Optional[GoalPredicate]
+    max_steps: int
+
+
+class AgentPool:
+    """Run many LLMProcessor episodes concurrently on one event loop.
+
+    Each episode is a step loop (get next action, execute it, check the goal).
+    An agent waiting on its LLM call simply yields to the others, so throughput
+    grows with concurrency until the provider becomes the bottleneck.
+    """
+
+    def __init__(self, max_concurrency: int = 10, close_processors: bool = True):
+        """
+        Args:
+            max_concurrency: Maximum number of episodes running at the same time
+            close_processors: Call processor.aclose() when an episode ends
+        """
+        self.max_concurrency = max_concurrency
+        self.close_processors = close_processors
+        self._episodes: List[_Episode] = []
+        self.total_steps = 0
+        self.elapsed = 0.0
+
+    def add(self, processor: LLMProcessor, goal_predicate: Optional[GoalPredicate] = None,
+            max_steps: int = 100, name: Optional[str] = None):
+        """Add an episode.
+
+        Args:
+            processor: Initialized processor with registered functions
+            goal_predicate: Called with the execution history after each step;
+                the episode stops once it returns True
+            max_steps: Step limit for the episode
+            name: Label for the result (default: "agent-<n>")
+        """
+        self._episodes.append(_Episode(
+            name=name or f"agent-{len(self._episodes)}",
+            processor=processor,
+            goal_predicate=goal_predicate,
+            max_steps=max_steps,
+        ))
+
+    async def _run_episode(self, episode: _Episode, semaphore: asyncio.Semaphore) -> EpisodeResult:
+        async with semaphore:
+            processor = episode.processor
+            started = time.perf_counter()
+            steps = 0
+            success = False
+            error = None
+            try:
+                while steps < episode.max_steps:
+                    await processor.step(episode.goal_predicate)
+                    steps += 1
+                    self.total_steps += 1
+                    if episode.goal_predicate and episode.goal_predicate(processor.execution_history):
+                        success = True
+                        break
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                if self.close_processors:
+                    await processor.aclose()
+            return EpisodeResult(
+                name=episode.name,
+                processor=processor,
+                success=success,
+                steps=steps,
+                elapsed=time.perf_counter() - started,
+                error=error,
+            )
+
+    async def run(self) -> List[EpisodeResult]:
+        """Run all added episodes and return their results in the order they were added"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        episodes, self._episodes = self._episodes, []
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._run_episode(e, semaphore) for e in episodes))
+        self.elapsed += time.perf_counter() - started
+        return list(results)
+
+    @property
+    def steps_per_second(self) -> float:
+        """Aggregate throughput over all runs of this pool"""
+        return self.total_steps / self.elapsed if self.elapsed else 0.0
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+import json
+import os
+import struct
+
+from .history_store import ExecutionHistoryEntry, entry_to_record, entry_from_record
+
+MAGIC = b"FLXCKPT1"
+# Record frame: kind (1 byte) + payload length (4 bytes), followed by the JSON payload
+_FRAME = struct.Struct("<BI")
+
+RECORD_ENTRY = 1
+RECORD_KNOWLEDGE = 2
+RECORD_RESET = 3
+
+
+class CheckpointError(ValueError):
+    """Raised when a file is not a processor checkpoint"""
+
+
+@dataclass
+class CheckpointState:
+    """Processor state read back from a checkpoint file"""
+    entries: List[ExecutionHistoryEntry] = field(default_factory=list)
+    best_practices: str = ""
+    steps_counter: int = 0
+    summary_mark: int = 0
+    # Length of the file up to the end of the last complete record
+    size: int = 0
+
+
+def _encode(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+class CheckpointWriter:
+    """Append-only checkpoint of a processor's history and knowledge.
+
+    Each write appends the history entries recorded since the previous write
+    and a small knowledge record, so the cost of a checkpoint is proportional
+    to the new steps rather than to the whole episode. The file is opened on
+    the first write: it is started afresh unless `resume()` was called first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._written = 0  # history entries already in the file
+        self._best_practices: Optional[str] = None
+        self._resume_size: Optional[int] = None
+
+    def resume(self, state: CheckpointState):
+        """Continue appending to an existing checkpoint that `state` was read from"""
+        self.close()
+        self._written = len(state.entries)
+        self._best_practices = state.best_practices
+        self._resume_size = state.size
+
+    def _open(self):
+        if self._resume_size is not None and os.path.exists(self.path):
+            self._file = open(self.path, "r+b")
+            # Drop a torn record so that new records stay readable
+            self._file.truncate(self._resume_size)
+            self._file.seek(self._resume_size)
+        else:
+            self._file = open(self.path, "wb")
+            self._file.write(MAGIC)
+
+    def _record(self, kind: int, payload: Any):
+        data = _encode(payload)
+        self._file.write(_FRAME.pack(kind, len(data)))
+        self._file.write(data)
+
+    def write(self, history: Sequence[ExecutionHistoryEntry], best_practices: str,
+              steps_counter: int, summary_mark: int):
+        """Append what changed since the previous write"""
+        if self._file is None:
+            self._open()
+        if len(history) < self._written:
+            # The history was cleared; the entries written so far no longer apply
+            self._record(RECORD_RESET, None)
+            self._written = 0
+        for entry in history[self._written:]:
+            self._record(RECORD_ENTRY, entry_to_record(entry))
+        self._written = len(history)
+
+        knowledge = {"steps_counter": steps_counter, "summary_mark": summary_mark}
+        if best_practices != self._best_practices:
+            knowledge["best_practices"] = best_practices
+            self._best_practices = best_practices
+        self._record(RECORD_KNOWLEDGE, knowledge)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_checkpoint(path: str) -> CheckpointState:
+    """Read a checkpoint file.
+
+    A truncated last record, left by a crash in the middle of a write, is
+    ignored: the state is the one of the last complete record.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise CheckpointError(f"Not a processor checkpoint: {path}")
+
+    state = CheckpointState(size=len(MAGIC))
+    offset = len(MAGIC)
+    while offset + _FRAME.size <= len(data):
+        kind, length = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        if start + length > len(data):
+            break
+        payload = json.loads(data[start:start + length])
+        offset = start + length
+        state.size = offset
+
+        if kind == RECORD_ENTRY:
+            state.entries.append(entry_from_record(payload))
+        elif kind == RECORD_KNOWLEDGE:
+            state.steps_counter = payload["steps_counter"]
+            state.summary_mark = payload["summary_mark"]
+            if "best_practices" in payload:
+                state.best_practices = payload["best_practices"]
+        elif kind == RECORD_RESET:
+            state.entries.clear()
+    return state
@@ -0,0 +1,253 @@
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+
+from .tool_executor import check_executor
+
+# Validator signature: (value, path) -> list of error messages
+Validator = Callable[[Any, str], List[str]]
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool))
+                         or (isinstance(v, float) and v.is_integer()),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, (list, tuple)),
+    "null": lambda v: v is None,
+}
+
+
+def normalize_parameters_schema(parameters: Optional[Dict]) -> Dict[str, Any]:
+    """Convert a command's parameters spec into a JSON schema object.
+
+    functions.json accepts either a JSON schema ({"type": "object", "properties": ...})
+    or a flat mapping of parameter name to spec with an optional "required": true flag.
+    """
+    if not parameters:
+        return {"type": "object", "properties": {}}
+    if parameters.get("type") == "object" and isinstance(parameters.get("properties"), dict):
+        return parameters
+
+    properties = {}
+    required = []
+    for name, spec in parameters.items():
+        spec = dict(spec) if isinstance(spec, dict) else {}
+        if spec.pop("required", False) is True:
+            required.append(name)
+        properties[name] = spec
+    schema: Dict[str, Any] = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile a JSON schema subset into a validator function.
+
+    Supported keywords: type, enum, minimum, maximum, exclusiveMinimum,
+    exclusiveMaximum, minLength, maxLength, properties, required,
+    additionalProperties (false), items, minItems, maxItems.
+    """
+    checks: List[Validator] = []
+    type_check: Optional[Validator] = None
+
+    types = schema.get("type")
+    if types is not None:
+        type_names = [types] if isinstance(types, str) else list(types)
+        type_checks = [_TYPE_CHECKS[name] for name in type_names if name in _TYPE_CHECKS]
+        expected = " or ".join(type_names)
+        if type_checks:
+            def check_type(value, path):
+                if any(check(value) for check in type_checks):
+                    return []
+                return [f"{path} must be {expected}"]
+            type_check = check_type
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value, path):
+            return [] if value in allowed else [f"{path} must be one of {allowed}"]
+        checks.append(check_enum)
+
+    bounds = [
+        ("minimum", lambda v, b: v >= b, "must be >="),
+        ("maximum", lambda v, b: v <= b, "must be <="),
+        ("exclusiveMinimum", lambda v, b: v > b, "must be >"),
+        ("exclusiveMaximum", lambda v, b: v < b, "must be <"),
+    ]
+    for keyword, compare, message in bounds:
+        if keyword in schema:
+            def check_bound(value, path, bound=schema[keyword], compare=compare, message=message):
+                if _TYPE_CHECKS["number"](value) and not compare(value, bound):
+                    return [f"{path} {message} {bound}"]
+                return []
+            checks.append(check_bound)
+
+    lengths = [("minLength", lambda n, b: n >= b, "at least"), ("maxLength", lambda n, b: n <= b, "at most")]
+    for keyword, compare, message in lengths:
+        if keyword in schema:
+            def check_length(value, path, bound=schema[keyword], compare=compare, message=message):
+                if isinstance(value, str) and not compare(len(value), bound):
+                    return [f"{path} must have {message} {bound} characters"]
+                return []
+            checks.append(check_length)
+
+    properties = schema.get("properties")
+    required = schema.get("required", [])
+    closed = schema.get("additionalProperties") is False
+    if properties or required or closed:
+        property_validators = {
+            name: compile_schema(spec) for name, spec in (properties or {}).items()
+        }
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"{path}.{name} is required" for name in required if name not in value]
+            for name, item in value.items():
+                validator = property_validators.get(name)
+                if validator is not None:
+                    errors.extend(validator(item, f"{path}.{name}"))
+                elif closed:
+                    errors.append(f"{path}.{name} is not allowed")
+            return errors
+        checks.append(check_object)
+
+    if "items" in schema and isinstance(schema["items"], dict):
+        item_validator = compile_schema(schema["items"])
+
+        def check_items(value, path):
+            if not isinstance(value, (list, tuple)):
+                return []
+            errors = []
+            for i, item in enumerate(value):
+                errors.extend(item_validator(item, f"{path}[{i}]"))
+            return errors
+        checks.append(check_items)
+
+    item_counts = [("minItems", lambda n, b: n >= b, "at least"), ("maxItems", lambda n, b: n <= b, "at most")]
+    for keyword, compare, message in item_counts:
+        if keyword in schema:
+            def check_count(value, path, bound=schema[keyword], compare=compare, message=message):
+                if isinstance(value, (list, tuple)) and not compare(len(value), bound):
+                    return [f"{path} must have {message} {bound} items"]
+                return []
+            checks.append(check_count)
+
+    def validate(value, path):
+        # Further checks are meaningless once the type is wrong
+        if type_check is not None:
+            errors = type_check(value, path)
+            if errors:
+                return errors
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+        return errors
+
+    if not checks:
+        return type_check or (lambda value, path: [])
+    return validate
+
+
+@dataclass
+class Command:
+    """A command from functions.json with its compiled parameter validator"""
+    id: int
+    name: str
+    spec: Dict[str, Any]
+    schema: Dict[str, Any]
+    validator: Validator = field(repr=False)
+    # Pure observation without side effects ("read_only": true in functions.json)
+    read_only: bool = False
+    # Changes state that read-only results depend on ("mutating" in functions.json,
+    # default: not read_only); a success invalidates memoized read-only results
+    mutating: bool = True
+    # "inline", "thread" or "process" ("executor" in functions.json); None picks by implementation
+    executor: Optional[str] = None
+
+    def validate(self, parameters: Any) -> List[str]:
+        """Return a list of validation errors for the given parameters"""
+        return self.validator(parameters, "parameters")
+
+
+class CommandRegistry:
+    """Commands indexed by id and by name, compiled once from functions.json"""
+
+    def __init__(self, functions: Dict[str, Any]):
+        self.by_id: Dict[int, Command] = {}
+        self.by_name: Dict[str, Command] = {}
+        for spec in functions.get("functions", []):
+            schema = normalize_parameters_schema(spec.get("parameters"))
+            command = Command(
+                id=spec["id"],
+                name=spec["name"],
+                spec=spec,
+                schema=schema,
+                validator=compile_schema(schema),
+                read_only=bool(spec.get("read_only", False)),
+                mutating=bool(spec.get("mutating", not spec.get("read_only", False))),
+                executor=check_executor(spec.get("executor")),
+            )
+            self.by_id[command.id] = command
+            self.by_name[command.name] = command
+
+    def get(self, command_id: Any) -> Optional[Command]:
+        """Find a command by id; numeric strings are accepted"""
+        command = self.by_id.get(command_id)
+        if command is None and isinstance(command_id, str) and command_id.strip().isdigit():
+            command = self.by_id.get(int(command_id))
+        return command
+
+    def get_by_name(self, name: str) -> Optional[Command]:
+        """Find a command by name"""
+        return self.by_name.get(name)
+
+    def validate(self, command_id: Any, parameters: Any) -> Tuple[bool, str]:
+        """Validate parameters of a command, returning (is_valid, error_message)"""
+        command = self.get(command_id)
+        if command is None:
+            return False, f"Unknown command_id: {command_id}"
+        errors = command.validate(parameters)
+        if errors:
+            return False, "; ".join(errors)
+        return True, ""
+
+    def tools(self) -> List[Dict[str, Any]]:
+        """Commands as native tool definitions for the chat completions API"""
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": command.name,
+                    "description": command.spec.get("description", ""),
+                    "parameters": command.schema,
+                },
+            }
+            for command in self
+        ]
+
+    def action_schema(self) -> Dict[str, Any]:
+        """JSON schema of one action: the id of a command together with its parameters"""
+        return {
+            "anyOf": [
+                {
+                    "type": "object",
+                    "properties": {
+                        "command_id": {"type": "integer", "enum": [command.id]},
+                        "parameters": command.schema,
+                        "expected_outcome": {"type": "string"},
+                    },
+                    "required": ["command_id", "parameters"],
+                }
+                for command in self
+            ]
+        }
+
+    def __iter__(self) -> Iterator[Command]:
+        return iter(self.by_id.values())
+
+    def __len__(self) -> int:
+        return len(self.by_id)
@@ -0,0 +1,52 @@
+from typing import Dict, Any, Callable, Tuple
+import json
+import os
+
+from .command_registry import CommandRegistry
+
+# (absolute path, kind) -> ((mtime_ns, size), value)
+_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+
+
+def _cached(path: str, kind: str, build: Callable[[], Any]) -> Any:
+    """Return the value built from a file, rebuilding it only when the file changed"""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    key = (os.path.abspath(path), kind)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] == signature:
+        return hit[1]
+    value = build()
+    _cache[key] = (signature, value)
+    return value
+
+
+def _read_json(path: str) -> Any:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _read_yaml(path: str) -> Any:
+    import yaml
+
+    with open(path, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def load_json(path: str) -> Any:
+    """Parsed JSON file, shared by all callers until the file changes; don't modify it"""
+    return _cached(path, "json", lambda: _read_json(path))
+
+
+def load_yaml(path: str) -> Any:
+    """Parsed YAML file, shared by all callers until the file changes; don't modify it"""
+    return _cached(path, "yaml", lambda: _read_yaml(path))
+
+
+def load_commands(path: str) -> CommandRegistry:
+    """Compiled command registry of a functions.json file"""
+    return _cached(path, "commands", lambda: CommandRegistry(load_json(path)))
+
+
+def clear_config_cache():
+    _cache.clear()
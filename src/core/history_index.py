@@ -0,0 +1,275 @@
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Deque, Iterator, Sequence, Tuple
+
+Predicate = Callable[[Any], bool]
+
+
+def result_status(entry) -> Optional[str]:
+    """Status reported by the tool itself ("success", "accepted", "error", ...)"""
+    result = entry.result
+    return result.get("status") if isinstance(result, dict) else None
+
+
+class _Timeline:
+    """Positions, timestamps and running value totals of the entries of one series.
+
+    In bounded mode, items whose position leaves the window are evicted; only
+    their count, total and newest timestamp are kept. Queries whose `since`
+    falls inside the window stay exact without touching older entries.
+    """
+
+    __slots__ = ("positions", "timestamps", "cumulative", "start", "count", "total",
+                 "evicted_count", "evicted_total", "evicted_until")
+
+    def __init__(self):
+        self.positions: List[int] = []
+        self.timestamps: List[datetime] = []
+        self.cumulative: List[float] = []  # total up to and including each item
+        self.start = 0  # items before this offset are evicted
+        self.count = 0
+        self.total = 0.0
+        self.evicted_count = 0
+        self.evicted_total = 0.0
+        self.evicted_until: Optional[datetime] = None
+
+    def append(self, position: int, timestamp: datetime, value: float = 0):
+        self.count += 1
+        self.total += value
+        self.positions.append(position)
+        self.timestamps.append(timestamp)
+        self.cumulative.append(self.total)
+
+    def add_evicted(self, timestamp: datetime, value: float = 0):
+        """Account for an item that is already outside the window"""
+        self.count += 1
+        self.total += value
+        self.evicted_count += 1
+        self.evicted_total += value
+        if self.evicted_until is None or timestamp > self.evicted_until:
+            self.evicted_until = timestamp
+
+    def evict(self, low: int):
+        """Drop the items whose position is below `low`"""
+        start = self.start
+        while start < len(self.positions) and self.positions[start] < low:
+            self.evicted_count += 1
+            self.evicted_total = self.cumulative[start]
+            self.evicted_until = self.timestamps[start]
+            start += 1
+        self.start = start
+        # Compact once half of the lists are evicted items
+        if start > 32 and start * 2 > len(self.positions):
+            del self.positions[:start], self.timestamps[:start], self.cumulative[:start]
+            self.start = 0
+
+    def window(self, since: Optional[datetime]) -> Tuple[int, bool]:
+        """Offset of the first item after `since` and whether evicted items may also be after it"""
+        if since is None:
+            return self.start, self.evicted_count > 0
+        if self.evicted_until is not None and since < self.evicted_until:
+            return self.start, True
+        return bisect_right(self.timestamps, since, self.start), False
+
+    def total_after(self, offset: int) -> float:
+        return self.total - (self.cumulative[offset - 1] if offset > self.start else self.evicted_total)
+
+
+class _ParameterSum:
+    """Running sums of one numeric parameter over the entries of a command"""
+
+    def __init__(self, command_name: str, parameter: str, status: Optional[str]):
+        self.command_name = command_name
+        self.parameter = parameter
+        self.status = status
+        self.timeline = _Timeline()
+
+    def value(self, entry) -> Optional[float]:
+        """The parameter value the entry contributes, or None if it doesn't count"""
+        if entry.command_name != self.command_name:
+            return None
+        if self.status is not None and result_status(entry) != self.status:
+            return None
+        value = entry.parameters.get(self.parameter) if isinstance(entry.parameters, dict) else None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value
+
+
+class HistoryIndex:
+    """Lookups over an execution history, maintained as entries are appended.
+
+    Tool preconditions and goal checks ask the same questions on every step
+    ("last successful power on", "total wait time since then"). Answering them
+    by rescanning the history makes a run quadratic; this index answers them in
+    O(1) or O(log n) and costs O(1) per appended entry.
+
+    With a `window` (the capacity of a bounded HistoryStore) only the positions
+    of the newest `window` entries are kept, next to per-command counts and
+    running sums, so the index stays as flat as the store. Queries reaching
+    further back than the window read the older entries from the history.
+    """
+
+    def __init__(self, history: Sequence = (), window: Optional[int] = None):
+        self._history = history
+        self.window = window
+        self._commands: Dict[str, _Timeline] = {}
+        self._names: Deque[str] = deque()  # commands of the entries in the window
+        self._last: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._sums: Dict[Tuple[str, str, Optional[str]], _ParameterSum] = {}
+        self._first: Dict[Any, Any] = {}
+        self._pending: Dict[Any, Predicate] = {}
+        self._size = 0
+        for entry in history:
+            self.add(entry)
+
+    def add(self, entry):
+        """Index the entry just appended to the history"""
+        position = self._size
+        self._size += 1
+        name = entry.command_name
+        timeline = self._commands.get(name)
+        if timeline is None:
+            timeline = self._commands[name] = _Timeline()
+        timeline.append(position, entry.timestamp)
+        self._last[(name, None)] = entry
+        self._last[(name, result_status(entry))] = entry
+        for aggregate in self._sums.values():
+            value = aggregate.value(entry)
+            if value is not None:
+                aggregate.timeline.append(position, entry.timestamp, value)
+        if self._pending:
+            for key, predicate in list(self._pending.items()):
+                if predicate(entry):
+                    self._first[key] = entry
+                    del self._pending[key]
+        if self.window:
+            self._names.append(name)
+            if len(self._names) > self.window:
+                self._evict(self._names.popleft())
+
+    def _evict(self, name: str):
+        low = self._low()
+        self._commands[name].evict(low)
+        for aggregate in self._sums.values():
+            if aggregate.command_name == name:
+                aggregate.timeline.evict(low)
+
+    def _low(self) -> int:
+        """Position of the oldest entry in the window"""
+        return max(0, self._size - self.window) if self.window else 0
+
+    def _older(self, command_name: str, since: Optional[datetime]) -> Iterator[Any]:
+        """Entries of a command before the window and after `since`, newest first"""
+        for position in range(self._low() - 1, -1, -1):
+            entry = self._history[position]
+            if since is not None and entry.timestamp <= since:
+                return
+            if entry.command_name == command_name:
+                yield entry
+
+    def clear(self):
+        """Forget all entries (the history was cleared)"""
+        self._commands.clear()
+        self._names.clear()
+        self._last.clear()
+        self._sums.clear()
+        self._first.clear()
+        self._pending.clear()
+        self._size = 0
+
+    def last(self, command_name: str, status: Optional[str] = "success"):
+        """Newest entry of a command whose result has the given status (None: any status)"""
+        return self._last.get((command_name, status))
+
+    def last_success(self, command_name: str):
+        """Newest successful entry of a command"""
+        return self._last.get((command_name, "success"))
+
+    def count(self, command_name: str, since: Optional[datetime] = None) -> int:
+        """Number of entries of a command, optionally only those after `since`"""
+        timeline = self._commands.get(command_name)
+        if timeline is None:
+            return 0
+        if since is None:
+            return timeline.count
+        offset, older = timeline.window(since)
+        count = len(timeline.positions) - offset
+        if older:
+            count += sum(1 for _ in self._older(command_name, since))
+        return count
+
+    def entries(self, command_name: str, since: Optional[datetime] = None) -> List[Any]:
+        """Entries of a command in order, optionally only those after `since`"""
+        timeline = self._commands.get(command_name)
+        if timeline is None:
+            return []
+        offset, older = timeline.window(since)
+        entries = list(self._older(command_name, since))[::-1] if older else []
+        entries.extend(self._history[position] for position in timeline.positions[offset:])
+        return entries
+
+    def parameter_sum(self, command_name: str, parameter: str, since: Optional[datetime] = None,
+                      status: Optional[str] = None) -> float:
+        """Sum of a numeric parameter over the entries of a command after `since`.
+
+        The first query for a (command, parameter, status) combination scans the
+        entries of the command once; the running sum is then kept up to date on
+        append.
+        """
+        key = (command_name, parameter, status)
+        aggregate = self._sums.get(key)
+        if aggregate is None:
+            aggregate = self._sums[key] = self._build_sum(command_name, parameter, status)
+        timeline = aggregate.timeline
+        if since is None:
+            return timeline.total
+        offset, older = timeline.window(since)
+        total = timeline.total_after(offset)
+        if older:
+            total += sum(aggregate.value(entry) or 0 for entry in self._older(command_name, since))
+        return total
+
+    def _build_sum(self, command_name: str, parameter: str, status: Optional[str]) -> _ParameterSum:
+        aggregate = _ParameterSum(command_name, parameter, status)
+        commands = self._commands.get(command_name)
+        if commands is None:
+            return aggregate
+        timeline = aggregate.timeline
+        if commands.evicted_count:
+            for entry in self._older(command_name, None):
+                value = aggregate.value(entry)
+                if value is not None:
+                    timeline.add_evicted(entry.timestamp, value)
+        for position in commands.positions[commands.start:]:
+            entry = self._history[position]
+            value = aggregate.value(entry)
+            if value is not None:
+                timeline.append(position, entry.timestamp, value)
+        return aggregate
+
+    def first(self, key: Any, predicate: Predicate):
+        """First entry matching a predicate, registered under `key`.
+
+        The history is scanned once when the key is first used; afterwards only
+        appended entries are tested until one matches, and the match is kept.
+        The predicate of a key must not change between calls.
+        """
+        if key in self._first:
+            return self._first[key]
+        if key not in self._pending:
+            for entry in self._history:
+                if predicate(entry):
+                    self._first[key] = entry
+                    return entry
+            self._pending[key] = predicate
+        return None
+
+
+def index_of(history: Sequence) -> HistoryIndex:
+    """The maintained index of a processor's history, or a one-off index of a plain list"""
+    index = getattr(history, "index", None)
+    if isinstance(index, HistoryIndex):
+        return index
+    return HistoryIndex(history)
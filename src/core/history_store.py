@@ -0,0 +1,172 @@
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Union
+import itertools
+import json
+import os
+import struct
+
+from .history_index import HistoryIndex
+
+_OFFSET = struct.Struct("<Q")
+
+
+@dataclass(slots=True)
+class ExecutionHistoryEntry:
+    timestamp: datetime
+    command_id: int
+    command_name: str
+    parameters: Dict[str, Any]
+    result: Dict[str, Any]
+    status: str
+    context: str
+
+
+def entry_to_record(entry: ExecutionHistoryEntry) -> List[Any]:
+    """Compact JSON-compatible form of an entry used for on-disk storage"""
+    return [
+        entry.timestamp.isoformat(),
+        entry.command_id,
+        entry.command_name,
+        entry.parameters,
+        entry.result,
+        entry.status,
+        entry.context,
+    ]
+
+
+def entry_from_record(record: List[Any]) -> ExecutionHistoryEntry:
+    """Rebuild an entry stored with entry_to_record (tuples come back as lists)"""
+    timestamp, command_id, command_name, parameters, result, status, context = record
+    return ExecutionHistoryEntry(
+        timestamp=datetime.fromisoformat(timestamp),
+        command_id=command_id,
+        command_name=command_name,
+        parameters=parameters,
+        result=result,
+        status=status,
+        context=context,
+    )
+
+
+class HistoryStore:
+    """Execution history with a bounded in-memory window and an on-disk log of older entries.
+
+    Without a capacity the store is a plain in-memory list. With a capacity,
+    the newest `capacity` entries stay in a ring buffer and older ones are
+    spilled to an append-only log with an offset index, so any step can still
+    be read by its index while resident memory stays flat. `index` is a
+    HistoryIndex kept up to date on every append.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, spill_path: Optional[str] = None):
+        """
+        Args:
+            capacity: Number of newest entries kept in memory (None: keep everything)
+            spill_path: Log file for spilled entries; "<spill_path>.idx" holds the offsets.
+                A temporary file is used, and removed on close(), if not given.
+        """
+        self.capacity = capacity
+        self._memory: Union[list, deque] = deque() if capacity else []
+        self._spilled = 0  # number of entries on disk, i.e. index of the first in-memory entry
+        self.spill_path = spill_path
+        self._temporary = False
+        self._log = None
+        self._index = None
+        self.index = HistoryIndex(self, window=capacity)
+
+    def _open_spill(self):
+        if self.spill_path is None:
+            import tempfile
+
+            fd, self.spill_path = tempfile.mkstemp(prefix="history-", suffix=".log")
+            os.close(fd)
+            self._temporary = True
+        self._log = open(self.spill_path, "w+b")
+        self._index = open(self.spill_path + ".idx", "w+b")
+
+    def _spill(self, entry: ExecutionHistoryEntry):
+        if self._log is None:
+            self._open_spill()
+        self._log.seek(0, os.SEEK_END)
+        offset = self._log.tell()
+        self._log.write(json.dumps(entry_to_record(entry), default=str).encode("utf-8") + b"\n")
+        self._index.seek(0, os.SEEK_END)
+        self._index.write(_OFFSET.pack(offset))
+        self._spilled += 1
+
+    def _read_spilled(self, index: int) -> ExecutionHistoryEntry:
+        self._index.seek(index * _OFFSET.size)
+        (offset,) = _OFFSET.unpack(self._index.read(_OFFSET.size))
+        self._log.seek(offset)
+        return entry_from_record(json.loads(self._log.readline()))
+
+    def append(self, entry: ExecutionHistoryEntry):
+        """Add the newest entry, spilling the oldest in-memory one if the buffer is full"""
+        if self.capacity and len(self._memory) >= self.capacity:
+            self._spill(self._memory.popleft())
+        self._memory.append(entry)
+        self.index.add(entry)
+
+    def clear(self):
+        """Remove all entries"""
+        self._memory.clear()
+        self._spilled = 0
+        if self._log is not None:
+            self._log.truncate(0)
+            self._index.truncate(0)
+        self.index.clear()
+
+    @property
+    def first_in_memory(self) -> int:
+        """Index of the oldest entry that is not spilled to disk"""
+        return self._spilled
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._memory)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1 and start >= self._spilled:
+                # Fast path: the window is entirely in memory
+                return list(itertools.islice(self._memory, start - self._spilled,
+                                             max(stop - self._spilled, start - self._spilled)))
+            return [self[i] for i in range(start, stop, step)]
+
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        if index >= self._spilled:
+            return self._memory[index - self._spilled]
+        return self._read_spilled(index)
+
+    def __iter__(self) -> Iterator[ExecutionHistoryEntry]:
+        position = 0
+        for _ in range(self._spilled):
+            # Seek every time: other reads may move the file position between yields
+            self._log.seek(position)
+            line = self._log.readline()
+            position += len(line)
+            yield entry_from_record(json.loads(line))
+        yield from list(self._memory)
+
+    def __reversed__(self) -> Iterator[ExecutionHistoryEntry]:
+        yield from reversed(list(self._memory))
+        for index in range(self._spilled - 1, -1, -1):
+            yield self._read_spilled(index)
+
+    def close(self):
+        """Close the spill files, removing them if they were temporary"""
+        if self._log is None:
+            return
+        self._log.close()
+        self._index.close()
+        self._log = self._index = None
+        if self._temporary:
+            os.remove(self.spill_path)
+            os.remove(self.spill_path + ".idx")
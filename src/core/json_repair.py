@@ -0,0 +1,151 @@
+from typing import Any, List, Optional, Sequence, Tuple
+import json
+import re
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", flags=re.DOTALL | re.IGNORECASE)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON value can be recovered from a text"""
+
+
+def _clean(text: str) -> Tuple[str, List[str], List[Tuple[int, Tuple[str, ...]]], bool, Optional[str]]:
+    """Copy the first JSON value out of `text` while fixing it up.
+
+    Drops // and /* */ comments and trailing commas outside strings, and stops
+    after the first complete top-level value so that prose after it is ignored.
+    Returns the cleaned text, the brackets still open at its end, the cut points
+    (offset after each complete member, with the brackets open there), whether
+    the text ended inside a string and the key of the top-level member whose
+    object or array value was still open at the end.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = False
+    escape = False
+    # Key tracking for the members of a top-level object
+    string_start = 0
+    last_string = None
+    key = None
+    open_member = None
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if len(stack) == 1:
+                    last_string = "".join(out[string_start:])
+            elif ch == "\n":
+                # Raw newlines are invalid inside JSON strings
+                out[-1] = "\\n"
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_start = len(out)
+            out.append(ch)
+        elif ch == ":" and len(stack) == 1:
+            key = last_string
+            out.append(ch)
+        elif ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        elif ch in "{[":
+            if len(stack) == 1:
+                open_member = key
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            if len(stack) == 1:
+                open_member = None
+            out.append(ch)
+            if not stack:
+                return "".join(out), stack, cuts, False, None
+            cuts.append((len(out), tuple(stack)))
+        elif ch == ",":
+            cuts.append((len(out), tuple(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+    if open_member is not None:
+        try:
+            open_member = json.loads(open_member)
+        except json.JSONDecodeError:
+            pass
+    return "".join(out), stack, cuts, in_string, open_member
+
+
+def _close(text: str, stack) -> str:
+    text = text.rstrip()
+    while text.endswith(","):
+        text = text[:-1].rstrip()
+    return text + "".join(_CLOSERS[b] for b in reversed(stack))
+
+
+def repair_json(text: str, complete_keys: Sequence[str] = (), allow_truncation: bool = True) -> Any:
+    """Parse the first JSON object or array in a model reply, repairing common damage.
+
+    Handles code fences and prose around the JSON, comments, trailing commas,
+    raw newlines in strings and replies cut off in the middle of a value (the
+    incomplete member is dropped and open brackets are closed). A reply cut off
+    inside the value of one of `complete_keys`, or anywhere if allow_truncation
+    is False, is not repaired, since dropping part of it would change its meaning.
+    """
+    fenced = _FENCE_RE.search(text)
+    if fenced and ("{" in fenced.group(1) or "[" in fenced.group(1)):
+        text = fenced.group(1)
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise JSONRepairError("No JSON object found in the response")
+    text = text[min(starts):]
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    cleaned, stack, cuts, in_string, open_member = _clean(text)
+    candidates = []
+    if not stack:
+        candidates.append(cleaned)
+    elif not allow_truncation:
+        raise JSONRepairError("The response was cut off")
+    elif open_member in complete_keys:
+        raise JSONRepairError(f'The response was cut off inside "{open_member}"')
+    else:
+        candidates.append(_close(cleaned + ('"' if in_string else ""), stack))
+        # Cut back to the last complete member and close what was open there
+        for offset, open_brackets in reversed(cuts[-3:]):
+            candidates.append(_close(cleaned[:offset], open_brackets))
+
+    error: Optional[Exception] = None
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error = e
+    raise JSONRepairError(f"Could not repair JSON: {error}")
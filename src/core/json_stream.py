@@ -0,0 +1,88 @@
+from typing import Dict, Any, Optional
+import json
+
+
+class ActionStreamParser:
+    """Incremental scanner for a streamed LLM response.
+
+    Text is fed chunk by chunk. The scanner tracks string, escape and nesting
+    state of the first top-level JSON object, so it knows when a top-level
+    member such as "action" is syntactically complete without waiting for the
+    rest of the response. Completed top-level object members are parsed and
+    kept in `values`.
+    """
+
+    def __init__(self, target_key: str = "action"):
+        self.target_key = target_key
+        self.values: Dict[str, Any] = {}
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._value_start = -1
+
+    @property
+    def text(self) -> str:
+        """All text received so far"""
+        return self._text
+
+    def feed(self, chunk: str) -> Optional[Any]:
+        """Consume a chunk; return the target value once it is complete, else None"""
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start:i + 1]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1 and self._last_string is not None:
+                try:
+                    self._current_key = json.loads(self._last_string)
+                except json.JSONDecodeError:
+                    self._current_key = None
+                self._last_string = None
+            elif ch in "{[":
+                if self._depth == 1 and self._current_key is not None:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start >= 0:
+                    key = self._current_key
+                    try:
+                        self.values[key] = json.loads(text[self._value_start:i + 1])
+                    except json.JSONDecodeError:
+                        pass
+                    self._value_start = -1
+                    self._current_key = None
+                    if key == self.target_key and key in self.values:
+                        self._pos = i + 1
+                        return self.values[key]
+                elif self._depth == 0:
+                    self._started = False
+            elif ch == "," and self._depth == 1:
+                self._current_key = None
+        self._pos = len(text)
+        return None
@@ -0,0 +1,97 @@
+from typing import Dict, Any, Optional, Tuple
+import os
+
+LOCAL_BASE_URL = "http://127.0.0.1:1234/v1"
+LOCAL_API_KEY = "lm-studio"
+
+# Default connection pool limits for the underlying HTTP transport
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_shared_clients: Dict[Tuple, Any] = {}
+_env_loaded = False
+
+
+def load_env():
+    """Load variables from a .env file, once per process.
+
+    Deferred to the first client (or env-configured cache) so that importing
+    the processor stays cheap.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        _env_loaded = True
+        from dotenv import load_dotenv
+
+        load_dotenv()  # download data from .env
+
+
+def create_async_client(model_type: str = "openai",
+                        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                        timeout: Optional[float] = None,
+                        max_retries: Optional[int] = None):
+    """Create a native async OpenAI client with a pooled keep-alive transport
+
+    Args:
+        model_type: "local" for the LM Studio endpoint, anything else for OpenAI
+        max_connections: Maximum number of concurrent connections in the pool
+        max_keepalive_connections: Maximum number of idle connections kept alive
+        keepalive_expiry: Seconds an idle connection is kept alive
+        timeout: Request timeout in seconds (default: the OpenAI client default)
+        max_retries: Retries of failed requests inside the SDK (default: the OpenAI
+            client default); 0 leaves retrying to a RateLimiter
+    """
+    import httpx
+    import openai
+
+    load_env()
+    if model_type == "local":
+        base_url, api_key = LOCAL_BASE_URL, LOCAL_API_KEY
+    else:
+        base_url, api_key = os.getenv("OPENAI_BASE_URL"), os.getenv("OPENAI_API_KEY")
+
+    http_kwargs: Dict[str, Any] = {
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+    }
+    if timeout is not None:
+        http_kwargs["timeout"] = timeout
+
+    client_kwargs: Dict[str, Any] = {}
+    if max_retries is not None:
+        client_kwargs["max_retries"] = max_retries
+
+    return openai.AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        http_client=openai.DefaultAsyncHttpxClient(**http_kwargs),
+        **client_kwargs
+    )
+
+
+def get_shared_client(model_type: str = "openai", **pool_options):
+    """Return a process-wide client for the given endpoint and pool options.
+
+    Processors that ask for the same endpoint and limits reuse one connection
+    pool. The client is bound to the event loop it is first used on.
+    """
+    key = (model_type, tuple(sorted(pool_options.items())))
+    client = _shared_clients.get(key)
+    if client is None:
+        client = create_async_client(model_type, **pool_options)
+        _shared_clients[key] = client
+    return client
+
+
+async def close_shared_clients():
+    """Close all shared clients and release their connections"""
+    clients = list(_shared_clients.values())
+    _shared_clients.clear()
+    for client in clients:
+        await client.close()
@@ -1,25 +1,44 @@
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Callable, Tuple, Union
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple, Union
 import json
-import yaml
 from datetime import datetime
+from types import SimpleNamespace
 import asyncio
-import openai
+import functools
 import os
-from dotenv import load_dotenv
-import re
+import time
 
-load_dotenv()  # download data from .env
+from .llm_client import (
+    load_env,
+    create_async_client,
+    get_shared_client,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+)
+from .prompt_builder import PromptBuilder, entry_to_dict, OUTPUT_MODES
+from .json_repair import repair_json, JSONRepairError
+from .config_cache import load_json, load_yaml, load_commands
+from .rate_limiter import (
+    RateLimiter,
+    RateLimitExceeded,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BACKGROUND,
+    is_rate_limit_error,
+)
+from .tokens import estimate_messages_tokens
+from .response_cache import ResponseCache, CacheMiss
+from .json_stream import ActionStreamParser
+from .history_store import ExecutionHistoryEntry, HistoryStore
+from .checkpoint import CheckpointWriter, read_checkpoint
+from .metrics import Metrics, NullMetrics
+from .tool_executor import ToolExecutor, check_executor, resolve_executor
 
-@dataclass
-class ExecutionHistoryEntry:
-    timestamp: datetime
-    command_id: int
-    command_name: str
-    parameters: Dict[str, Any]
-    result: Dict[str, Any]
-    status: str
-    context: str
+DEFAULT_CACHE_PATH = "llm_cache.sqlite"
+# History name of a step in which no usable action was obtained from the LLM
+NO_ACTION = "no_action"
+# Recorded as the reasoning when the model gave none
+NO_REASONING = "No explicit reasoning provided, proceeding with the action"
+# response_cache default that is read from the environment on first use
+_CACHE_FROM_ENV = object()
 
 class LLMProcessor:
     def __init__(self, 
@@ -31,8 +50,38 @@ class LLMProcessor:
                  ui_visibility: bool = False,
                  # Новый параметр: каждые A шагов делаем "summary" 
                  summary_interval: int = 7,
-                 # Новый параметр: берём B последних шагов при обобщении
-                 summary_window: int = 15):
+                 # Новый параметр: берём не больше B новых шагов при обобщении
+                 summary_window: int = 15,
+                 client: Optional[Any] = None,
+                 share_client: bool = False,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                 compact_prompt: bool = False,
+                 short_history_keys: bool = False,
+                 prompt_layout: str = "single",
+                 background_summary: bool = True,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 stream: bool = False,
+                 speculative: bool = False,
+                 multi_action: bool = False,
+                 max_actions_per_call: int = 5,
+                 max_prompt_tokens: Optional[int] = None,
+                 max_result_chars: int = 2000,
+                 max_context_chars: int = 500,
+                 compress_history: bool = False,
+                 bounded_history: bool = False,
+                 history_spill_path: Optional[str] = None,
+                 checkpoint_path: Optional[str] = None,
+                 display: Optional[Any] = None,
+                 ui_channel: Optional[str] = None,
+                 ui_headless: bool = False,
+                 metrics: bool = True,
+                 output_mode: str = "text",
+                 tool_executor: Optional[ToolExecutor] = None,
+                 thread_pool_size: Optional[int] = None,
+                 process_pool_size: Optional[int] = None,
+                 memoize_read_only: bool = False):
         """Initialize the LLM Processor
         
         Args:
@@ -43,283 +92,996 @@ class LLMProcessor:
             model_name: Name of the model to use (default: gpt-4o-mini)
             ui_visibility: Whether to show prompt updates in web UI (default: False)
             summary_interval: Every A steps generate best practices
-            summary_window: Take B last steps for best practice generation
+            summary_window: Take at most B new steps for best practice generation
+            client: Async OpenAI-compatible client to use instead of creating one
+            share_client: Reuse one pooled client across processors with the same settings
+            max_connections: Connection pool size of the created client
+            max_keepalive_connections: Idle keep-alive connections of the created client
+            compact_prompt: Serialize prompt JSON without indentation
+            short_history_keys: Use short field names for history entries in prompts
+            prompt_layout: "single" sends one user message, "cached" sends a stable
+                system prefix and puts knowledge and history in a user message so the
+                provider prompt cache can reuse the prefix
+            background_summary: Summarize best practices in a background task instead of
+                blocking the step that triggers it; the result is committed at the next
+                summary interval, so prompts do not depend on how fast the LLM answers
+            rate_limiter: Limiter shared by processors that use the same API key
+            response_cache: Record/replay cache of LLM responses (default: configured by the
+                LLM_CACHE_MODE and LLM_CACHE_PATH environment variables, if set)
+            stream: Stream completions and return the action as soon as it is complete
+            speculative: While a read-only command runs, start the next LLM call on a prompt
+                that assumes its previous result; keep it if the actual result matches
+            multi_action: Let the LLM return an ordered list of actions that step() executes
+            max_actions_per_call: Maximum number of actions executed per LLM call
+            max_prompt_tokens: Estimated prompt token budget; history is filled newest-first
+                until it is reached instead of taking the last history_size entries
+            max_result_chars: With a token budget, truncate results longer than this
+            max_context_chars: With a token budget, truncate reasoning longer than this
+            compress_history: Collapse repeated identical entries and encode results as diffs
+                against the previous result of the same command in prompts
+            bounded_history: Keep only the largest window in use in memory and spill older
+                entries to an append-only log on disk; a max_prompt_tokens budget is then
+                filled from the in-memory window (max(history_size, summary_window) entries)
+            history_spill_path: Log file for spilled history (implies bounded_history)
+            checkpoint_path: Append history and knowledge to this checkpoint after every
+                step; call restore() first to resume from it instead of starting over
+            display: PromptDisplay to publish prompts and steps to (implies ui_visibility);
+                by default all visible processors share one display server
+            ui_channel: Name of this processor on the display (default: "agent-<n>")
+            ui_headless: Serve the display without opening a browser window
+            metrics: Record step timings and token counts (see get_stats() and the
+                display's /metrics endpoint)
+            output_mode: "text" parses a JSON reply, "tools" sends the commands as native
+                tools, "json_schema" constrains the reply with a JSON schema built from
+                functions.json
+            tool_executor: Thread and process pools for sync implementations, shared with
+                other processors (default: pools owned by this processor)
+            thread_pool_size: Workers of the owned thread pool
+            process_pool_size: Workers of the owned process pool
+            memoize_read_only: Answer repeated read-only commands with the same parameters
+                from a cache instead of running them again; any successful mutating
+                command clears it
         """
         self.functions_file = functions_file
         self.goal_file = goal_file
         self.model_type = model_type
         self.history_size = history_size
-        self.execution_history = []
+        # The largest window any prompt or summary reads; only it needs to stay in memory
+        history_capacity = None
+        if bounded_history or history_spill_path:
+            history_capacity = max(history_size, summary_window, 1)
+        self.execution_history = HistoryStore(history_capacity, history_spill_path)
         self.implementations = {}
+        # name -> (implementation, executor) chosen when it was registered
+        self._implementation_executors: Dict[str, Tuple[Callable, str]] = {}
+        # Parsed and compiled once per file version and shared by processors in this process
         self.functions: Dict = self._load_json(self.functions_file)
         self.goal: Dict = self._load_yaml(self.goal_file)
-        self._load_available_functions()
+        # Commands indexed by id and name with precompiled parameter validators
+        self.commands = load_commands(self.functions_file)
         
         # Дополнительные поля для "Best Practices"
         self.summary_interval = summary_interval
         self.summary_window = summary_window
         self.steps_counter = 0  # сколько шагов уже совершено
         self.best_practices = ""  # текущее итоговое значение Best Practices, useful findings and extracted helpful knowledge
+        self.background_summary = background_summary
+        # Background summary started at the last interval, committed at the next one
+        self._summary_task: Optional[asyncio.Task] = None
+        self._summary_mark = 0  # number of history entries already folded into best_practices
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint = CheckpointWriter(checkpoint_path) if checkpoint_path else None
 
-        # UI visibility setup
-        self.ui_visibility = ui_visibility
+        if prompt_layout not in ("single", "cached"):
+            raise ValueError(f"Unknown prompt layout: {prompt_layout}")
+        self.prompt_layout = prompt_layout
+        # Token usage reported by the provider: last request and running totals
+        self.last_usage: Dict[str, int] = {}
+        self.usage_totals: Dict[str, int] = {
+            "prompt_tokens": 0, "cached_tokens": 0, "uncached_tokens": 0, "completion_tokens": 0
+        }
+
+        self.multi_action = multi_action
+        self.max_actions_per_call = max_actions_per_call
+        self._plan_remaining = 0  # actions left after the current one in a multi-action plan
+        self.max_prompt_tokens = max_prompt_tokens
+
+        # Static prompt sections are compiled once, history fragments are cached on append
+        self.prompt_builder = PromptBuilder(
+            self.functions,
+            self.goal,
+            history_size,
+            compact=compact_prompt,
+            short_keys=short_history_keys,
+            cache_size=2 * max(history_size, summary_window),
+            multi_action=multi_action,
+            max_actions=max_actions_per_call,
+            max_prompt_tokens=max_prompt_tokens,
+            max_result_chars=max_result_chars if max_prompt_tokens is not None else None,
+            max_context_chars=max_context_chars if max_prompt_tokens is not None else None,
+            compress_history=compress_history,
+            output_mode=output_mode
+        )
+
+        # UI visibility setup: every processor publishes to its own channel of a shared display
+        self.ui_visibility = ui_visibility or display is not None
+        self.prompt_display = None
+        self.display_channel = None
         if self.ui_visibility:
-            from .web_display import PromptDisplay
-            self.prompt_display = PromptDisplay()
-            self.prompt_display.start()
+            if display is None:
+                from .web_display import get_shared_display
+                display = get_shared_display(headless=ui_headless)
+            self.prompt_display = display
+            self.display_channel = display.channel(ui_channel)
+        # Timing spans and token counts, labelled like the display channel
+        label = self.display_channel.name if self.display_channel is not None else ui_channel
+        self.metrics = Metrics(label) if metrics else NullMetrics(label)
         
-        # LLM configuration
-        if model_type == "local":
-            openai.api_base = "http://127.0.0.1:1234/v1"
-            openai.api_key = "lm-studio"
-            self.model_name = model_name
-        else:  # OpenAI
-            openai.api_base = "https://api.openai.com/v1"
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            self.model_name = model_name
+        # LLM configuration: one long-lived async client, created on first use
+        self.model_name = model_name
+        self.client = client
+        self.share_client = share_client
+        self.pool_options = {
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+        }
+        self._owns_client = False
+        self.rate_limiter = rate_limiter
+        self._owns_cache = False
+        self._response_cache = response_cache if response_cache is not None else _CACHE_FROM_ENV
+        self.stream = stream
+        self.last_time_to_action: Optional[float] = None
+        # Tasks reading the rest of a stream, keyed by id() of the response they complete
+        self._stream_tails: Dict[int, asyncio.Task] = {}
+        self.speculative = speculative
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        self._last_observations: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._prefetch: Optional[Tuple[List[Dict[str, str]], asyncio.Task]] = None
+        self.memoize_read_only = memoize_read_only
+        # Successful read-only results since the last successful mutating command
+        self._memo: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.memo_hits = 0
+        self.memo_misses = 0
 
         self.generation_kwargs = {
             # "max_tokens": 512,
             # "temperature": 0.7,
             # "top_p": 0.9
         }
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {output_mode}")
+        self.output_mode = output_mode
+        # Extra arguments of action requests (summaries are plain text requests)
+        self.action_kwargs = self._structured_output_kwargs()
+
+        # Sync implementations run in these pools so that slow tools don't block the event loop
+        self._owns_tool_executor = tool_executor is None
+        self.tool_executor = tool_executor or ToolExecutor(thread_pool_size, process_pool_size)
+
+    def _structured_output_kwargs(self) -> Dict[str, Any]:
+        """Request arguments that make the model return structured actions"""
+        if self.output_mode == "tools":
+            kwargs = {"tools": self.commands.tools(), "tool_choice": "required"}
+            if not self.multi_action:
+                kwargs["parallel_tool_calls"] = False
+            return kwargs
+        if self.output_mode == "json_schema":
+            analysis = {
+                "type": "object",
+                "properties": {
+                    "current_situation": {"type": "string"},
+                    "history_consideration": {"type": "string"},
+                    "reasoning": {"type": "string"},
+                },
+                "required": ["current_situation", "history_consideration", "reasoning"],
+            }
+            action = self.commands.action_schema()
+            if self.multi_action:
+                properties = {"analysis": analysis, "actions": {
+                    "type": "array", "items": action, "minItems": 1, "maxItems": self.max_actions_per_call,
+                }}
+            else:
+                properties = {"analysis": analysis, "action": action}
+            return {"response_format": {"type": "json_schema", "json_schema": {
+                "name": "next_action",
+                "schema": {"type": "object", "properties": properties, "required": list(properties)},
+            }}}
+        return {}
 
     def _load_json(self, file_path: str) -> Dict:
         """Load JSON configuration file"""
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        return load_json(file_path)
 
     def _load_yaml(self, file_path: str) -> Dict:
         """Load YAML configuration file"""
-        with open(file_path, 'r') as f:
-            return yaml.safe_load(f)
+        return load_yaml(file_path)
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """Response cache; without an explicit one, LLM_CACHE_MODE is checked on first use"""
+        if self._response_cache is _CACHE_FROM_ENV:
+            load_env()
+            self._response_cache = None
+            if os.getenv("LLM_CACHE_MODE"):
+                self._response_cache = ResponseCache(
+                    os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    os.getenv("LLM_CACHE_MODE")
+                )
+                self._owns_cache = True
+        return self._response_cache
+
+    @response_cache.setter
+    def response_cache(self, cache: Optional[ResponseCache]):
+        self._response_cache = cache
+
+    def _get_client(self):
+        """Return the pooled LLM client, creating it on first use"""
+        if self.client is None:
+            options = self.pool_options
+            if self.rate_limiter is not None:
+                # SDK retries of a 429 would bypass the limiter's shared backoff
+                options = {**options, "max_retries": 0}
+            if self.share_client:
+                self.client = get_shared_client(self.model_type, **options)
+            else:
+                self.client = create_async_client(self.model_type, **options)
+                self._owns_client = True
+        return self.client
+
+    async def _create_completion(self, messages: List[Dict[str, str]],
+                                 priority: int = PRIORITY_INTERACTIVE,
+                                 extra_kwargs: Optional[Dict[str, Any]] = None):
+        """Send a chat completion request through the pooled client and the rate limiter"""
+        client = self._get_client()
+        kwargs = {**self.generation_kwargs, **extra_kwargs} if extra_kwargs else self.generation_kwargs
+        sent = [0.0]
+
+        def request():
+            sent[0] = time.perf_counter()
+            return client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                **kwargs
+            )
+
+        async def limited_request():
+            queued = time.perf_counter()
+            if self.rate_limiter is None:
+                response = await request()
+            else:
+                estimated_tokens = estimate_messages_tokens(messages) + kwargs.get("max_tokens", 0)
+                response = await self.rate_limiter.run(request, estimated_tokens, priority)
+                usage = getattr(response, "usage", None)
+                self.rate_limiter.record_usage(estimated_tokens, getattr(usage, "total_tokens", 0) or 0)
+            # Queue wait includes rate limiter backoff; LLM latency is the last (successful) attempt
+            self.metrics.observe("queue_wait", sent[0] - queued)
+            self.metrics.observe("llm", time.perf_counter() - sent[0])
+            return response
+
+        # Cached responses don't count against the rate limits
+        if self.response_cache is not None:
+            return await self.response_cache.fetch(
+                self.model_name, messages, kwargs, limited_request
+            )
+        return await limited_request()
 
-    def register_function(self, name: str, implementation: Callable):
-        """Register a function implementation"""
+    def _record_usage(self, response) -> Dict[str, int]:
+        """Extract cached and uncached prompt token counts from the response usage"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return {}
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        self.last_usage = {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": prompt_tokens - cached_tokens,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        }
+        for key, value in self.last_usage.items():
+            self.usage_totals[key] += value
+        self.metrics.add_usage(self.last_usage)
+        return self.last_usage
+
+    async def aclose(self):
+        """Finish pending work and release the client, cache and history files of this processor"""
+        await self.flush_best_practices()
+        self._discard_prefetch()
+        if self._stream_tails:
+            await asyncio.gather(*self._stream_tails.values())
+        if self._owns_client and self.client is not None:
+            await self.client.close()
+            self.client = None
+            self._owns_client = False
+        if self._checkpoint is not None:
+            self._checkpoint.close()
+        self.execution_history.close()
+        if self._owns_tool_executor:
+            self.tool_executor.close()
+        if self._owns_cache and self._response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+            self._owns_cache = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Timing spans, per-command tool times and token counts with p50/p95/p99"""
+        stats = self.metrics.get_stats()
+        stats["usage_totals"] = dict(self.usage_totals)
+        stats["steps"] = self.steps_counter
+        return stats
+
+    def checkpoint(self, path: Optional[str] = None):
+        """Append the steps and knowledge changed since the last checkpoint to the checkpoint file"""
+        if path is not None and path != self.checkpoint_path:
+            if self._checkpoint is not None:
+                self._checkpoint.close()
+            self.checkpoint_path = path
+            self._checkpoint = CheckpointWriter(path)
+        if self._checkpoint is None:
+            raise ValueError("No checkpoint path configured")
+        self._checkpoint.write(self.execution_history, self.best_practices,
+                               self.steps_counter, self._summary_mark)
+
+    def restore(self, path: Optional[str] = None):
+        """Load history and knowledge from a checkpoint and continue the episode from there.
+
+        No LLM call is replayed. If the checkpoint is this processor's checkpoint_path
+        (the default), later checkpoints are appended to it.
+        """
+        path = path or self.checkpoint_path
+        if path is None:
+            raise ValueError("No checkpoint path configured")
+        state = read_checkpoint(path)
+
+        self._discard_prefetch()
+        self._last_observations.clear()
+        self._memo.clear()
+        self._plan_remaining = 0
+        self.execution_history.clear()
+        for entry in state.entries:
+            self.execution_history.append(entry)
+            self.prompt_builder.add_entry(entry)
+        self.best_practices = state.best_practices
+        self.steps_counter = state.steps_counter
+        self._summary_mark = state.summary_mark
+        if self._checkpoint is not None and path == self.checkpoint_path:
+            self._checkpoint.resume(state)
+
+    def register_function(self, name: str, implementation: Callable, executor: Optional[str] = None):
+        """Register a function implementation
+
+        Args:
+            name: Command name from functions.json
+            implementation: Sync or async callable taking the parameters dict
+            executor: "inline", "thread" or "process", overriding the "executor" of the
+                command in functions.json (default: "thread" for sync and "inline" for
+                async implementations)
+        """
+        command = self.commands.get_by_name(name)
+        declared = check_executor(executor) or (command.executor if command else None)
+        self._implementation_executors[name] = (implementation, resolve_executor(implementation, declared))
         self.implementations[name] = implementation
 
+    def _executor_for(self, name: str, implementation: Callable) -> str:
+        registered = self._implementation_executors.get(name)
+        if registered is not None and registered[0] is implementation:
+            return registered[1]
+        # Implementation assigned directly to self.implementations
+        command = self.commands.get_by_name(name)
+        return resolve_executor(implementation, command.executor if command else None)
+
     def _entry_to_dict(self, entry: ExecutionHistoryEntry) -> Dict:
         """Convert history entry to dictionary for prompt generation"""
-        return {
-            "timestamp": entry.timestamp.isoformat(),
-            "command_id": entry.command_id,
-            "command_name": entry.command_name,
-            "parameters": entry.parameters,
-            "result": entry.result,
-            "status": entry.status,
-            "context": entry.context
-        }
+        return entry_to_dict(entry)
+
+    def _history_window(self, pending: Optional[ExecutionHistoryEntry] = None) -> List[ExecutionHistoryEntry]:
+        """History entries shown in the prompt, optionally followed by a not yet recorded entry"""
+        if self.max_prompt_tokens is not None:
+            # Spilled entries would be read back and re-serialized on every prompt
+            return self.prompt_builder.select_history(self.execution_history, self.best_practices, pending,
+                                                      oldest=self.execution_history.first_in_memory)
+        if pending is None:
+            return self.execution_history[-self.history_size:] if self.execution_history else []
+        recent = self.execution_history[-(self.history_size - 1):] if self.history_size > 1 else []
+        return list(recent) + [pending]
 
     def generate_prompt(self) -> str:
         """Generate prompt for LLM"""
-        # Get the last N entries from history
-        history = self.execution_history[-self.history_size:] if self.execution_history else []
-        
-        # Convert history entries to dict format
-        history_dicts = [self._entry_to_dict(entry) for entry in history]
-        
+        # Get the last N entries from history (or as many as fit into the token budget)
+        history = self._history_window()
+
         # Включаем Best Practices в подсказку
-        prompt = f"""# LLM Processor Task
-
-## Best Practices, Useful Findings and Extracted Helpful Knowledge
-{self.best_practices}
-
-## Decision Making Guidelines
-- Analyze the execution history to understand what has been tried
-- Consider the current state in relation to the goal
-- Choose ONE next action that brings you closer to the goal
-- Provide clear reasoning for why this specific action is the best next step
-- Do not try to plan multiple steps ahead - focus only on the immediate next action
-
-## Available Commands
-{json.dumps(self.functions, indent=2)}
-
-## Goal Configuration
-{json.dumps(self.goal, indent=2)}
-
-## Execution History (Last N={self.history_size} Actions)
-{json.dumps(history_dicts, indent=2)}
-
-## Your Response Format
-Analyze the current state and provide a single next action. Your response must be a JSON object:
-
-{{
-  "analysis": {{
-    "current_situation": "Brief assessment of the current state",
-    "history_consideration": "How past actions influence this decision",
-    "reasoning": "Detailed explanation of why this specific action is the best next step"
-  }},
-  "action": {{
-    "command_id": 0,
-    "parameters": {{
-      // Parameters for the chosen command
-    }},
-    "expected_outcome": "What you expect this action to achieve towards the goal"
-  }}
-}}"""
+        prompt = self.prompt_builder.build(history, self.best_practices)
 
         # Update web UI if enabled
         if self.ui_visibility:
-            self.prompt_display.update_prompt(prompt)
+            self.display_channel.prompt(prompt)
 
         return prompt
 
+    def generate_messages(self) -> List[Dict[str, str]]:
+        """Generate chat messages for the LLM in the configured prompt layout"""
+        if self.prompt_layout == "single":
+            return [{"role": "user", "content": self.generate_prompt()}]
+
+        messages = self._build_messages(self._history_window())
+
+        if self.ui_visibility:
+            self.display_channel.prompt("\n\n".join(m["content"] for m in messages))
+
+        return messages
+
+    def _build_messages(self, history: List[ExecutionHistoryEntry]) -> List[Dict[str, str]]:
+        """Build chat messages for an explicit history window"""
+        if self.prompt_layout == "single":
+            return [{"role": "user", "content": self.prompt_builder.build(history, self.best_practices)}]
+        return self.prompt_builder.build_messages(history, self.best_practices)
+
     async def execute_command(self, command_id: int, parameters: Dict[str, Any], context: str) -> Dict[str, Any]:
         """Execute a command and record it in history"""
+        return await self._execute_command(command_id, parameters, context)
+
+    async def _execute_command(self, command_id: int, parameters: Dict[str, Any], context: str,
+                               pending_context: Optional[Callable[[], Awaitable[str]]] = None) -> Dict[str, Any]:
+        """Execute a command and record it in history.
+
+        pending_context, if given, is awaited after the command ran and supplies
+        the context to record instead (reasoning that streams in after the action).
+        """
+        if command_id is None:
+            # No usable action could be obtained from the LLM: record a failed step
+            # without running any tool
+            result = {"status": "error", "message": f"No action was executed: {context}"}
+            entry = ExecutionHistoryEntry(
+                timestamp=datetime.now(),
+                command_id=None,
+                command_name=NO_ACTION,
+                parameters=parameters or {},
+                result=result,
+                status="failed",
+                context=context
+            )
+            await self._record_step(entry, 0.0)
+            return result
+
         # Find command definition
-        command = next((cmd for cmd in self.functions['functions'] if cmd['id'] == command_id), None)
+        command = self.commands.get(command_id)
         if not command:
             raise ValueError(f"Unknown command ID: {command_id}")
 
         # Execute implementation
-        if command['name'] not in self.implementations:
-            raise ValueError(f"No implementation registered for command: {command['name']}")
+        if command.name not in self.implementations:
+            raise ValueError(f"No implementation registered for command: {command.name}")
 
-        implementation = self.implementations[command['name']]
-        
-        # Handle both async and sync implementations
-        if asyncio.iscoroutinefunction(implementation):
-            result = await implementation(parameters)
+        implementation = self.implementations[command.name]
+
+        # Reject malformed parameters before the implementation runs
+        errors = command.validate(parameters)
+
+        observation_key = self._observation_key(command.name, parameters) if command.read_only else None
+        memoized = None
+        if not errors and self.memoize_read_only and command.read_only:
+            memoized = self._memo.get(observation_key)
+            if memoized is None:
+                self.memo_misses += 1
+            else:
+                self.memo_hits += 1
+
+        # While a read-only command runs, ask the LLM for the step after it assuming
+        # the command returns what it returned last time
+        speculation = None
+        if (not errors and memoized is None and self.speculative and command.read_only
+                and not self._plan_remaining):
+            speculation = self._start_speculation(command, parameters, context)
+
+        started = time.perf_counter()
+        if errors:
+            result = {"status": "error", "message": f"Invalid parameters: {'; '.join(errors)}"}
+        elif memoized is not None:
+            # Nothing changed since the same observation was made
+            result = dict(memoized)
         else:
-            result = implementation(parameters)
+            result = await self.tool_executor.run(
+                self._executor_for(command.name, implementation), implementation, parameters
+            )
+        tool_seconds = time.perf_counter() - started
+        if memoized is None:
+            self.metrics.observe("tool", tool_seconds, command.name)
 
-        # Record in history
-        entry = ExecutionHistoryEntry(
-            timestamp=datetime.now(),
-            command_id=command_id,
-            command_name=command['name'],
-            parameters=parameters,
-            result=result,
-            status="success" if result.get('status') in ['success', 'accepted'] else "failed",
-            context=context
-        )
+        if pending_context is not None:
+            context = await pending_context()
+        entry = self._resolve_speculation(speculation, result, context) if speculation else None
+        if entry is None:
+            # Record in history
+            entry = ExecutionHistoryEntry(
+                timestamp=datetime.now(),
+                command_id=command.id,
+                command_name=command.name,
+                parameters=parameters,
+                result=result,
+                status="success" if result.get('status') in ['success', 'accepted'] else "failed",
+                context=context
+            )
+        if command.read_only and not errors:
+            self._last_observations[observation_key] = result
+            if self.memoize_read_only and entry.status == "success":
+                self._memo[observation_key] = result
+        elif command.mutating and entry.status == "success":
+            self._memo.clear()
+        await self._record_step(entry, tool_seconds)
+        return result
+
+    async def _record_step(self, entry: ExecutionHistoryEntry, tool_seconds: float):
+        """Append an executed step to the history and run the per-step bookkeeping"""
         self.execution_history.append(entry)
+        self.prompt_builder.add_entry(entry)
 
         # Увеличиваем счётчик шагов
         self.steps_counter += 1
+        if self.ui_visibility:
+            self.display_channel.event("result", step=self.steps_counter, command=entry.command_name,
+                                       parameters=entry.parameters, result=entry.result,
+                                       status=entry.status, tool_seconds=tool_seconds)
         # Проверяем, не пора ли нам обобщать Best Practices
         if self.steps_counter % self.summary_interval == 0:
-            await self._update_best_practices()
+            if self.background_summary:
+                await self._advance_best_practices()
+            else:
+                await self._update_best_practices()
+        if self._checkpoint is not None:
+            self._checkpoint.write(self.execution_history, self.best_practices,
+                                   self.steps_counter, self._summary_mark)
 
-        return result
+    @staticmethod
+    def _observation_key(command_name: str, parameters: Dict[str, Any]) -> Tuple[str, str]:
+        return command_name, json.dumps(parameters, sort_keys=True, default=str)
+
+    def _start_speculation(self, command, parameters: Dict[str, Any], context: str):
+        """Start the next LLM call early on a history that assumes the predicted result"""
+        predicted = self._last_observations.get(self._observation_key(command.name, parameters))
+        if predicted is None:
+            return None
+
+        entry = ExecutionHistoryEntry(
+            timestamp=datetime.now(),
+            command_id=command.id,
+            command_name=command.name,
+            parameters=parameters,
+            result=predicted,
+            status="success" if predicted.get('status') in ['success', 'accepted'] else "failed",
+            context=context
+        )
+        messages = self._build_messages(self._history_window(pending=entry))
+        task = asyncio.create_task(self._request_action(messages))
+        # A discarded speculation must not leave an unretrieved exception behind
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return entry, messages, task
+
+    def _resolve_speculation(self, speculation, result: Dict[str, Any],
+                             context: str) -> Optional[ExecutionHistoryEntry]:
+        """Keep the speculative LLM call if the prediction was right, otherwise cancel it.
+
+        Reasoning that streamed in after the speculation started changes the entry
+        and therefore the next prompt, so the speculative call is cancelled then too.
+        """
+        entry, messages, task = speculation
+        if result == entry.result and context == entry.context:
+            self.speculation_hits += 1
+            self._discard_prefetch()
+            self._prefetch = (messages, task)
+            # Reuse the predicted entry so the next prompt is byte-identical to the speculative one
+            return entry
+        self.speculation_misses += 1
+        task.cancel()
+        return None
+
+    def _discard_prefetch(self):
+        if self._prefetch is not None:
+            self._prefetch[1].cancel()
+            self._prefetch = None
+
+    def _take_prefetch(self, messages: List[Dict[str, str]]) -> Optional[asyncio.Task]:
+        """Return the speculative LLM call if it was made for exactly these messages"""
+        if self._prefetch is None:
+            return None
+        prefetched_messages, task = self._prefetch
+        self._prefetch = None
+        if prefetched_messages == messages and not task.cancelled():
+            return task
+        # Knowledge or history changed since the speculation started
+        task.cancel()
+        self.speculation_misses += 1
+        return None
+
+    async def step(self, goal_predicate: Optional[Callable[[Any], bool]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Ask the LLM for the next action(s) and execute them, returning (response, last result).
+
+        In multi-action mode the actions are executed in order, each validated and
+        recorded as its own history entry. Execution stops at the first failed
+        action or once goal_predicate(execution_history) returns True.
+        """
+        response = await self.get_next_action()
+        actions = response.get('actions') if self.multi_action else None
+        if not isinstance(actions, list) or not actions:
+            actions = [response['action']]
+        actions = actions[:self.max_actions_per_call]
+
+        reasoning = response['analysis']['reasoning']
+        # Reasoning written after the action is still streaming; record it once it arrived
+        pending_reasoning = None
+        tail = self._stream_tails.get(id(response))
+        if tail is not None and reasoning == NO_REASONING:
+            pending_reasoning = functools.partial(self._streamed_reasoning, response, tail)
+        result: Dict[str, Any] = {}
+        for i, action in enumerate(actions):
+            # Later actions of a plan are skipped instead of failing the whole step
+            if i > 0 and (not isinstance(action, dict) or self.commands.get(action.get('command_id')) is None):
+                break
+            self._plan_remaining = len(actions) - i - 1
+            try:
+                result = await self._execute_command(
+                    action['command_id'],
+                    action.get('parameters', {}),
+                    reasoning,
+                    pending_reasoning
+                )
+            finally:
+                self._plan_remaining = 0
+            if result.get('status') not in ['success', 'accepted']:
+                break
+            if goal_predicate is not None and goal_predicate(self.execution_history):
+                break
+        return response, result
+
+    @staticmethod
+    async def _streamed_reasoning(response: Dict[str, Any], tail: asyncio.Task) -> str:
+        """Wait for the rest of a streamed response and return its reasoning"""
+        await asyncio.shield(tail)
+        return response['analysis']['reasoning']
 
     async def get_next_action(self) -> Dict[str, Any]:
         """Get the next action from the LLM"""
-        prompt = self.generate_prompt()
-        
-        # Use only the last N actions in the prompt
-        history = self.execution_history[-self.history_size:] if self.execution_history else []
-        
-        try:
-            if self.model_type == "local":
-                import openai
-                client = openai.OpenAI(
-                    base_url="http://127.0.0.1:1234/v1",
-                    api_key="lm-studio"
-                )
-            else:
-                from openai import OpenAI
-                client = OpenAI()
+        with self.metrics.span("prompt_build"):
+            messages = self.generate_messages()
+        started = time.perf_counter()
+
+        prefetched = self._take_prefetch(messages)
+        if prefetched is not None:
+            print("Using speculative LLM response prepared during the previous step")
+            response = await prefetched
+        else:
+            response = await self._request_action(messages)
+
+        if self.ui_visibility:
+            self.display_channel.event("action", action=response.get("action"),
+                                       actions=response.get("actions"),
+                                       reasoning=response.get("analysis", {}).get("reasoning"),
+                                       speculative=prefetched is not None,
+                                       llm_seconds=time.perf_counter() - started,
+                                       usage=self.last_usage)
+        return response
+
+    async def _request_action(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Request the next action for the given messages and parse it.
 
+        An unusable reply is retried once with the problem pointed out; if that
+        fails too, a no-op action (command_id None) is returned so that no real
+        command runs on a guess.
+        """
+        try:
             print("\n### Prompt to LLM ###")
-            print(prompt)
+            print("\n\n".join(m["content"] for m in messages))
             print("### End of Prompt ###\n")
 
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    **self.generation_kwargs
-                )
+            if self.stream and self.output_mode != "tools":
+                complete = self._get_streamed_action
+            else:
+                complete = self._complete_action
+
+            result, reply = await complete(messages)
+            if "error" in result:
+                print(f"Could not use the LLM response ({result['error']}), asking once more")
+                if self.output_mode == "tools":
+                    instruction = "Call the tool of the chosen action with valid arguments."
+                else:
+                    instruction = "Reply with only the JSON object described in the response format."
+                retry_messages = messages + [
+                    {"role": "assistant", "content": reply},
+                    {"role": "user", "content": f"Your previous reply could not be used: {result['error']}. {instruction}"},
+                ]
+                result, _ = await complete(retry_messages)
+            return result
+
+        except Exception as e:
+            # Throttling is not the model's decision; don't turn it into a fallback action
+            if is_rate_limit_error(e) or isinstance(e, (RateLimitExceeded, CacheMiss)):
+                raise
+            print(f"Error calling LLM: {e}")
+            return self._no_action(f"Error: {str(e)}")
+
+    async def _complete_action(self, messages: List[Dict[str, str]]) -> Tuple[Dict[str, Any], str]:
+        """Send one action request; return the parsed action and the raw reply text"""
+        response = await self._create_completion(messages, extra_kwargs=self.action_kwargs)
+
+        print("\n### LLM Raw Response ###")
+        print(response)
+        print("### End of LLM Raw Response ###\n")
+
+        self._report_usage(response)
+
+        message = response.choices[0].message
+        content = (message.content or "").strip()
+        with self.metrics.span("parse"):
+            if self.output_mode == "tools":
+                return self._parse_tool_calls(message), content
+            return self._parse_action_response(content), content
+
+    def _no_action(self, reason: str) -> Dict[str, Any]:
+        """Fallback response that executes nothing instead of guessing a command"""
+        action = {"command_id": None, "parameters": {}}
+        result = {
+            "action": action,
+            "analysis": {
+                "reasoning": reason,
+                "current_situation": "Error occurred",
+                "history_consideration": "Error occurred"
+            },
+            "error": reason,
+        }
+        if self.multi_action:
+            result["actions"] = [action]
+        return result
+
+    def _report_usage(self, response):
+        """Record and print token usage of a response"""
+        usage = self._record_usage(response)
+        if usage:
+            print(f"Prompt tokens: {usage['prompt_tokens']} "
+                  f"(cached: {usage['cached_tokens']}, uncached: {usage['uncached_tokens']}), "
+                  f"completion tokens: {usage['completion_tokens']}")
+
+    def _parse_action_response(self, content: str) -> Dict[str, Any]:
+        """Parse the JSON action block of an LLM response, repairing it where possible"""
+        try:
+            # Running a command with part of its parameters is worse than asking again
+            result = repair_json(content, complete_keys=("action", "actions"))
+        except JSONRepairError as e:
+            print("Warning: Could not parse LLM response as JSON. Returning no-op action.")
+            return self._no_action(f"Error parsing response: {e}")
+        if not isinstance(result, dict):
+            return self._no_action("Error parsing response: expected a JSON object")
+
+        return self._check_action(self._normalize_response(result))
+
+    def _check_action(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a response whose action cannot be executed with a no-op action"""
+        action = result.get("action")
+        if not isinstance(action, dict) or "command_id" not in action:
+            return self._no_action("The response contains no action with a command_id")
+        if self.commands.get(action["command_id"]) is None:
+            return self._no_action(f"Unknown command_id: {action['command_id']}")
+        return result
+
+    def _parse_tool_calls(self, message) -> Dict[str, Any]:
+        """Turn native tool calls into actions; the message text is the reasoning"""
+        content = (getattr(message, "content", None) or "").strip()
+        calls = getattr(message, "tool_calls", None) or []
+        if not calls:
+            # Models sometimes answer in the JSON format despite the tools
+            if "{" in content:
+                return self._parse_action_response(content)
+            return self._no_action("The response contains no tool call")
+
+        actions = []
+        for call in calls:
+            function = getattr(call, "function", None)
+            name = getattr(function, "name", None)
+            command = self.commands.get_by_name(name)
+            if command is None:
+                return self._no_action(f"Unknown tool: {name}")
+            arguments = getattr(function, "arguments", None) or "{}"
+            try:
+                parameters = (repair_json(arguments, allow_truncation=False)
+                              if isinstance(arguments, str) else arguments)
+            except JSONRepairError as e:
+                return self._no_action(f"Could not parse the arguments of {name}: {e}")
+            actions.append({"command_id": command.id, "parameters": parameters})
+
+        result: Dict[str, Any] = {"action": actions[0]}
+        if content:
+            result["analysis"] = {"reasoning": content}
+        if self.multi_action:
+            result["actions"] = actions
+        return self._normalize_response(result)
+
+    def _normalize_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Make sure the analysis section has all fields used by callers"""
+        # Multi-action responses also expose their first action as "action"
+        if self.multi_action:
+            if isinstance(result.get('actions'), list) and result['actions'] and 'action' not in result:
+                result['action'] = result['actions'][0]
+            elif 'action' in result and 'actions' not in result:
+                result['actions'] = [result['action']]
+
+        # Add empty analysis if it doesn't exist
+        if 'analysis' not in result:
+            result['analysis'] = {
+                'reasoning': 'No reasoning provided',
+                'current_situation': 'No situation analysis provided', 
+                'history_consideration': 'No history consideration provided'
+            }
+
+        # Handle case where reasoning is at the top level
+        if 'reasoning' in result and 'reasoning' not in result['analysis']:
+            result['analysis']['reasoning'] = result['reasoning']
+            del result['reasoning']  # Clean up top level
+
+        # Ensure all required fields are present in analysis
+        if 'reasoning' not in result['analysis']:
+            result['analysis']['reasoning'] = NO_REASONING
+        if 'current_situation' not in result['analysis']:
+            result['analysis']['current_situation'] = 'Current situation assessment not provided'
+        if 'history_consideration' not in result['analysis']:
+            result['analysis']['history_consideration'] = 'History consideration not provided'
+
+        return result
+
+    async def _stream_completion(self, messages: List[Dict[str, str]], usage_holder: Dict[str, Any]):
+        """Start a streaming chat completion; return its chunk iterator and the time it was sent.
+
+        The token estimate reserved with the rate limiter is kept in usage_holder
+        so that the actual usage can be reported once the stream finished.
+        """
+        client = self._get_client()
+        kwargs = {**self.generation_kwargs, **self.action_kwargs}
+        queued = time.perf_counter()
+        sent = [queued]
+
+        def request():
+            sent[0] = time.perf_counter()
+            return client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
             )
 
-            print("\n### LLM Raw Response ###")
-            print(response)
-            print("### End of LLM Raw Response ###\n")
+        if self.rate_limiter is None:
+            stream = await request()
+        else:
+            estimated_tokens = estimate_messages_tokens(messages) + kwargs.get("max_tokens", 0)
+            stream = await self.rate_limiter.run(request, estimated_tokens, PRIORITY_INTERACTIVE)
+            usage_holder["estimated_tokens"] = estimated_tokens
+        self.metrics.observe("queue_wait", sent[0] - queued)
+        return stream, sent[0]
 
-            content = response.choices[0].message.content.strip()
+    async def _get_streamed_action(self, messages: List[Dict[str, str]]) -> Tuple[Dict[str, Any], str]:
+        """Return the action as soon as it is complete in the token stream, with the reply text so far.
 
-            json_block_match = re.search(r"```json\s*(.*?)\s*```", content, flags=re.DOTALL | re.IGNORECASE)
-            
-            if json_block_match:
-                json_str = json_block_match.group(1).strip()
-            else:
-                json_str = content.strip('`').strip()
+        The rest of the stream is consumed by a background task, which fills in
+        any analysis fields that arrived after the action. An action that cannot
+        be executed is returned as a no-op action once the whole reply arrived.
+        """
+        started = time.perf_counter()
+        cache_key = None
+        if self.response_cache is not None and self.response_cache.mode != "passthrough":
+            cache_key = self.response_cache.make_key(self.model_name, messages,
+                                                      {**self.generation_kwargs, **self.action_kwargs})
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.response_cache.hits += 1
+                self._report_usage(cached)
+                content = cached.choices[0].message.content.strip()
+                return self._parse_action_response(content), content
+            self.response_cache.misses += 1
+            if self.response_cache.mode == "replay":
+                raise CacheMiss(f"No recorded LLM response for request {cache_key[:12]} (model {self.model_name})")
 
+        usage_holder: Dict[str, Any] = {}
+        stream, sent = await self._stream_completion(messages, usage_holder)
+        chunks = stream.__aiter__()
+        target_key = "actions" if self.multi_action else "action"
+        parser = ActionStreamParser(target_key)
+        action = None
+        while action is None:
             try:
-                result = json.loads(json_str)
-            except json.JSONDecodeError:
-                print("Warning: Could not parse LLM response as JSON. Returning fallback action.")
-                return {
-                    "action": {"command_id": 0, "parameters": {}},
-                    "analysis": {
-                        "reasoning": "Error parsing response",
-                        "current_situation": "Error occurred",
-                        "history_consideration": "Error occurred"
-                    }
-                }
-
-            # Add empty analysis if it doesn't exist
-            if 'analysis' not in result:
-                result['analysis'] = {
-                    'reasoning': 'No reasoning provided',
-                    'current_situation': 'No situation analysis provided', 
-                    'history_consideration': 'No history consideration provided'
-                }
-
-            # Handle case where reasoning is at the top level
-            if 'reasoning' in result and 'reasoning' not in result['analysis']:
-                result['analysis']['reasoning'] = result['reasoning']
-                del result['reasoning']  # Clean up top level
-
-            # Ensure all required fields are present in analysis
-            if 'reasoning' not in result['analysis']:
-                result['analysis']['reasoning'] = 'No explicit reasoning provided, proceeding with the action'
-            if 'current_situation' not in result['analysis']:
-                result['analysis']['current_situation'] = 'Current situation assessment not provided'
-            if 'history_consideration' not in result['analysis']:
-                result['analysis']['history_consideration'] = 'History consideration not provided'
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+            text = self._chunk_text(chunk, usage_holder)
+            if text:
+                action = parser.feed(text)
 
-            return result
+        finished = time.perf_counter()
+        self.last_time_to_action = finished - started
+        # With streaming, LLM latency is measured up to the completed action
+        self.metrics.observe("llm", finished - sent)
+
+        if action is None:
+            # The stream ended without a complete action object; parse what arrived
+            self._finish_stream(parser.text, usage_holder, cache_key)
+            return self._parse_action_response(parser.text.strip()), parser.text
 
+        result = self._check_action(self._normalize_response({
+            target_key: action,
+            "analysis": dict(parser.values.get("analysis") or {}),
+        }))
+        if "error" in result:
+            # Nothing runs on this action; the whole reply is needed to ask again
+            content = await self._read_stream(chunks, parser, usage_holder, cache_key)
+            return result, parser.text if content is None else content
+
+        tail = asyncio.create_task(self._drain_stream(chunks, parser, usage_holder, cache_key, result))
+        key = id(result)
+        self._stream_tails[key] = tail
+        tail.add_done_callback(lambda _: self._stream_tails.pop(key, None))
+        return result, parser.text
+
+    @staticmethod
+    def _chunk_text(chunk, usage_holder: Dict[str, Any]) -> str:
+        """Extract the content delta of a stream chunk and remember its usage"""
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            usage_holder["usage"] = usage
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return ""
+        delta = getattr(choices[0], "delta", None)
+        return getattr(delta, "content", None) or ""
+
+    async def _read_stream(self, chunks, parser: ActionStreamParser, usage_holder: Dict[str, Any],
+                           cache_key: Optional[str]) -> Optional[str]:
+        """Consume the rest of a stream and return the whole reply, or None if reading failed"""
+        parts = [parser.text]
+        try:
+            async for chunk in chunks:
+                parts.append(self._chunk_text(chunk, usage_holder))
         except Exception as e:
-            print(f"Error calling LLM: {e}")
-            return {
-                "action": {"command_id": 0, "parameters": {}},
-                "analysis": {
-                    "reasoning": f"Error: {str(e)}",
-                    "current_situation": "Error occurred",
-                    "history_consideration": "Error occurred"
-                }
-            }
+            print(f"Error reading the rest of the LLM stream: {e}")
+            return None
+        content = "".join(parts)
+        self._finish_stream(content, usage_holder, cache_key)
+        return content
+
+    async def _drain_stream(self, chunks, parser: ActionStreamParser, usage_holder: Dict[str, Any],
+                            cache_key: Optional[str], result: Dict[str, Any]):
+        """Consume the rest of a stream after the action was dispatched"""
+        content = await self._read_stream(chunks, parser, usage_holder, cache_key)
+        if content is None:
+            return
+
+        full = self._parse_action_response(content.strip())
+        # Fields the model wrote after the action replace the placeholders
+        for key, value in full.get("analysis", {}).items():
+            if key not in parser.values.get("analysis", {}):
+                result["analysis"][key] = value
+
+    def _finish_stream(self, content: str, usage_holder: Dict[str, Any], cache_key: Optional[str]):
+        """Record usage of a finished stream and store it in the response cache"""
+        usage = usage_holder.get("usage")
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+        )
+        self._report_usage(response)
+        if self.rate_limiter is not None and "estimated_tokens" in usage_holder:
+            self.rate_limiter.record_usage(usage_holder["estimated_tokens"],
+                                           getattr(usage, "total_tokens", 0) or 0)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, self.model_name, response)
 
-    def _load_available_functions(self):
-        with open(self.functions_file, 'r') as f:
-            self.available_functions = json.load(f)
-    
     def _validate_command_params(self, command_id: int, params: Dict[str, Any]) -> Tuple[bool, str]:
-        """Validates that all required parameters are present for the command"""
-        if command_id not in self.available_functions:
-            return False, f"Unknown command_id: {command_id}"
-            
-        function_spec = self.available_functions[command_id]
-        required_params = {
-            param_name for param_name, param_spec in function_spec.get('parameters', {}).items()
-            if param_spec.get('required', False)
-        }
-        
-        missing_params = required_params - set(params.keys())
-        if missing_params:
-            return False, f"Missing required parameters: {', '.join(missing_params)}"
-            
-        return True, ""
+        """Validates command parameters against the compiled schema of the command"""
+        return self.commands.validate(command_id, params)
 
     async def process_response(self, response: str) -> Tuple[bool, Union[Dict, str]]:
         try:
             parsed = json.loads(response)
             command_id = parsed.get('command_id')
-            params = parsed.get('params', {})
+            params = parsed.get('parameters', parsed.get('params', {}))
             
             # Validate command parameters
             is_valid, error_message = self._validate_command_params(command_id, params)
@@ -332,54 +1094,76 @@ Analyze the current state and provide a single next action. Your response must b
         except Exception as e:
             return False, f"Error processing LLM response: {str(e)}"
 
-    # Новый метод _update_best_practices (часть "idea #3")
-    async def _update_best_practices(self):
-        """Generate and merge new Best Practices, Useful Findings and Extracted Helpful Knowledge based on last 'summary_window' steps and existing knowledge."""
-        # 1. Берём последние B шагов
-        relevant_history = self.execution_history[-self.summary_window:] if len(self.execution_history) > 0 else []
-        
-        # 2. Генерируем новый фрагмент Best Practices (new_bp) и�� последних B шагов, goals и функций
-        new_bp_prompt = f"""
-You are tasked with extracting new 'best practices, useful findings and extracted helpful knowledge' from the recent {len(relevant_history)} steps of the agent. 
-Here are the details:
+    async def _advance_best_practices(self):
+        """Commit the background summary of the previous interval and start the next one.
 
-## Goal:
-{json.dumps(self.goal, indent=2)}
+        A summary is committed at the interval after the one that started it, never
+        in between, so the sequence of prompts (and of recorded LLM requests) is the
+        same however long the LLM takes. A step only waits here if the previous
+        summary is still running a whole interval later.
+        """
+        await self.flush_best_practices()
+        request = self._summary_request()
+        if request is not None:
+            self._summary_task = asyncio.create_task(self._summarize(*request))
 
-## Functions:
-{json.dumps(self.functions, indent=2)}
+    async def flush_best_practices(self):
+        """Wait for background summarization and commit its result"""
+        task, self._summary_task = self._summary_task, None
+        if task is not None:
+            self._commit_summary(*await task)
 
-## Recent Execution History (Last B={self.summary_window} steps):
-{json.dumps([self._entry_to_dict(e) for e in relevant_history], indent=2)}
+    # Новый метод _update_best_practices (часть "idea #3")
+    async def _update_best_practices(self):
+        """Fold the steps recorded since the last summary into the current Best Practices, Useful Findings and Extracted Helpful Knowledge with a single LLM call."""
+        request = self._summary_request()
+        if request is not None:
+            self._commit_summary(*await self._summarize(*request))
 
-Please summarize any new best practices, useful findings and extracted helpful knowledge (concise bullet points) that are gleaned specifically from these steps.
-Return them in plain text.
-"""
-        # Запрашиваем у LLM
-        new_bp_content = await self._call_llm_for_bp(new_bp_prompt)
-        # На случай ошибок парсинга / пустого ответа
-        if not new_bp_content:
-            new_bp_content = "No new best practices, useful findings and extracted helpful knowledge found."
+    def _summary_request(self) -> Optional[Tuple[str, int]]:
+        """Prompt for folding the new steps into the knowledge, and the history length it covers"""
+        # 1. Берём только новые шаги с момента последнего обобщения (не больше B)
+        end = len(self.execution_history)
+        start = max(self._summary_mark, end - self.summary_window)
+        if start >= end:
+            return None
+        new_entries = self.execution_history[start:end]
+
+        # 2. Одним запросом извлекаем новые знания и объединяем их с текущими
+        update_prompt = f"""
+You maintain the agent's 'best practices, useful findings and extracted helpful knowledge'.
 
-        # 3. Теперь объединяем (merge) текущее self.best_practices и new_bp_content
-        merge_prompt = f"""
-You have two sets of best practices, useful findings and extracted helpful knowledge:
+## Goal:
+{self.prompt_builder.goal_json}
 
-1) The previous knowledge:
-{self.best_practices}
+## Current knowledge:
+{self.best_practices or "None yet."}
 
-2) The newly extracted knowledge:
-{new_bp_content}
+## New Execution History ({len(new_entries)} steps since the last update):
+{self.prompt_builder.render_history(new_entries)}
 
-Please merge them into a single, coherent set of best practices, useful findings and extracted helpful knowledge. 
+Extract any new best practices, useful findings and extracted helpful knowledge from these steps and merge them into the current knowledge.
+Return the complete updated knowledge as a single, coherent set of concise bullet points in plain text.
 Make sure to avoid duplication and preserve important details.
 """
-        merged_bp = await self._call_llm_for_bp(merge_prompt)
-        if merged_bp:
-            self.best_practices = merged_bp.strip()
-        else:
-            # В случае ошибки сохраняем хоть что-то
-            self.best_practices = f"{self.best_practices}\n{new_bp_content}"
+        return update_prompt, end
+
+    async def _summarize(self, update_prompt: str, end: int) -> Tuple[str, int]:
+        """Ask the LLM for the updated knowledge; return it with the history length it covers"""
+        started = time.perf_counter()
+        updated_bp = await self._call_llm_for_bp(update_prompt)
+        self.metrics.observe("summary", time.perf_counter() - started)
+        return updated_bp, end
+
+    def _commit_summary(self, updated_bp: str, end: int):
+        """Swap in the new knowledge covering the first `end` history entries"""
+        # On an empty answer the mark stays put so these steps are retried next time
+        if updated_bp:
+            self.best_practices = updated_bp.strip()
+            self._summary_mark = end
+            if self._checkpoint is not None:
+                self._checkpoint.write(self.execution_history, self.best_practices,
+                                       self.steps_counter, self._summary_mark)
 
     async def _call_llm_for_bp(self, prompt_text: str) -> str:
         """
@@ -387,27 +1171,14 @@ Make sure to avoid duplication and preserve important details.
         (запрашивает у модели текстовые Best Practices на основе prompt_text).
         """
         try:
-            if self.model_type == "local":
-                import openai
-                client = openai.OpenAI(
-                    base_url="http://127.0.0.1:1234/v1",
-                    api_key="lm-studio"
-                )
-            else:
-                from openai import OpenAI
-                client = OpenAI()
-
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt_text}],
-                    **self.generation_kwargs
-                )
-            )
+            response = await self._create_completion([{"role": "user", "content": prompt_text}],
+                                                     priority=PRIORITY_BACKGROUND)
 
             content = response.choices[0].message.content.strip()
             return content
+        except CacheMiss:
+            # Prompt drift during replay must surface, not be silently skipped
+            raise
         except Exception as e:
             print(f"Error calling LLM for best practices: {e}")
             return ""
@@ -0,0 +1,195 @@
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import itertools
+import math
+import time
+import weakref
+
+SPANS = ("prompt_build", "queue_wait", "llm", "parse", "tool", "summary")
+TOKEN_KINDS = ("prompt_tokens", "cached_tokens", "completion_tokens")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_processor_counter = itertools.count(1)
+
+
+def quantile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank quantile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class _Series:
+    """Count and sum of all observations plus a window of the most recent ones for quantiles"""
+
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.total = 0.0
+        self.samples: deque = deque(maxlen=max_samples)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        values = sorted(self.samples)
+        stats = {"count": self.count, "sum": self.total,
+                 "mean": self.total / self.count if self.count else 0.0}
+        for q in QUANTILES:
+            stats[f"p{int(q * 100)}"] = quantile(values, q)
+        return stats
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "command", "started")
+
+    def __init__(self, metrics: "Metrics", name: str, command: Optional[str]):
+        self.metrics = metrics
+        self.name = name
+        self.command = command
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, self.command)
+        return False
+
+
+class Metrics:
+    """Step timings and token counts of one processor"""
+
+    enabled = True
+
+    def __init__(self, name: Optional[str] = None, max_samples: int = 10000,
+                 registry: Optional["MetricsRegistry"] = None):
+        """
+        Args:
+            name: Processor label in stats and exported metrics (default: "processor-<n>")
+            max_samples: Number of recent observations per series used for quantiles
+            registry: Registry exported by the /metrics endpoint (default: DEFAULT_REGISTRY)
+        """
+        self.name = name or f"processor-{next(_processor_counter)}"
+        self.max_samples = max_samples
+        self.spans: Dict[str, _Series] = {}
+        self.commands: Dict[str, _Series] = {}
+        self.tokens: Dict[str, _Series] = {}
+        (registry if registry is not None else DEFAULT_REGISTRY).register(self)
+
+    def _series(self, table: Dict[str, _Series], key: str) -> _Series:
+        series = table.get(key)
+        if series is None:
+            series = table[key] = _Series(self.max_samples)
+        return series
+
+    def span(self, name: str, command: Optional[str] = None) -> _Span:
+        """Context manager timing a block as the given span"""
+        return _Span(self, name, command)
+
+    def observe(self, name: str, seconds: float, command: Optional[str] = None):
+        """Record a duration; tool durations are also kept per command"""
+        self._series(self.spans, name).add(seconds)
+        if command is not None:
+            self._series(self.commands, command).add(seconds)
+
+    def add_usage(self, usage: Dict[str, int]):
+        """Record the token counts of one LLM call"""
+        for kind in TOKEN_KINDS:
+            if kind in usage:
+                self._series(self.tokens, kind).add(usage[kind])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Count, sum, mean and p50/p95/p99 of every span, command and token count"""
+        return {
+            "processor": self.name,
+            "spans": {name: series.summary() for name, series in self.spans.items()},
+            "commands": {name: series.summary() for name, series in self.commands.items()},
+            "tokens": {kind: series.summary() for kind, series in self.tokens.items()},
+        }
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullMetrics:
+    """Metrics interface that records nothing, used when instrumentation is disabled"""
+
+    enabled = False
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+
+    def span(self, name: str, command: Optional[str] = None) -> _NullSpan:
+        return _NULL_SPAN
+
+    def observe(self, name: str, seconds: float, command: Optional[str] = None):
+        pass
+
+    def add_usage(self, usage: Dict[str, int]):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"processor": self.name, "spans": {}, "commands": {}, "tokens": {}}
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _summary_lines(metric: str, labels: Tuple[Tuple[str, str], ...], series: _Series) -> Iterable[str]:
+    label_text = ",".join(f'{key}="{_label_value(value)}"' for key, value in labels)
+    values = sorted(series.samples)
+    for q in QUANTILES:
+        yield f'{metric}{{{label_text},quantile="{q}"}} {quantile(values, q)}'
+    yield f"{metric}_sum{{{label_text}}} {series.total}"
+    yield f"{metric}_count{{{label_text}}} {series.count}"
+
+
+class MetricsRegistry:
+    """The live Metrics of all processors, exported in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: "weakref.WeakSet[Metrics]" = weakref.WeakSet()
+
+    def register(self, metrics: Metrics):
+        self._metrics.add(metrics)
+
+    def __iter__(self):
+        return iter(sorted(self._metrics, key=lambda m: m.name))
+
+    def render_prometheus(self) -> str:
+        metrics = list(self)
+        sections = [
+            ("fluxllm_span_seconds", "Time spent in each phase of a step", "span",
+             lambda m: m.spans),
+            ("fluxllm_command_seconds", "Tool execution time per command", "command",
+             lambda m: m.commands),
+            ("fluxllm_tokens", "Tokens per LLM call", "kind",
+             lambda m: m.tokens),
+        ]
+        lines = []
+        for metric, help_text, label, table in sections:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} summary")
+            for m in metrics:
+                for key, series in list(table(m).items()):
+                    lines.extend(_summary_lines(metric, (("processor", m.name), (label, key)), series))
+        return "\n".join(lines) + "\n"
+
+
+DEFAULT_REGISTRY = MetricsRegistry()
@@ -0,0 +1,396 @@
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import json
+
+from .tokens import estimate_tokens
+
+# Short field names used by the compact history encoding
+SHORT_KEYS = {
+    "timestamp": "ts",
+    "command_id": "id",
+    "command_name": "cmd",
+    "parameters": "params",
+    "result": "res",
+    "status": "st",
+    "context": "ctx",
+}
+
+DECISION_GUIDELINES = """## Decision Making Guidelines
+- Analyze the execution history to understand what has been tried
+- Consider the current state in relation to the goal
+- Choose ONE next action that brings you closer to the goal
+- Provide clear reasoning for why this specific action is the best next step
+- Do not try to plan multiple steps ahead - focus only on the immediate next action"""
+
+RESPONSE_FORMAT = """## Your Response Format
+Analyze the current state and provide a single next action. Your response must be a JSON object:
+
+{
+  "analysis": {
+    "current_situation": "Brief assessment of the current state",
+    "history_consideration": "How past actions influence this decision",
+    "reasoning": "Detailed explanation of why this specific action is the best next step"
+  },
+  "action": {
+    "command_id": 0,
+    "parameters": {
+      // Parameters for the chosen command
+    },
+    "expected_outcome": "What you expect this action to achieve towards the goal"
+  }
+}"""
+
+MULTI_ACTION_GUIDELINES = """## Decision Making Guidelines
+- Analyze the execution history to understand what has been tried
+- Consider the current state in relation to the goal
+- Plan a short ordered list of actions (at most {max_actions}) that brings you closer to the goal
+- Only include later actions whose outcome you can predict with confidence; when unsure, return a single action
+- Actions run in order; execution stops at the first failed action or when the goal is reached
+- Provide clear reasoning for why this plan is the best next step"""
+
+MULTI_ACTION_RESPONSE_FORMAT = """## Your Response Format
+Analyze the current state and provide the next actions. Your response must be a JSON object:
+
+{
+  "analysis": {
+    "current_situation": "Brief assessment of the current state",
+    "history_consideration": "How past actions influence this decision",
+    "reasoning": "Detailed explanation of why these actions are the best next steps"
+  },
+  "actions": [
+    {
+      "command_id": 0,
+      "parameters": {
+        // Parameters for the chosen command
+      },
+      "expected_outcome": "What you expect this action to achieve towards the goal"
+    }
+  ]
+}"""
+
+
+TOOLS_RESPONSE_FORMAT = """## Your Response Format
+Briefly state your assessment of the current situation, how past actions influence this decision
+and your reasoning as plain text, then call the tool of the single best next action."""
+
+MULTI_ACTION_TOOLS_RESPONSE_FORMAT = """## Your Response Format
+Briefly state your assessment of the current situation, how past actions influence this decision
+and your reasoning as plain text, then call the tools of the planned actions in order."""
+
+OUTPUT_MODES = ("text", "tools", "json_schema")
+
+
+def entry_to_dict(entry) -> Dict[str, Any]:
+    """Convert history entry to dictionary for prompt generation"""
+    return {
+        "timestamp": entry.timestamp.isoformat(),
+        "command_id": entry.command_id,
+        "command_name": entry.command_name,
+        "parameters": entry.parameters,
+        "result": entry.result,
+        "status": entry.status,
+        "context": entry.context
+    }
+
+
+class PromptBuilder:
+    """Assemble LLM prompts from precompiled static sections and cached history fragments.
+
+    The functions catalog and goal are serialized once. Each history entry is
+    serialized once, when it is added, and the prompt is built by joining the
+    cached pieces.
+    """
+
+    def __init__(self, functions: Dict, goal: Dict, history_size: int,
+                 compact: bool = False, short_keys: bool = False,
+                 cache_size: Optional[int] = None,
+                 multi_action: bool = False, max_actions: int = 5,
+                 max_prompt_tokens: Optional[int] = None,
+                 max_result_chars: Optional[int] = None,
+                 max_context_chars: Optional[int] = None,
+                 compress_history: bool = False,
+                 output_mode: str = "text"):
+        """
+        Args:
+            functions: Parsed functions configuration
+            goal: Parsed goal configuration
+            history_size: Number of recent actions to include in the prompt
+            compact: Serialize JSON without indentation
+            short_keys: Use short field names for history entries
+            cache_size: Number of serialized entries to keep (default: 2 * history_size)
+            multi_action: Ask for an ordered list of actions instead of a single one
+            max_actions: Maximum number of actions per response in multi-action mode
+            max_prompt_tokens: Fill history newest-first up to this estimated prompt size
+                instead of taking the last history_size entries
+            max_result_chars: Truncate serialized results longer than this
+            max_context_chars: Truncate reasoning contexts longer than this
+            compress_history: Collapse runs of identical entries into one with a repeat
+                count and encode results as diffs against the previous result of the
+                same command when that is shorter
+            output_mode: "tools" asks for native tool calls instead of a JSON reply
+                ("text" and "json_schema" both describe the JSON reply)
+        """
+        self.history_size = history_size
+        self.compact = compact
+        self.short_keys = short_keys
+        self.cache_size = cache_size or max(2 * history_size, 1)
+        self._fragments: "OrderedDict[int, tuple]" = OrderedDict()
+        self.multi_action = multi_action
+        self.max_actions = max_actions
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_result_chars = max_result_chars
+        self.max_context_chars = max_context_chars
+        self.compress_history = compress_history
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {output_mode}")
+        self.output_mode = output_mode
+        self._compressed: "OrderedDict[int, tuple]" = OrderedDict()
+
+        self.functions_json = self._dumps(functions)
+        self.goal_json = self._dumps(goal)
+        self._compile_sections()
+
+    def _dumps(self, value: Any) -> str:
+        if self.compact:
+            return json.dumps(value, separators=(",", ":"))
+        return json.dumps(value, indent=2)
+
+    def _compile_sections(self):
+        """Pre-render the parts of the prompt that never change during a run"""
+        if self.max_prompt_tokens is None:
+            history_title = f"## Execution History (Last N={self.history_size} Actions)"
+        else:
+            history_title = "## Execution History (Most Recent Actions)"
+        if self.short_keys:
+            legend = ", ".join(f"{short}={full}" for full, short in SHORT_KEYS.items())
+            history_title += f"\nKeys: {legend}"
+        if self.compress_history:
+            history_title += (
+                '\nIdentical consecutive entries are collapsed into the last one with a "repeat" count. '
+                '"result_diff" replaces "result" and lists only the result fields that changed '
+                "since the previous entry of the same command."
+            )
+
+        if self.multi_action:
+            guidelines = MULTI_ACTION_GUIDELINES.replace("{max_actions}", str(self.max_actions))
+            response_format = MULTI_ACTION_RESPONSE_FORMAT
+        else:
+            guidelines = DECISION_GUIDELINES
+            response_format = RESPONSE_FORMAT
+        if self.output_mode == "tools":
+            response_format = MULTI_ACTION_TOOLS_RESPONSE_FORMAT if self.multi_action else TOOLS_RESPONSE_FORMAT
+
+        self._head = "# LLM Processor Task\n\n## Best Practices, Useful Findings and Extracted Helpful Knowledge\n"
+        self._middle = (
+            f"\n\n{guidelines}\n\n"
+            f"## Available Commands\n{self.functions_json}\n\n"
+            f"## Goal Configuration\n{self.goal_json}\n\n"
+            f"{history_title}\n"
+        )
+        self._tail = f"\n\n{response_format}"
+
+        # Cache-friendly layout: a byte-stable system prefix ordered from least to
+        # most volatile, followed by a user message with knowledge and history
+        self.system_prompt = (
+            "# LLM Processor Task\n\n"
+            f"{guidelines}\n\n"
+            f"{response_format}\n\n"
+            f"## Available Commands\n{self.functions_json}\n\n"
+            f"## Goal Configuration\n{self.goal_json}"
+        )
+        self._user_head = "## Best Practices, Useful Findings and Extracted Helpful Knowledge\n"
+        self._user_middle = f"\n\n{history_title}\n"
+        if self.output_mode == "tools":
+            self._user_tail = "\n\nRespond as described in the response format."
+        else:
+            self._user_tail = "\n\nRespond with the JSON object described in the response format."
+
+        # Estimated size of everything except knowledge and history
+        self.static_tokens = max(
+            estimate_tokens(self._head + self._middle + self._tail),
+            estimate_tokens(self.system_prompt + self._user_head + self._user_middle + self._user_tail),
+        )
+
+    def entry_dict(self, entry) -> Dict[str, Any]:
+        """Dictionary form of an entry in the configured key style"""
+        data = entry_to_dict(entry)
+        if self.max_prompt_tokens is not None:
+            data["timestamp"] = entry.timestamp.isoformat(timespec="seconds")
+        if self.max_context_chars is not None and len(data["context"] or "") > self.max_context_chars:
+            data["context"] = data["context"][:self.max_context_chars] + "..."
+        if self.max_result_chars is not None:
+            data["result"] = self._truncate_result(data["result"])
+        if self.short_keys:
+            return {SHORT_KEYS[key]: value for key, value in data.items()}
+        return data
+
+    def _truncate_result(self, result: Any) -> Any:
+        """Replace an oversized result payload with its status and a preview"""
+        text = json.dumps(result, separators=(",", ":"), default=str)
+        if len(text) <= self.max_result_chars:
+            return result
+        truncated = {
+            "truncated": text[:self.max_result_chars] + "...",
+            "original_chars": len(text),
+        }
+        if isinstance(result, dict) and "status" in result:
+            truncated = {"status": result["status"], **truncated}
+        return truncated
+
+    def _serialize_entry(self, entry) -> str:
+        return self._format_fragment(self.entry_dict(entry))
+
+    def _format_fragment(self, data: Dict[str, Any]) -> str:
+        if self.compact:
+            return json.dumps(data, separators=(",", ":"))
+        # Indent one level so joined fragments match json.dumps(list, indent=2)
+        text = json.dumps(data, indent=2)
+        return "  " + text.replace("\n", "\n  ")
+
+    def add_entry(self, entry) -> str:
+        """Serialize a new history entry and cache its prompt fragment"""
+        return self._cache_entry(entry)[1]
+
+    def _cache_entry(self, entry) -> tuple:
+        fragment = self._serialize_entry(entry)
+        signature = None
+        if self.compress_history:
+            signature = json.dumps([entry.command_name, entry.parameters, entry.result],
+                                   sort_keys=True, default=str)
+        # Keep a reference to the entry so its id() cannot be reused while cached
+        cached = (entry, fragment, estimate_tokens(fragment) + 1, signature)
+        self._fragments[id(entry)] = cached
+        while len(self._fragments) > self.cache_size:
+            self._fragments.popitem(last=False)
+        return cached
+
+    def _cached(self, entry) -> tuple:
+        cached = self._fragments.get(id(entry))
+        if cached is not None and cached[0] is entry:
+            return cached
+        return self._cache_entry(entry)
+
+    def fragment(self, entry) -> str:
+        """Cached prompt fragment of an entry, serializing it on a cache miss"""
+        return self._cached(entry)[1]
+
+    def _compressed_fragment(self, entry, previous, repeat: int) -> str:
+        """Fragment of an entry with a repeat count and a result diff against `previous`"""
+        cached = self._compressed.get(id(entry))
+        if cached is not None and cached[0] is entry and cached[1] is previous and cached[2] == repeat:
+            return cached[3]
+
+        data = self.entry_dict(entry)
+        result_key = SHORT_KEYS["result"] if self.short_keys else "result"
+        if previous is not None and isinstance(entry.result, dict) and isinstance(previous.result, dict):
+            diff: Dict[str, Any] = {
+                "changed": {k: v for k, v in entry.result.items()
+                            if k not in previous.result or previous.result[k] != v}
+            }
+            removed = [k for k in previous.result if k not in entry.result]
+            if removed:
+                diff["removed"] = removed
+            if len(json.dumps(diff, default=str)) < len(json.dumps(data[result_key], default=str)):
+                del data[result_key]
+                data["result_diff"] = diff
+        if repeat > 1:
+            data["repeat"] = repeat
+
+        fragment = self._format_fragment(data)
+        self._compressed[id(entry)] = (entry, previous, repeat, fragment)
+        while len(self._compressed) > self.cache_size:
+            self._compressed.popitem(last=False)
+        return fragment
+
+    def _history_fragments(self, history: List) -> List[str]:
+        if not self.compress_history:
+            return [self.fragment(entry) for entry in history]
+
+        fragments = []
+        last_by_command: Dict[str, Any] = {}
+        i = 0
+        while i < len(history):
+            signature = self._cached(history[i])[3]
+            j = i + 1
+            while j < len(history) and self._cached(history[j])[3] == signature:
+                j += 1
+            entry = history[j - 1]
+            previous = last_by_command.get(entry.command_name)
+            if j - i == 1 and previous is None:
+                fragments.append(self.fragment(entry))
+            else:
+                fragments.append(self._compressed_fragment(entry, previous, j - i))
+            last_by_command[entry.command_name] = entry
+            i = j
+        return fragments
+
+    def select_history(self, history, best_practices: str, pending=None, oldest: int = 0) -> List:
+        """Pick the newest entries that fit into the prompt token budget.
+
+        Args:
+            history: Full execution history (indexable, oldest first)
+            best_practices: Knowledge text that shares the budget
+            pending: An entry not yet in history that is treated as the newest one
+            oldest: Index of the oldest entry that may be selected
+        """
+        budget = self.max_prompt_tokens - self.static_tokens - estimate_tokens(best_practices)
+        selected = []
+        used = 0
+        candidates = ([pending] if pending is not None else [])
+        index = len(history) - 1
+        while True:
+            if candidates:
+                entry = candidates.pop()
+            elif index >= oldest:
+                entry = history[index]
+                index -= 1
+            else:
+                break
+            cached = self._cached(entry)
+            cost = cached[2]
+            if self.compress_history and selected and cached[3] == self._cached(selected[-1])[3]:
+                # Collapsed into the newer identical entry as a repeat count
+                cost = 1
+            # The newest entry is always shown, even when it alone exceeds the budget
+            if selected and used + cost > budget:
+                break
+            selected.append(entry)
+            used += cost
+        if len(selected) > self.cache_size // 2:
+            # Grow the cache so a large window is not re-serialized on every step
+            self.cache_size = 2 * len(selected)
+        selected.reverse()
+        return selected
+
+    def render_history(self, history: List) -> str:
+        """Render history entries as a JSON array from cached fragments"""
+        if not history:
+            return "[]"
+        fragments = self._history_fragments(history)
+        if self.compact:
+            return "[" + ",".join(fragments) + "]"
+        return "[\n" + ",\n".join(fragments) + "\n]"
+
+    def build(self, history: List, best_practices: str) -> str:
+        """Assemble the full prompt for the given history window"""
+        return "".join((
+            self._head,
+            best_practices,
+            self._middle,
+            self.render_history(history),
+            self._tail,
+        ))
+
+    def build_messages(self, history: List, best_practices: str) -> List[Dict[str, str]]:
+        """Assemble chat messages with a stable system prefix and a volatile user tail"""
+        user_prompt = "".join((
+            self._user_head,
+            best_practices,
+            self._user_middle,
+            self.render_history(history),
+            self._user_tail,
+        ))
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
@@ -0,0 +1,175 @@
+from typing import Optional, Callable, Awaitable, Any, List
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+# Priority classes: lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is still throttled after all retries"""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an exception is an HTTP 429 from the LLM provider"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After delay from a rate limit error, if the provider sent one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(float(value) * scale, 0.0)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute / 60` units per second"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute limiter for LLM calls.
+
+    Waiting requests are served in priority order, so interactive agents go
+    ahead of background summarization. Throttled requests are retried with
+    jittered exponential backoff that honours Retry-After.
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        """
+        Args:
+            requests_per_minute: Request limit (None: unlimited)
+            tokens_per_minute: Prompt plus completion token limit (None: unlimited)
+            max_retries: Retries of a throttled request before RateLimitExceeded
+            base_delay: First backoff delay in seconds
+            max_delay: Upper bound for a single backoff delay
+        """
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queue: List[list] = []
+        self._counter = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self._blocked_until = 0.0
+        self.throttled_count = 0
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so the limiter can be constructed outside an event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _wait_time(self, tokens: float) -> float:
+        now = time.monotonic()
+        wait = max(self._blocked_until - now, 0.0)
+        if self._requests:
+            self._requests.refill(now)
+            wait = max(wait, self._requests.wait_time(1))
+        if self._tokens:
+            self._tokens.refill(now)
+            wait = max(wait, self._tokens.wait_time(min(tokens, self._tokens.capacity)))
+        return wait
+
+    def _consume(self, tokens: float):
+        if self._requests:
+            self._requests.level -= 1
+        if self._tokens:
+            self._tokens.level -= min(tokens, self._tokens.capacity)
+
+    async def acquire(self, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE):
+        """Wait until a request of the given size fits into the limits"""
+        condition = self._get_condition()
+        entry = [priority, next(self._counter)]
+        async with condition:
+            heapq.heappush(self._queue, entry)
+            # A new head may have arrived; let the current head re-check
+            condition.notify_all()
+            try:
+                while True:
+                    if self._queue[0] is entry:
+                        wait = self._wait_time(tokens)
+                        if wait <= 0:
+                            self._consume(tokens)
+                            heapq.heappop(self._queue)
+                            return
+                    else:
+                        wait = None
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                raise
+            finally:
+                condition.notify_all()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage of a request is known"""
+        if self._tokens and actual_tokens:
+            self._tokens.level -= actual_tokens - min(estimated_tokens, self._tokens.capacity)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay * 0.1)
+        # Full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, request: Callable[[], Awaitable[Any]], tokens: int = 0,
+                  priority: int = PRIORITY_INTERACTIVE) -> Any:
+        """Run a request within the limits, retrying it while the provider throttles"""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(tokens, priority)
+            try:
+                return await request()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self.throttled_count += 1
+                if attempt == self.max_retries:
+                    raise RateLimitExceeded(f"Still rate limited after {self.max_retries} retries") from e
+                delay = self._backoff(attempt, e)
+                # Hold back every caller sharing this limiter, not only this one
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                print(f"Rate limited by LLM provider, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
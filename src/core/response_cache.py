@@ -0,0 +1,117 @@
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import hashlib
+import json
+import re
+import time
+
+CACHE_MODES = ("record", "replay", "passthrough")
+
+# History entries carry wall-clock timestamps; they are masked in cache keys so that
+# the same conversation replays on a later run
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:[+-]\d{2}:\d{2})?")
+
+
+class CacheMiss(KeyError):
+    """Raised in replay mode when a request has no recorded response"""
+
+
+def _to_plain(value: Any) -> Any:
+    """Convert an SDK response object into JSON-compatible data"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        return {k: _to_plain(v) for k, v in vars(value).items()}
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(v) for v in value]
+    return value
+
+
+def _to_namespace(value: Any) -> Any:
+    """Rebuild attribute access (response.choices[0].message.content) from stored data"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+class ResponseCache:
+    """On-disk cache of LLM responses for offline, deterministic runs.
+
+    Modes:
+        record: serve recorded responses and record the ones that are missing
+        replay: serve recorded responses only; a missing one raises CacheMiss
+        passthrough: always call the LLM, the store is not touched
+    """
+
+    def __init__(self, path: str, mode: str = "record"):
+        """
+        Args:
+            path: SQLite database file
+            mode: One of "record", "replay", "passthrough"
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        import sqlite3
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+        """Hash of the model, messages and generation kwargs of a request"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "kwargs": kwargs},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(_TIMESTAMP_RE.sub("<timestamp>", payload).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the recorded response for a key, or None"""
+        row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return _to_namespace(json.loads(row[0]))
+
+    def put(self, key: str, model: str, response: Any):
+        """Record a response"""
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, created) VALUES (?, ?, ?, ?)",
+            (key, model, json.dumps(_to_plain(response), default=str), time.time()),
+        )
+        self._db.commit()
+
+    async def fetch(self, model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any],
+                    request: Callable[[], Awaitable[Any]]) -> Any:
+        """Serve a request from the cache according to the mode, calling the LLM when allowed"""
+        if self.mode == "passthrough":
+            return await request()
+
+        key = self.make_key(model, messages, kwargs)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded LLM response for request {key[:12]} (model {model})")
+
+        response = await request()
+        self.put(key, model, response)
+        return response
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,16 @@
+from typing import Dict, List
+
+# Rough average for English text and JSON with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate without a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate prompt tokens of a chat completion request"""
+    return sum(estimate_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages) + 2
@@ -0,0 +1,76 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+import asyncio
+import functools
+
+# Where a command implementation runs:
+#   inline  - called directly on the event loop (async implementations always run here)
+#   thread  - a thread pool, the default for sync implementations
+#   process - a process pool for CPU-heavy work; the implementation must be a picklable
+#             module-level function and only sees a copy of the state it closes over
+EXECUTORS = ("inline", "thread", "process")
+
+
+def check_executor(kind: Optional[str]) -> Optional[str]:
+    """Validate an executor name; None leaves the choice to the implementation type"""
+    if kind is not None and kind not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {kind} (expected one of {', '.join(EXECUTORS)})")
+    return kind
+
+
+def resolve_executor(implementation: Callable, kind: Optional[str] = None) -> str:
+    """Executor an implementation runs on, given the declared one (if any)"""
+    is_async = asyncio.iscoroutinefunction(implementation)
+    if kind is None:
+        return "inline" if is_async else "thread"
+    if is_async and kind != "inline":
+        raise ValueError(f"Async implementations run on the event loop, not in a {kind} pool")
+    return kind
+
+
+class ToolExecutor:
+    """Thread and process pools that run sync tool implementations off the event loop.
+
+    Pools are created on first use, so processors whose tools are all async or
+    inline never start a thread or process. One ToolExecutor can be shared by
+    several processors to bound the total number of workers.
+    """
+
+    def __init__(self, thread_workers: Optional[int] = None, process_workers: Optional[int] = None):
+        """
+        Args:
+            thread_workers: Size of the thread pool (default: the ThreadPoolExecutor default)
+            process_workers: Size of the process pool (default: the number of CPUs)
+        """
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._pools: Dict[str, Executor] = {}
+
+    def _pool(self, kind: str) -> Executor:
+        pool = self._pools.get(kind)
+        if pool is None:
+            if kind == "thread":
+                pool = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="fluxllm-tool")
+            else:
+                # Imported on demand, it pulls in multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                pool = ProcessPoolExecutor(self.process_workers)
+            self._pools[kind] = pool
+        return pool
+
+    async def run(self, kind: str, implementation: Callable, parameters: Dict[str, Any]) -> Any:
+        """Run an implementation on the given executor and return its result"""
+        if kind == "inline":
+            if asyncio.iscoroutinefunction(implementation):
+                return await implementation(parameters)
+            return implementation(parameters)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(kind), functools.partial(implementation, parameters))
+
+    def close(self, wait: bool = True):
+        """Shut the pools down; they are recreated if the executor is used again"""
+        pools = list(self._pools.values())
+        self._pools.clear()
+        for pool in pools:
+            pool.shutdown(wait=wait)
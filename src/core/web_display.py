@@ -1,8 +1,12 @@
-from flask import Flask, render_template_string
+from typing import Dict, Any, List, Optional
+import itertools
+import json
+import queue
 import threading
+import time
 import webbrowser
-from flask_cors import CORS
-import os
+
+from .metrics import DEFAULT_REGISTRY
 
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -25,70 +29,389 @@ HTML_TEMPLATE = '''
             padding: 15px;
             border-radius: 5px;
         }
-        h1 {
+        h1, h2 {
             color: #569cd6;
         }
+        #events {
+            max-height: 300px;
+            overflow-y: auto;
+        }
+        .event-action { color: #dcdcaa; }
+        .event-result { color: #9cdcfe; }
+        .event-failed { color: #f48771; }
     </style>
     <script>
-        function refreshContent() {
-            fetch('http://127.0.0.1:5000/prompt', {
-                method: 'GET',
-                headers: {
-                    'Accept': 'text/plain',
-                },
-            })
-            .then(response => response.text())
-            .then(data => {
-                document.getElementById('prompt-content').innerHTML = data;
-            })
-            .catch(error => console.error('Error:', error));
+        let source = null;
+        let prompt = "";
+
+        function addEvent(kind, text, extraClass) {
+            const log = document.getElementById('events');
+            const line = document.createElement('div');
+            line.className = 'event-' + kind + (extraClass ? ' ' + extraClass : '');
+            line.textContent = text;
+            log.prepend(line);
+            while (log.childNodes.length > 200) {
+                log.removeChild(log.lastChild);
+            }
+        }
+
+        function connect(channel) {
+            if (source) {
+                source.close();
+            }
+            prompt = "";
+            document.getElementById('prompt-content').textContent = "";
+            document.getElementById('events').textContent = "";
+            source = new EventSource('/events?channel=' + encodeURIComponent(channel));
+            source.addEventListener('snapshot', e => {
+                prompt = JSON.parse(e.data).prompt;
+                document.getElementById('prompt-content').textContent = prompt;
+            });
+            source.addEventListener('prompt', e => {
+                const d = JSON.parse(e.data);
+                // Splice the changed middle part into the previous prompt
+                prompt = prompt.slice(0, d.start) + d.text + prompt.slice(prompt.length - d.suffix);
+                document.getElementById('prompt-content').textContent = prompt;
+            });
+            source.addEventListener('action', e => {
+                const d = JSON.parse(e.data);
+                addEvent('action', 'action ' + JSON.stringify(d.actions || d.action) +
+                         ' (' + d.llm_seconds.toFixed(2) + 's)');
+            });
+            source.addEventListener('result', e => {
+                const d = JSON.parse(e.data);
+                addEvent('result', '#' + d.step + ' ' + d.command + ' -> ' + JSON.stringify(d.result) +
+                         ' (' + d.tool_seconds.toFixed(3) + 's)', d.status === 'failed' ? 'event-failed' : '');
+            });
         }
-        // Refresh every 2 seconds
-        setInterval(refreshContent, 2000);
+
+        function loadChannels() {
+            fetch('/channels')
+                .then(response => response.json())
+                .then(channels => {
+                    const select = document.getElementById('channel');
+                    const current = select.value;
+                    select.textContent = "";
+                    channels.forEach(name => {
+                        const option = document.createElement('option');
+                        option.value = option.textContent = name;
+                        select.appendChild(option);
+                    });
+                    if (current && channels.includes(current)) {
+                        select.value = current;
+                    } else if (channels.length) {
+                        select.value = channels[0];
+                        connect(channels[0]);
+                    }
+                });
+        }
+
+        window.addEventListener('load', () => {
+            document.getElementById('channel').addEventListener('change', e => connect(e.target.value));
+            loadChannels();
+            // The channel list only changes when processors are added
+            setInterval(loadChannels, 10000);
+        });
     </script>
 </head>
 <body>
     <h1>LLM Processor Prompt</h1>
-    <pre id="prompt-content">{{ prompt }}</pre>
+    <select id="channel"></select>
+    <h2>Events</h2>
+    <div id="events"></div>
+    <h2>Prompt</h2>
+    <pre id="prompt-content"></pre>
 </body>
 </html>
 '''
 
+# Seconds between keep-alive comments on idle event streams
+HEARTBEAT_INTERVAL = 15.0
+
+
+def _common_length(old: str, new: str, limit: int, from_end: bool = False) -> int:
+    """Length of the common prefix (or suffix) of two strings, at most `limit`.
+
+    Binary search over slice comparisons, so the characters are compared in C
+    rather than one by one in Python.
+    """
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if from_end:
+            same = old[len(old) - mid:len(old) - low] == new[len(new) - mid:len(new) - low]
+        else:
+            same = old[low:mid] == new[low:mid]
+        if same:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def prompt_diff(old: str, new: str) -> Dict[str, Any]:
+    """Describe `new` as `old` with its middle replaced.
+
+    Consecutive prompts share the static prefix and usually most of the history,
+    so only the changed span is sent: new == old[:start] + text + old[len(old) - suffix:].
+    """
+    limit = min(len(old), len(new))
+    start = _common_length(old, new, limit)
+    suffix = _common_length(old, new, limit - start, from_end=True)
+    return {"start": start, "suffix": suffix, "text": new[start:len(new) - suffix]}
+
+
+def apply_prompt_diff(old: str, diff: Dict[str, Any]) -> str:
+    """Inverse of prompt_diff"""
+    return old[:diff["start"]] + diff["text"] + old[len(old) - diff["suffix"]:]
+
+
+class _Subscriber:
+    def __init__(self, max_queue: int):
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        # Set when events were dropped; the stream then resends a full snapshot
+        self.overflowed = False
+
+
+class EventHub:
+    """Thread-safe fan-out of display events to the subscribers of each channel.
+
+    Every processor publishes to its own channel. The hub keeps the latest
+    prompt of each channel so that new subscribers start from a snapshot and
+    then receive only prompt diffs.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._prompts: Dict[str, str] = {}
+        self._subscribers: Dict[str, List[_Subscriber]] = {}
+        self._counter = itertools.count(1)
+
+    def channel(self, name: Optional[str] = None) -> "DisplayChannel":
+        """Register a channel; a name like "agent-3" is chosen if none is given"""
+        with self._lock:
+            if name is None:
+                name = f"agent-{next(self._counter)}"
+            self._prompts.setdefault(name, "")
+            self._subscribers.setdefault(name, [])
+        return DisplayChannel(self, name)
+
+    def channels(self) -> List[str]:
+        with self._lock:
+            return list(self._prompts)
+
+    def prompt(self, channel: str) -> str:
+        """Latest prompt of a channel"""
+        with self._lock:
+            return self._prompts.get(channel, "")
+
+    def publish(self, channel: str, event: str, data: Dict[str, Any]):
+        """Send an event to the current subscribers of a channel"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        self._deliver(subscribers, event, data)
+
+    def publish_prompt(self, channel: str, prompt: str):
+        """Record the latest prompt and send subscribers only what changed"""
+        with self._lock:
+            previous = self._prompts.get(channel, "")
+            if prompt == previous:
+                return
+            self._prompts[channel] = prompt
+            subscribers = list(self._subscribers.setdefault(channel, []))
+        if subscribers:
+            self._deliver(subscribers, "prompt", prompt_diff(previous, prompt))
+
+    @staticmethod
+    def _deliver(subscribers: List[_Subscriber], event: str, data: Dict[str, Any]):
+        if not subscribers:
+            return
+        message = (event, json.dumps(data, default=str))
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.overflowed = True
+
+    def subscribe(self, channel: str) -> _Subscriber:
+        subscriber = _Subscriber(self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+            self._prompts.setdefault(channel, "")
+        return subscriber
+
+    def unsubscribe(self, channel: str, subscriber: _Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+
+    def stream(self, channel: str, heartbeat: float = HEARTBEAT_INTERVAL):
+        """Server-sent event stream of a channel, starting with a snapshot of its prompt"""
+        subscriber = self.subscribe(channel)
+        try:
+            yield _sse("snapshot", json.dumps({"prompt": self.prompt(channel)}))
+            while True:
+                if subscriber.overflowed:
+                    # The client fell behind; diffs against what it has are no longer valid
+                    with subscriber.queue.mutex:
+                        subscriber.queue.queue.clear()
+                    subscriber.overflowed = False
+                    yield _sse("snapshot", json.dumps({"prompt": self.prompt(channel)}))
+                try:
+                    event, data = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event, data)
+        finally:
+            self.unsubscribe(channel, subscriber)
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class DisplayChannel:
+    """Publishing handle of one processor"""
+
+    def __init__(self, hub: EventHub, name: str):
+        self.hub = hub
+        self.name = name
+
+    def prompt(self, prompt: str):
+        self.hub.publish_prompt(self.name, prompt)
+
+    def event(self, event: str, **data):
+        data.setdefault("time", time.time())
+        self.hub.publish(self.name, event, data)
+
+
 class PromptDisplay:
-    def __init__(self, port=5000):
-        self.app = Flask(__name__)
-        CORS(self.app, resources={r"/*": {"origins": "*"}})  # More permissive CORS
+    """Live web view of the prompts and steps of one or many processors.
+
+    Updates are pushed to the browser over server-sent events: prompt diffs,
+    chosen actions, tool results and timings. /metrics exports the step
+    metrics of all processors for Prometheus. Flask is only imported when the
+    server is started.
+    """
+
+    def __init__(self, port=5000, host: str = "127.0.0.1", headless: bool = False,
+                 hub: Optional[EventHub] = None):
+        """
+        Args:
+            port: Port to serve on (0 picks a free port, see `url` after start())
+            host: Interface to bind (localhost only by default)
+            headless: Serve without opening a browser window
+            hub: Event hub to serve (default: a new one)
+        """
         self.port = port
-        self.current_prompt = ""
-        
-        @self.app.route('/')
+        self.host = host
+        self.headless = headless
+        self.hub = hub or EventHub()
+        self.app = None
+        self._server = None
+        self.server_thread: Optional[threading.Thread] = None
+        self._default_channel: Optional[DisplayChannel] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def current_prompt(self) -> str:
+        return self.hub.prompt(self._channel().name)
+
+    def _channel(self) -> DisplayChannel:
+        if self._default_channel is None:
+            self._default_channel = self.hub.channel("default")
+        return self._default_channel
+
+    def channel(self, name: Optional[str] = None) -> DisplayChannel:
+        """Channel for one processor on this display"""
+        return self.hub.channel(name)
+
+    def update_prompt(self, prompt: str):
+        """Publish a prompt on the default channel"""
+        self._channel().prompt(prompt)
+
+    def _create_app(self):
+        from flask import Flask, Response, render_template_string, request, jsonify
+
+        app = Flask(__name__)
+        try:
+            from flask_cors import CORS
+            CORS(app, resources={r"/*": {"origins": "*"}})
+        except ImportError:
+            pass
+        hub = self.hub
+
+        @app.route('/')
         def home():
-            return render_template_string(HTML_TEMPLATE, prompt=self.current_prompt)
-            
-        @self.app.route('/prompt')
+            return render_template_string(HTML_TEMPLATE)
+
+        @app.route('/channels')
+        def get_channels():
+            return jsonify(hub.channels())
+
+        @app.route('/prompt')
         def get_prompt():
-            return self.current_prompt
-            
-    def update_prompt(self, prompt: str):
-        self.current_prompt = prompt
-        
+            channel = request.args.get('channel')
+            if channel is None:
+                channels = hub.channels()
+                channel = "default" if "default" in channels or not channels else channels[0]
+            return Response(hub.prompt(channel), mimetype='text/plain')
+
+        @app.route('/metrics')
+        def metrics():
+            return Response(DEFAULT_REGISTRY.render_prometheus(),
+                            mimetype='text/plain; version=0.0.4')
+
+        @app.route('/events')
+        def events():
+            channel = request.args.get('channel', 'default')
+            return Response(hub.stream(channel), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        return app
+
     def start(self):
+        """Start serving in a background thread; returns once the port is bound"""
+        if self._server is not None:
+            return
+        from werkzeug.serving import make_server
+
+        self.app = self._create_app()
+        self._server = make_server(self.host, self.port, self.app, threaded=True)
+        self.port = self._server.server_port
+
         def run_server():
-            # More permissive server configuration
-            self.app.run(
-                host='127.0.0.1',  # Localhost only
-                port=self.port,
-                debug=False,
-                threaded=True,
-                ssl_context=None  # Disable SSL for local development
-            )
-            
+            if not self.headless:
+                webbrowser.open(self.url)
+            self._server.serve_forever()
+
         self.server_thread = threading.Thread(target=run_server, daemon=True)
         self.server_thread.start()
-        
-        # Give the server a moment to start
-        import time
-        time.sleep(1)
-        
-        # Open in default browser
-        webbrowser.open(f'http://127.0.0.1:{self.port}') 
\ No newline at end of file
+
+    def stop(self):
+        """Stop the server"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+_shared_displays: Dict[int, PromptDisplay] = {}
+
+
+def get_shared_display(port: int = 5000, headless: bool = False) -> PromptDisplay:
+    """One started display per port, shared by all processors that show their prompts"""
+    display = _shared_displays.get(port)
+    if display is None:
+        display = PromptDisplay(port=port, headless=headless)
+        display.start()
+        _shared_displays[port] = display
+    elif display.headless != headless:
+        # The browser is only opened (or not) when the server starts
+        raise ValueError(f"The display on port {port} was already started with headless={display.headless}")
+    return display
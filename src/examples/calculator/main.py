@@ -4,18 +4,16 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from core.llm_processor import LLMProcessor
+from core.history_index import index_of
 
 def is_goal_achieved(history) -> bool:
     """Check if calculation goal is achieved"""
-    try:
-        # Find submission with correct result
-        submit = next(entry for entry in history 
-                     if entry.command_name == 'submit_result' 
-                     and entry.result['status'] == 'success'
-                     and entry.parameters['value'] == 14)
-        return True
-    except StopIteration:
-        return False
+    # Find submission with correct result
+    submit = index_of(history).first(('submit_result', 14), lambda entry: (
+        entry.command_name == 'submit_result'
+        and entry.result['status'] == 'success'
+        and entry.parameters.get('value') == 14))
+    return submit is not None
 
 async def initialize_processor():
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -6,6 +6,7 @@ import os
 # Add the src directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from core.llm_processor import LLMProcessor
+from core.history_index import index_of
 from typing import Dict, Any
 
 def check_command_possibility(history, command_name: str) -> tuple[bool, str]:
@@ -13,33 +14,23 @@ def check_command_possibility(history, command_name: str) -> tuple[bool, str]:
     # Skip checks for power and throttle commands
     if command_name in ['power_coffee_machine', 'throttle']:
         return True, ""
-        
+
+    index = index_of(history)
     # Check if machine is powered on
-    last_power = next((entry for entry in reversed(history) 
-                      if entry.command_name == 'power_coffee_machine' 
-                      and entry.result['status'] == 'success'), None)
+    last_power = index.last_success('power_coffee_machine')
     if not last_power or last_power.parameters.get('power') != 'on':
         return False, "Machine is not powered on"
 
     if command_name == 'add_coffee':
-        # Calculate total heating time from throttle commands after power on
-        total_heating_time = 0
-        for entry in history:
-            if (entry.command_name == 'throttle' 
-                and entry.result['status'] == 'accepted'
-                and entry.timestamp > last_power.timestamp
-                and 'wait_time' in entry.parameters):
-                total_heating_time += entry.parameters['wait_time']
-        
+        # Total heating time from throttle commands after power on
+        total_heating_time = index.parameter_sum('throttle', 'wait_time',
+                                                 since=last_power.timestamp, status='accepted')
         if total_heating_time < 120:  # 2 minutes in seconds
             return False, f"Machine needs more heating time (current: {total_heating_time}s, required: 120s)"
             
     if command_name == 'start_brewing':
         # Check for successful coffee addition
-        last_coffee = next((entry for entry in reversed(history) 
-                          if entry.command_name == 'add_coffee'
-                          and entry.result['status'] == 'success'), None)
-        if not last_coffee:
+        if not index.last_success('add_coffee'):
             return False, "No coffee grounds added"
             
     return True, ""
@@ -85,9 +76,7 @@ async def initialize_processor():
             return {"status": "error", "message": error}
             
         # Check for correct amount of coffee
-        last_coffee = next((entry for entry in reversed(processor.execution_history) 
-                         if entry.command_name == 'add_coffee'
-                         and entry.result['status'] == 'success'), None)
+        last_coffee = processor.execution_history.index.last_success('add_coffee')
         if last_coffee.parameters['amount_grams'] != params['cups'] * 15:
             return {
                 "status": "error", 
@@ -112,39 +101,34 @@ async def initialize_processor():
 
 def is_goal_achieved(history) -> bool:
     """Check if coffee making goal is achieved based on command history"""
-    try:
-        # Check if machine was powered on
-        power_on = next(entry for entry in history 
-                       if entry.command_name == 'power_coffee_machine' 
-                       and entry.parameters['power'] == 'on' 
-                       and entry.result['status'] == 'success')
-        
-        # Calculate total heating time after power on
-        total_heating_time = 0
-        for entry in history:
-            if (entry.command_name == 'throttle' 
-                and entry.result['status'] == 'accepted'
-                and entry.timestamp > power_on.timestamp
-                and 'wait_time' in entry.parameters):
-                total_heating_time += entry.parameters['wait_time']
-        
-        if total_heating_time < 120:  # 2 minutes in seconds
-            return False
-        
-        # Check if coffee was added with correct amount
-        add_coffee = next(entry for entry in history 
-                         if entry.command_name == 'add_coffee' 
-                         and entry.parameters['amount_grams'] == 30 
-                         and entry.result['status'] == 'success'
-                         and entry.timestamp > power_on.timestamp)
-        
-        # Check if brewing was started with correct number of cups
-        brew = next(entry for entry in history 
-                   if entry.command_name == 'start_brewing' 
-                   and entry.parameters['cups'] == 2 
-                   and entry.result['status'] == 'success'
-                   and entry.timestamp > add_coffee.timestamp)
-        
-        return True
-    except StopIteration:
-        return False
\ No newline at end of file
+    index = index_of(history)
+    # Check if machine was powered on
+    power_on = index.first('power_on', lambda entry: (
+        entry.command_name == 'power_coffee_machine'
+        and entry.parameters.get('power') == 'on'
+        and entry.result['status'] == 'success'))
+    if power_on is None:
+        return False
+
+    # Total heating time after power on
+    total_heating_time = index.parameter_sum('throttle', 'wait_time',
+                                             since=power_on.timestamp, status='accepted')
+    if total_heating_time < 120:  # 2 minutes in seconds
+        return False
+
+    # Check if coffee was added with correct amount
+    add_coffee = index.first('add_coffee_30g', lambda entry: (
+        entry.command_name == 'add_coffee'
+        and entry.parameters.get('amount_grams') == 30
+        and entry.result['status'] == 'success'
+        and entry.timestamp > power_on.timestamp))
+    if add_coffee is None:
+        return False
+
+    # Check if brewing was started with correct number of cups
+    brew = index.first('brew_2_cups', lambda entry: (
+        entry.command_name == 'start_brewing'
+        and entry.parameters.get('cups') == 2
+        and entry.result['status'] == 'success'
+        and entry.timestamp > add_coffee.timestamp))
+    return brew is not None
@@ -0,0 +1,309 @@
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Cell codes of the grid; CHARS maps them back to the maze.txt characters
+WALL, EMPTY, EXIT = 0, 1, 2
+CHARS = ("#", ".", "X")
+
+DIRECTION_NAMES = ("north", "south", "east", "west")
+DIRECTIONS = {"north": (0, -1), "south": (0, 1), "east": (1, 0), "west": (-1, 0)}
+_DX = np.array([DIRECTIONS[name][0] for name in DIRECTION_NAMES])
+_DY = np.array([DIRECTIONS[name][1] for name in DIRECTION_NAMES])
+
+GENERATORS = ("backtracker", "binary_tree")
+
+Position = Tuple[int, int]
+
+
+@dataclass
+class MazeState:
+    position: Position
+    visited: np.ndarray  # bool mask with the shape of the grid
+    visited_count: int = 1
+
+    def visit(self, position: Position):
+        x, y = position
+        if not self.visited[y, x]:
+            self.visited[y, x] = True
+            self.visited_count += 1
+        self.position = position
+
+
+def parse_maze(text: str) -> np.ndarray:
+    """Grid of cell codes from maze.txt text ('#' wall, 'X' exit, anything else is open)"""
+    lines = [line.strip().encode() for line in text.splitlines() if line.strip()]
+    if not lines or len({len(line) for line in lines}) != 1:
+        raise ValueError("Maze rows must be non-empty and of equal length")
+    table = np.full(256, EMPTY, dtype=np.uint8)
+    table[ord("#")] = WALL
+    table[ord("X")] = EXIT
+    chars = np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(len(lines), -1)
+    return table[chars]
+
+
+def bfs_distances(passable: np.ndarray, sources: np.ndarray, stride: int) -> np.ndarray:
+    """Breadth-first distances over a flat grid whose border cells are not passable.
+
+    Expands a whole frontier per iteration; -1 marks cells that can't be reached.
+    """
+    distances = np.full(passable.size, -1, dtype=np.int32)
+    offsets = np.array([-stride, stride, 1, -1])
+    frontier = np.unique(sources)
+    distances[frontier] = 0
+    depth = 0
+    while frontier.size:
+        depth += 1
+        neighbors = (frontier[:, None] + offsets).ravel()
+        neighbors = neighbors[passable[neighbors]]
+        neighbors = np.unique(neighbors[distances[neighbors] < 0])
+        distances[neighbors] = depth
+        frontier = neighbors
+    return distances
+
+
+def tree_depths(parent: np.ndarray) -> np.ndarray:
+    """Depth of every node of a forest given as parent pointers (roots point to themselves).
+
+    Pointer jumping takes log2(max depth) vectorized passes, which is much faster
+    than a frontier BFS on the long corridors of a perfect maze.
+    """
+    parent = parent.copy()
+    depth = (parent != np.arange(parent.size)).astype(np.int32)
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return depth
+        depth += depth[parent]
+        parent = grandparent
+
+
+def _binary_tree(width: int, height: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """Every room opens south or east at random; the bottom-right room is the root"""
+    rows, cols = 2 * height + 1, 2 * width + 1
+    grid = np.full((rows, cols), WALL, dtype=np.uint8)
+    grid[1::2, 1::2] = EMPTY
+    south = rng.random((height, width)) < 0.5
+    south[:, -1] = True
+    south[-1, :] = False
+    east = ~south
+    east[:, -1] = False
+
+    parent = np.arange(rows * cols)
+    for mask, dy, dx in ((south, 1, 0), (east, 0, 1)):
+        ys, xs = np.nonzero(mask)
+        room = (2 * ys + 1) * cols + 2 * xs + 1
+        passage = room + dy * cols + dx
+        grid.flat[passage] = EMPTY
+        parent[room] = passage
+        parent[passage] = passage + dy * cols + dx
+    return grid, parent
+
+
+def _backtracker(width: int, height: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """Randomized depth-first search carved from the bottom-right room"""
+    rows, cols = 2 * height + 1, 2 * width + 1
+    grid = np.full((rows, cols), WALL, dtype=np.uint8)
+    parent = np.arange(rows * cols)
+    carved = bytearray(width * height)
+    choices = rng.random(width * height).tolist()
+    steps = [(-width, 0, -1), (width, 0, 1), (1, 1, 0), (-1, -1, 0)]
+
+    root = width * height - 1
+    carved[root] = 1
+    stack = [root]
+    links = []  # (room, dx, dy, room it was carved from) in room coordinates
+    draw = 0
+    while stack:
+        cell = stack[-1]
+        y, x = divmod(cell, width)
+        options = [
+            (cell + step, dx, dy) for step, dx, dy in steps
+            if 0 <= x + dx < width and 0 <= y + dy < height and not carved[cell + step]
+        ]
+        if not options:
+            stack.pop()
+            continue
+        nxt, dx, dy = options[int(choices[draw] * len(options))]
+        draw += 1
+        carved[nxt] = 1
+        links.append((nxt, dx, dy, cell))
+        stack.append(nxt)
+
+    grid[1::2, 1::2] = EMPTY
+    if links:
+        link = np.array(links)
+        child, dx, dy, source = link[:, 0], link[:, 1], link[:, 2], link[:, 3]
+        sy, sx = np.divmod(source, width)
+        source_room = (2 * sy + 1) * cols + 2 * sx + 1
+        passage = source_room + dy * cols + dx
+        cy, cx = np.divmod(child, width)
+        grid.flat[passage] = EMPTY
+        parent[(2 * cy + 1) * cols + 2 * cx + 1] = passage
+        parent[passage] = source_room
+    return grid, parent
+
+
+class MazeEnvironment:
+    """Maze on a NumPy grid with a precomputed distance-to-exit field.
+
+    The grid is stored flat with an extra wall border, so the four neighbors
+    of any set of cells are found with one vectorized lookup.
+    """
+
+    def __init__(self, maze: Union[str, np.ndarray], start_pos: Position = (1, 1),
+                 distances: Optional[np.ndarray] = None):
+        """
+        Args:
+            maze: Path of a maze.txt file or a grid of WALL/EMPTY/EXIT codes
+            start_pos: Starting (x, y) position
+            distances: Distance field of the grid if already known (-1 for walls)
+        """
+        if isinstance(maze, str):
+            with open(maze, 'r') as f:
+                maze = parse_maze(f.read())
+        self.grid = np.asarray(maze, dtype=np.uint8)
+        self.height, self.width = self.grid.shape
+        exits = np.flatnonzero(self.grid == EXIT)
+        if not exits.size:
+            raise ValueError("No exit found in maze")
+        exit_y, exit_x = divmod(int(exits[0]), self.width)
+        self.exit_pos = (exit_x, exit_y)
+
+        self._stride = self.width + 2
+        self._offsets = np.array([DIRECTIONS[name][1] * self._stride + DIRECTIONS[name][0]
+                                  for name in DIRECTION_NAMES])
+        self._cells = np.pad(self.grid, 1, constant_values=WALL).ravel()
+        if distances is None:
+            exit_ys, exit_xs = np.divmod(exits, self.width)
+            padded = bfs_distances(self._cells != WALL, self._flat(exit_xs, exit_ys), self._stride)
+            distances = padded.reshape(self.height + 2, self.width + 2)[1:-1, 1:-1]
+        # Steps to the nearest exit from every cell, -1 for walls and unreachable cells
+        self.distances = np.ascontiguousarray(distances, dtype=np.int32)
+        self._distances = np.pad(self.distances, 1, constant_values=-1).ravel()
+        self._successors: Optional[np.ndarray] = None
+
+        self.start_pos = start_pos
+        visited = np.zeros(self.grid.shape, dtype=bool)
+        visited[start_pos[1], start_pos[0]] = True
+        self.state = MazeState(start_pos, visited)
+
+    @classmethod
+    def generate(cls, width: int, height: int, seed: Optional[int] = None,
+                 algorithm: str = "backtracker") -> "MazeEnvironment":
+        """Procedural perfect maze of width x height rooms.
+
+        The grid is (2 * height + 1) x (2 * width + 1) cells. The start is the
+        top-left room and the exit the bottom-right room. At 1000 x 1000 rooms
+        binary_tree takes well under a second and backtracker a few seconds.
+
+        Args:
+            width: Rooms per row
+            height: Rooms per column
+            seed: Seed of the random generator (same seed, same maze)
+            algorithm: "backtracker" (long winding corridors) or "binary_tree"
+                (vectorized, biased towards the exit)
+        """
+        if width < 1 or height < 1:
+            raise ValueError("A maze needs at least one room")
+        if algorithm not in GENERATORS:
+            raise ValueError(f"Unknown maze generator: {algorithm}")
+        rng = np.random.default_rng(seed)
+        build = _backtracker if algorithm == "backtracker" else _binary_tree
+        grid, parent = build(width, height, rng)
+        grid[2 * height - 1, 2 * width - 1] = EXIT
+        # A perfect maze is a tree rooted at the exit, so the BFS distance is the depth
+        distances = tree_depths(parent).reshape(grid.shape)
+        distances[grid == WALL] = -1
+        return cls(grid, (1, 1), distances=distances)
+
+    def _flat(self, x, y):
+        return (y + 1) * self._stride + x + 1
+
+    def neighbors(self, positions: np.ndarray) -> np.ndarray:
+        """Cell codes north, south, east and west of each (x, y) row; WALL outside the maze"""
+        positions = np.asarray(positions).reshape(-1, 2)
+        index = self._flat(positions[:, 0], positions[:, 1])
+        return self._cells[index[:, None] + self._offsets]
+
+    def get_adjacent_cells(self) -> Dict[str, str]:
+        """Return the content of adjacent cells"""
+        x, y = self.state.position
+        codes = self._cells[self._flat(x, y) + self._offsets].tolist()
+        xs, ys = x + _DX, y + _DY
+        inside = ((xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)).tolist()
+        return {name: CHARS[code] for name, code, ok in zip(DIRECTION_NAMES, codes, inside) if ok}
+
+    def move(self, direction: str) -> Dict[str, Any]:
+        """Move in a direction, returning the result of the move command"""
+        dx, dy = DIRECTIONS[direction]
+        x, y = self.state.position
+        new_x, new_y = x + dx, y + dy
+
+        # Check if move is valid
+        if not (0 <= new_x < self.width and 0 <= new_y < self.height):
+            return {"status": "error", "message": "Cannot move outside maze"}
+
+        cell = self.grid[new_y, new_x]
+        if cell == WALL:
+            return {"status": "error", "message": "Cannot move into wall"}
+
+        # Make the move
+        self.state.visit((new_x, new_y))
+
+        # Check if reached exit
+        if cell == EXIT:
+            return {
+                "status": "success",
+                "message": "Reached the exit!",
+                "position": self.state.position
+            }
+
+        return {
+            "status": "success",
+            "message": f"Moved {direction}",
+            "position": self.state.position
+        }
+
+    def distance_to_exit(self, position: Optional[Position] = None) -> int:
+        """Fewest moves from a position (default: the current one) to an exit, -1 if unreachable"""
+        x, y = position or self.state.position
+        return int(self.distances[y, x])
+
+    def optimal_path(self, position: Optional[Position] = None) -> List[str]:
+        """Directions of a shortest path from a position (default: the current one) to an exit"""
+        index = int(self._flat(*(position or self.state.position)))
+        length = int(self._distances[index])
+        if length < 0:
+            raise ValueError("The exit can't be reached from this position")
+        if self._successors is None:
+            self._successors = self._compute_successors()
+        successors = self._successors
+        offsets = self._offsets.tolist()
+        path = []
+        for _ in range(length):
+            step = int(successors[index])
+            path.append(DIRECTION_NAMES[step])
+            index += offsets[step]
+        return path
+
+    def _compute_successors(self) -> np.ndarray:
+        """For every open cell, the direction of a neighbor one step closer to the exit"""
+        open_cells = np.flatnonzero(self._distances > 0)
+        neighbor_distances = self._distances[open_cells[:, None] + self._offsets]
+        closer = neighbor_distances == (self._distances[open_cells] - 1)[:, None]
+        successors = np.full(self._distances.size, -1, dtype=np.int8)
+        successors[open_cells] = np.argmax(closer, axis=1)
+        return successors
+
+    def efficiency(self, moves: int) -> float:
+        """Optimal number of moves from the start divided by the moves actually taken"""
+        optimal = self.distance_to_exit(self.start_pos)
+        if moves <= 0:
+            return 1.0 if optimal == 0 else 0.0
+        return optimal / moves
+
+    def render(self) -> str:
+        """The grid in maze.txt format"""
+        return "\n".join("".join(CHARS[code] for code in row) for row in self.grid.tolist())
@@ -0,0 +1,59 @@
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
+
+from examples.maze_solver.maze import MazeEnvironment, GENERATORS, WALL, EXIT
+
+MAZE_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'maze.txt')
+
+
+def test_maze_file_distances_and_moves():
+    env = MazeEnvironment(MAZE_FILE)
+
+    assert env.exit_pos == (5, 5)
+    assert env.distance_to_exit() == 8
+    assert env.get_adjacent_cells() == {"north": "#", "south": "#", "east": ".", "west": "#"}
+    assert env.optimal_path() == ["east", "east", "south", "south", "south", "south", "east", "east"]
+
+    assert env.move("north") == {"status": "error", "message": "Cannot move into wall"}
+    for direction in env.optimal_path()[:-1]:
+        assert env.move(direction)["status"] == "success"
+    assert env.move("east") == {"status": "success", "message": "Reached the exit!", "position": (5, 5)}
+    assert env.state.visited_count == 9
+    assert env.efficiency(10) == 0.8
+
+
+@pytest.mark.parametrize("algorithm", GENERATORS)
+def test_generated_mazes_are_seeded_and_solvable(algorithm):
+    env = MazeEnvironment.generate(40, 30, seed=7, algorithm=algorithm)
+
+    assert env.grid.shape == (61, 81)
+    assert np.array_equal(env.grid, MazeEnvironment.generate(40, 30, seed=7, algorithm=algorithm).grid)
+    assert env.grid[59, 79] == EXIT and env.grid[0].max() == WALL
+    # The distances derived from the generator match a BFS over the grid
+    assert np.array_equal(env.distances, MazeEnvironment(env.grid).distances)
+    assert (env.distances[env.grid != WALL] >= 0).all()
+
+    path = env.optimal_path()
+    assert len(path) == env.distance_to_exit((1, 1))
+    for direction in path:
+        result = env.move(direction)
+    assert result["message"] == "Reached the exit!"
+    assert env.efficiency(len(path)) == 1.0
+
+
+def test_vectorized_neighbors():
+    env = MazeEnvironment.generate(10, 10, seed=1)
+    positions = np.array([[1, 1], [0, 0], [20, 20]])
+    codes = env.neighbors(positions)
+
+    assert codes.shape == (3, 4)
+    # Outside the maze counts as wall
+    assert (codes[1] == WALL).all() and (codes[2, [1, 2]] == WALL).all()
+    adjacent = env.get_adjacent_cells()
+    assert [adjacent[d] for d in ("north", "south", "east", "west")] == ["#.X"[c] for c in codes[0]]
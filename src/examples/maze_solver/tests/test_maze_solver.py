@@ -7,19 +7,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
 
 from examples.maze_solver.main import initialize_processor
+from core.history_index import index_of
 
 def is_goal_achieved(history) -> bool:
     """Check if maze has been solved"""
-    try:
-        # Look for a successful move that reached the exit
-        for entry in history:
-            if (entry.command_name == 'move' and 
-                entry.result.get('message') == 'Reached the exit!' and
-                entry.result.get('status') == 'success'):
-                return True
-        return False
-    except Exception:
-        return False
+    # Look for a successful move that reached the exit
+    exit_move = index_of(history).first('reached_exit', lambda entry: (
+        entry.command_name == 'move'
+        and entry.result.get('message') == 'Reached the exit!'
+        and entry.result.get('status') == 'success'))
+    return exit_move is not None
 
 @pytest.mark.asyncio
 async def test_maze_solving():
@@ -53,6 +50,9 @@ async def test_maze_solving():
             success = True
             print(f"\n=== Maze Solved in {step} steps! ===")
             break
+
+    # Let background summarization finish before the event loop is closed
+    await processor.aclose()
     
     assert success, f"Should solve the maze in less than {max_steps}"
     
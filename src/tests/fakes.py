@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+def make_response(content: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                  cached_tokens: int = 0):
+    """Build an object shaped like an OpenAI chat completion response"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=None))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+        ),
+    )
+
+
+def action_reply(command_id: int, parameters: Optional[Dict[str, Any]] = None,
+                 reasoning: str = "test reasoning") -> str:
+    """Format an LLM reply selecting a single action"""
+    body = {
+        "analysis": {
+            "current_situation": "test",
+            "history_consideration": "test",
+            "reasoning": reasoning,
+        },
+        "action": {"command_id": command_id, "parameters": parameters or {}},
+    }
+    return f"```json\n{json.dumps(body)}\n```"
+
+
+def tool_call_reply(*calls, content: str = ""):
+    """Build a response with native tool calls, given as (name, arguments) pairs"""
+    response = make_response(content)
+    response.choices[0].message.tool_calls = [
+        SimpleNamespace(
+            id=f"call_{i}",
+            type="function",
+            function=SimpleNamespace(
+                name=name,
+                arguments=arguments if isinstance(arguments, str) else json.dumps(arguments),
+            ),
+        )
+        for i, (name, arguments) in enumerate(calls)
+    ]
+    return response
+
+
+class FakeAsyncClient:
+    """Minimal stand-in for openai.AsyncOpenAI that replays canned replies (text or response objects)"""
+
+    def __init__(self, replies: Optional[List[str]] = None, default: Optional[str] = None):
+        self.replies = list(replies or [])
+        self.default = default
+        self._last_prompt = ""
+        self.calls: List[Dict[str, Any]] = []
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.replies:
+            content = self.replies.pop(0)
+        elif self.default is not None:
+            content = self.default
+        else:
+            content = "No new knowledge"
+        if not isinstance(content, str):
+            # A prepared response object, e.g. from tool_call_reply()
+            return content
+
+        # Emulate a provider prefix cache: ~4 characters per token, shared prefix is cached
+        prompt = "".join(m["content"] for m in kwargs.get("messages", []))
+        shared = 0
+        for a, b in zip(prompt, self._last_prompt):
+            if a != b:
+                break
+            shared += 1
+        self._last_prompt = prompt
+        return make_response(content, prompt_tokens=len(prompt) // 4,
+                             completion_tokens=len(content) // 4, cached_tokens=shared // 4)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeStreamingClient(FakeAsyncClient):
+    """Fake client that streams replies in small chunks with a delay between them"""
+
+    def __init__(self, replies: Optional[List[str]] = None, chunk_size: int = 8,
+                 chunk_delay: float = 0.0, **kwargs):
+        super().__init__(replies, **kwargs)
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.streams_finished = 0
+        self.chat.completions.create = self._create_maybe_streaming
+
+    async def _create_maybe_streaming(self, **kwargs):
+        response = await self._create(**kwargs)
+        if not kwargs.get("stream"):
+            return response
+        return self._chunks(response.choices[0].message.content, response.usage)
+
+    async def _chunks(self, content: str, usage):
+        import asyncio
+
+        for i in range(0, len(content), self.chunk_size):
+            await asyncio.sleep(self.chunk_delay)
+            delta = SimpleNamespace(content=content[i:i + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+        self.streams_finished += 1
+
+
+class SlowClient(FakeAsyncClient):
+    """Fake client that takes a fixed time to answer, like a remote LLM"""
+
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        # Shared with tools so that tests can check how requests and tool runs interleave
+        self.events: List[str] = []
+        self.chat.completions.create = self._slow_create
+
+    async def _slow_create(self, **kwargs):
+        import asyncio
+
+        self.events.append("llm requested")
+        await asyncio.sleep(self.delay)
+        return await self._create(**kwargs)
+
+
+class OfflineClient(FakeAsyncClient):
+    """Client that fails the test if the LLM is contacted"""
+
+    async def _create(self, **kwargs):
+        raise AssertionError("The LLM must not be called")
@@ -0,0 +1,62 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.agent_pool import AgentPool
+from tests.fakes import FakeAsyncClient, action_reply, SlowClient
+from tests.test_llm_processor import make_processor
+
+
+def submitted(history) -> bool:
+    return any(e.command_name == 'submit_result' for e in history)
+
+
+@pytest.mark.parametrize("max_concurrency", [8, 3])
+@pytest.mark.asyncio
+async def test_pool_runs_episodes_concurrently(max_concurrency):
+    pool = AgentPool(max_concurrency=max_concurrency)
+    in_flight = []
+    peak = [0]
+
+    def tracked(create):
+        async def create_tracked(**kwargs):
+            in_flight.append(kwargs)
+            peak[0] = max(peak[0], len(in_flight))
+            try:
+                return await create(**kwargs)
+            finally:
+                in_flight.remove(kwargs)
+        return create_tracked
+
+    for i in range(8):
+        client = SlowClient(0.01, replies=[action_reply(1, {"a": i, "b": 1}),
+                                           action_reply(3, {"value": i + 1})])
+        client.chat.completions.create = tracked(client.chat.completions.create)
+        pool.add(make_processor(client), goal_predicate=submitted, max_steps=5, name=f"calc-{i}")
+
+    results = await pool.run()
+
+    assert [r.name for r in results] == [f"calc-{i}" for i in range(8)]
+    assert all(r.success and r.steps == 2 and r.error is None for r in results)
+    assert pool.total_steps == 16
+    # The LLM calls of as many episodes as allowed were waiting at the same time
+    assert peak[0] == max_concurrency
+
+
+@pytest.mark.asyncio
+async def test_pool_enforces_step_limit_and_reports_errors():
+    pool = AgentPool(max_concurrency=2)
+    pool.add(make_processor(FakeAsyncClient(default=action_reply(1, {"a": 1, "b": 1}))),
+             goal_predicate=submitted, max_steps=3)
+    unimplemented = make_processor(FakeAsyncClient(default=action_reply(1, {"a": 1, "b": 1})))
+    del unimplemented.implementations['add']
+    pool.add(unimplemented, max_steps=3)
+
+    limited, failed = await pool.run()
+
+    assert not limited.success and limited.steps == 3
+    assert not failed.success and failed.steps == 0
+    assert "No implementation registered for command: add" in failed.error
@@ -0,0 +1,73 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.checkpoint import CheckpointError, read_checkpoint
+from tests.fakes import FakeAsyncClient, action_reply, OfflineClient
+from tests.test_llm_processor import make_processor
+
+
+@pytest.mark.asyncio
+async def test_restored_processor_resumes_mid_episode(tmp_path):
+    path = str(tmp_path / "episode.ckpt")
+    client = FakeAsyncClient(default="- add before multiply")
+    processor = make_processor(client, summary_interval=2, background_summary=False,
+                               checkpoint_path=path)
+    for a in range(3):
+        await processor.execute_command(1, {"a": a, "b": 1}, f"step {a}")
+    size_after_three = os.path.getsize(path)
+    await processor.execute_command(1, {"a": 3, "b": 1}, "step 3")
+    # Only the new entry and knowledge were appended
+    assert os.path.getsize(path) - size_after_three < size_after_three
+    prompt = processor.generate_prompt()
+    await processor.aclose()
+
+    # Simulate a crash in the middle of the last write
+    with open(path, "ab") as f:
+        f.write(b"\x01\xff\x00\x00\x00{\"torn")
+
+    restored = make_processor(OfflineClient(), summary_interval=2, background_summary=False,
+                              checkpoint_path=path)
+    restored.restore()
+    assert [e.parameters["a"] for e in restored.execution_history] == [0, 1, 2, 3]
+    assert restored.execution_history[0].timestamp == processor.execution_history[0].timestamp
+    assert restored.best_practices == "- add before multiply"
+    assert restored.steps_counter == 4
+    assert restored._summary_mark == 4
+    assert restored.execution_history.index.last_success("add").parameters == {"a": 3, "b": 1}
+
+    # The restored prompt is the one the original processor would have sent next
+    assert restored.generate_prompt() == prompt
+
+    # Continuing the episode appends to the same checkpoint
+    restored.client = FakeAsyncClient([action_reply(2, {"a": 4, "b": 2})], default="- knowledge")
+    await restored.step()
+    await restored.aclose()
+    state = read_checkpoint(path)
+    assert [e.command_name for e in state.entries] == ["add"] * 4 + ["multiply"]
+    assert state.steps_counter == 5
+
+
+@pytest.mark.asyncio
+async def test_cleared_history_is_reset_in_checkpoint(tmp_path):
+    path = str(tmp_path / "episode.ckpt")
+    processor = make_processor(FakeAsyncClient(), summary_interval=100)
+    for a in range(2):
+        await processor.execute_command(1, {"a": a, "b": 1}, "")
+    processor.checkpoint(path)
+    processor.execution_history.clear()
+    await processor.execute_command(1, {"a": 9, "b": 1}, "")
+    processor.checkpoint()
+    await processor.aclose()
+
+    assert [e.parameters["a"] for e in read_checkpoint(path).entries] == [9]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-checkpoint"
+    path.write_bytes(b"hello")
+    with pytest.raises(CheckpointError):
+        read_checkpoint(str(path))
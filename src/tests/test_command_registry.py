@@ -0,0 +1,72 @@
+import pytest
+import json
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.command_registry import CommandRegistry
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'examples')
+
+
+def load_registry(example: str) -> CommandRegistry:
+    with open(os.path.join(EXAMPLES_DIR, example, 'config', 'functions.json')) as f:
+        return CommandRegistry(json.load(f))
+
+
+def test_lookup_by_id_and_name():
+    registry = load_registry('coffee_maker')
+    assert len(registry) == 4
+    assert registry.get(2).name == 'add_coffee'
+    assert registry.get("2").name == 'add_coffee'
+    assert registry.get_by_name('start_brewing').id == 3
+    assert registry.get(99) is None
+
+
+def test_json_schema_parameters_are_validated():
+    registry = load_registry('coffee_maker')
+    assert registry.validate(0, {"reason": "heating", "wait_time": 120}) == (True, "")
+
+    valid, message = registry.validate(0, {"wait_time": "two minutes"})
+    assert not valid
+    assert "parameters.reason is required" in message
+    assert "parameters.wait_time must be integer" in message
+
+    assert not registry.validate(2, {"amount_grams": 45})[0]
+    assert not registry.validate(3, None)[0]
+
+
+def test_flat_parameters_with_required_flags_are_validated():
+    registry = load_registry('maze_solver')
+    assert registry.validate(1, {"direction": "north"})[0]
+    assert not registry.validate(1, {})[0]
+    assert not registry.validate(1, {"direction": "up"})[0]
+    assert registry.validate(0, {})[0]
+
+    calculator = load_registry('calculator')
+    assert calculator.validate(1, {"a": 4, "b": 3.5})[0]
+    assert not calculator.validate(1, {"a": True, "b": 3})[0]
+
+
+@pytest.mark.asyncio
+async def test_invalid_parameters_are_rejected_before_dispatch():
+    from tests.test_llm_processor import make_processor
+    from tests.fakes import FakeAsyncClient
+
+    processor = make_processor(FakeAsyncClient())
+    calls = []
+
+    async def add(params):
+        calls.append(params)
+        return {"status": "success", "value": params['a'] + params['b']}
+
+    processor.register_function('add', add)
+    result = await processor.execute_command(1, {"a": "4", "b": 3}, "bad types")
+
+    assert result["status"] == "error"
+    assert calls == []
+    assert processor.execution_history[-1].status == "failed"
+    assert await processor.process_response('{"command_id": 1, "parameters": {"a": 1, "b": 2}}') == (
+        True, {"command_id": 1, "parameters": {"a": 1, "b": 2}})
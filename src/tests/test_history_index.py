@@ -0,0 +1,112 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.history_index import HistoryIndex, index_of
+from core.history_store import ExecutionHistoryEntry, HistoryStore
+from examples.coffee_maker.main import check_command_possibility, is_goal_achieved
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def entry(second: int, name: str, parameters: dict, status: str = "success") -> ExecutionHistoryEntry:
+    return ExecutionHistoryEntry(
+        timestamp=START + timedelta(seconds=second),
+        command_id=0,
+        command_name=name,
+        parameters=parameters,
+        result={"status": status},
+        status="success" if status in ("success", "accepted") else "failed",
+        context="",
+    )
+
+
+def test_index_is_maintained_on_append():
+    store = HistoryStore()
+    store.append(entry(0, "throttle", {"wait_time": 50}, "accepted"))
+    store.append(entry(1, "power_coffee_machine", {"power": "on"}))
+    store.append(entry(2, "throttle", {"wait_time": 60}, "accepted"))
+    store.append(entry(3, "power_coffee_machine", {"power": "off"}, "error"))
+
+    index = store.index
+    assert index.last_success("power_coffee_machine").parameters == {"power": "on"}
+    assert index.last("power_coffee_machine", status=None).parameters == {"power": "off"}
+    assert index.parameter_sum("throttle", "wait_time") == 110
+    assert index.parameter_sum("throttle", "wait_time", since=START + timedelta(seconds=1)) == 60
+    assert index.count("throttle", since=START) == 1
+    assert [e.parameters["wait_time"] for e in index.entries("throttle")] == [50, 60]
+
+    # Aggregates and first() registered earlier keep up with later appends
+    assert index.first("long_wait", lambda e: e.parameters.get("wait_time", 0) > 100) is None
+    store.append(entry(4, "throttle", {"wait_time": 120}, "accepted"))
+    store.append(entry(5, "throttle", {"wait_time": 200}, "error"))
+    assert index.first("long_wait", lambda e: e.parameters.get("wait_time", 0) > 100).timestamp.second == 4
+    assert index.parameter_sum("throttle", "wait_time", status="accepted") == 230
+
+    store.clear()
+    assert index.last_success("power_coffee_machine") is None
+    assert index.parameter_sum("throttle", "wait_time") == 0
+
+
+def test_plain_lists_get_a_one_off_index():
+    history = [entry(0, "throttle", {"wait_time": 5}, "accepted")]
+    index = index_of(history)
+    assert isinstance(index, HistoryIndex)
+    assert index.parameter_sum("throttle", "wait_time") == 5
+
+
+def test_coffee_maker_checks_use_the_index():
+    store = HistoryStore()
+    steps = [
+        entry(0, "power_coffee_machine", {"power": "on"}),
+        entry(1, "throttle", {"reason": "heating", "wait_time": 60}, "accepted"),
+        entry(2, "throttle", {"reason": "heating", "wait_time": 60}, "accepted"),
+        entry(3, "add_coffee", {"amount_grams": 30}),
+        entry(4, "start_brewing", {"cups": 2}),
+    ]
+    expected_add_coffee = [False, False, False, True, True]
+    for step, allowed in zip(steps, expected_add_coffee):
+        assert check_command_possibility(store, "add_coffee")[0] == allowed
+        assert not is_goal_achieved(store)
+        store.append(step)
+    assert check_command_possibility(store, "add_coffee")[0]
+    assert check_command_possibility(store, "start_brewing")[0]
+    assert is_goal_achieved(store)
+    # Same answers for a plain list
+    assert is_goal_achieved(list(store))
+
+
+def test_bounded_store_keeps_the_index_flat_and_exact(tmp_path):
+    import random
+
+    rng = random.Random(5)
+    store = HistoryStore(capacity=20, spill_path=str(tmp_path / "history.log"))
+    reference = []
+    names = ["throttle", "power_coffee_machine", "add_coffee"]
+    for second in range(300):
+        step = entry(second, rng.choice(names), {"wait_time": rng.randint(1, 9)},
+                     rng.choice(["accepted", "success", "error"]))
+        store.append(step)
+        reference.append(step)
+    full = HistoryIndex(reference)
+
+    index = store.index
+    assert index.parameter_sum("throttle", "wait_time", status="accepted") == \
+        full.parameter_sum("throttle", "wait_time", status="accepted")
+    for second in (None, 10, 150, 285, 299):
+        since = None if second is None else START + timedelta(seconds=second)
+        for name in names:
+            assert index.count(name, since) == full.count(name, since)
+            assert index.entries(name, since) == full.entries(name, since)
+            assert index.parameter_sum(name, "wait_time", since) == full.parameter_sum(name, "wait_time", since)
+
+    # Only the window is tracked per position
+    for _ in range(1000):
+        store.append(entry(400, "throttle", {"wait_time": 1}, "accepted"))
+    timelines = list(index._commands.values()) + [a.timeline for a in index._sums.values()]
+    assert all(len(t.positions) - t.start <= 20 and len(t.positions) <= 2 * 20 + 40 for t in timelines)
+    assert index.parameter_sum("throttle", "wait_time", since=START + timedelta(seconds=399)) == 1000
+    store.close()
@@ -0,0 +1,99 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.history_store import ExecutionHistoryEntry, HistoryStore
+from tests.fakes import FakeAsyncClient, action_reply
+from tests.test_llm_processor import make_processor
+
+
+def make_entry(i: int) -> ExecutionHistoryEntry:
+    return ExecutionHistoryEntry(
+        timestamp=datetime(2024, 1, 1, 12, 0, i),
+        command_id=1,
+        command_name="add",
+        parameters={"a": i, "b": 1},
+        result={"status": "success", "value": i + 1},
+        status="success",
+        context=f"step {i}",
+    )
+
+
+def test_spilled_entries_stay_readable(tmp_path):
+    path = str(tmp_path / "history.log")
+    store = HistoryStore(capacity=3, spill_path=path)
+    for i in range(10):
+        store.append(make_entry(i))
+
+    assert len(store) == 10
+    assert len(store._memory) == 3
+    assert os.path.exists(path) and os.path.exists(path + ".idx")
+
+    assert store[0].parameters == {"a": 0, "b": 1}
+    assert store[0].timestamp == datetime(2024, 1, 1, 12, 0, 0)
+    assert store[-1].context == "step 9"
+    assert [e.context for e in store[5:9]] == ["step 5", "step 6", "step 7", "step 8"]
+    assert [e.context for e in store[-3:]] == ["step 7", "step 8", "step 9"]
+    assert [e.result["value"] for e in store] == list(range(1, 11))
+    assert [e.context for e in reversed(store)][:5] == [f"step {i}" for i in (9, 8, 7, 6, 5)]
+    with pytest.raises(IndexError):
+        store[10]
+
+    store.clear()
+    assert len(store) == 0 and not store
+    store.append(make_entry(42))
+    assert [e.context for e in store] == ["step 42"]
+    store.close()
+    # An explicit spill path is kept for inspection
+    assert os.path.exists(path)
+
+
+def test_temporary_spill_file_is_removed_on_close():
+    store = HistoryStore(capacity=1)
+    store.append(make_entry(0))
+    store.append(make_entry(1))
+    path = store.spill_path
+    assert os.path.exists(path)
+    store.close()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.asyncio
+async def test_processor_with_bounded_history(tmp_path):
+    client = FakeAsyncClient([action_reply(1, {"a": i, "b": 1}) for i in range(6)])
+    processor = make_processor(client, history_size=2, summary_interval=100, summary_window=2,
+                               history_spill_path=str(tmp_path / "history.log"))
+    for _ in range(6):
+        await processor.step()
+
+    history = processor.execution_history
+    assert len(history) == 6
+    assert len(history._memory) == 2
+    assert [e.result["value"] for e in history] == [1, 2, 3, 4, 5, 6]
+    assert '"value": 6' in processor.generate_prompt()
+    await processor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_token_budget_only_reads_the_in_memory_window(tmp_path):
+    processor = make_processor(FakeAsyncClient(), history_size=3, summary_window=3,
+                               summary_interval=100, bounded_history=True, max_prompt_tokens=100_000,
+                               history_spill_path=str(tmp_path / "history.log"))
+    for i in range(20):
+        await processor.execute_command(1, {"a": i, "b": 1}, f"step {i}")
+
+    history = processor.execution_history
+    reads = []
+    original = history._read_spilled
+    history._read_spilled = lambda index: reads.append(index) or original(index)
+
+    window = processor._history_window()
+    assert [e.result["value"] for e in window] == [18, 19, 20]
+    assert reads == []
+    prompt = processor.generate_prompt()
+    assert '"value": 20' in prompt and '"value": 17' not in prompt
+    await processor.aclose()
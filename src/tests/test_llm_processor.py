@@ -0,0 +1,258 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.llm_processor import LLMProcessor
+from tests.fakes import FakeAsyncClient, action_reply
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                          'examples', 'calculator', 'config')
+
+
+def make_processor(client, **kwargs) -> LLMProcessor:
+    processor = LLMProcessor(
+        os.path.join(CONFIG_DIR, 'functions.json'),
+        os.path.join(CONFIG_DIR, 'goal.yaml'),
+        client=client,
+        **kwargs
+    )
+
+    async def add(params):
+        return {"status": "success", "value": params['a'] + params['b']}
+
+    async def multiply(params):
+        return {"status": "success", "value": params['a'] * params['b']}
+
+    async def submit_result(params):
+        return {"status": "success", "value": params['value']}
+
+    processor.register_function('add', add)
+    processor.register_function('multiply', multiply)
+    processor.register_function('submit_result', submit_result)
+    return processor
+
+
+@pytest.mark.asyncio
+async def test_injected_client_is_reused_across_steps():
+    client = FakeAsyncClient([action_reply(1, {"a": 4, "b": 3}),
+                              action_reply(2, {"a": 7, "b": 2})])
+    processor = make_processor(client)
+
+    for _ in range(2):
+        response = await processor.get_next_action()
+        action = response['action']
+        await processor.execute_command(action['command_id'], action['parameters'],
+                                        response['analysis']['reasoning'])
+
+    assert len(client.calls) == 2
+    assert processor.client is client
+    assert processor.execution_history[-1].result['value'] == 14
+
+    # Injected clients belong to the caller and are left open
+    await processor.aclose()
+    assert not client.closed
+
+
+@pytest.mark.asyncio
+async def test_prompt_history_matches_plain_json_serialization():
+    import json
+    from core.prompt_builder import entry_to_dict
+
+    processor = make_processor(FakeAsyncClient(), history_size=3)
+    for a in range(5):
+        await processor.execute_command(1, {"a": a, "b": 1}, f"step {a}")
+
+    window = processor.execution_history[-3:]
+    builder = processor.prompt_builder
+    expected = json.dumps([entry_to_dict(e) for e in window], indent=2)
+    assert builder.render_history(window) == expected
+    assert builder.render_history([]) == "[]"
+
+    prompt = processor.generate_prompt()
+    assert expected in prompt
+    assert json.dumps(processor.functions, indent=2) in prompt
+    assert json.dumps(processor.goal, indent=2) in prompt
+
+
+@pytest.mark.asyncio
+async def test_compact_prompt_uses_short_keys_without_indentation():
+    import json
+
+    processor = make_processor(FakeAsyncClient(), compact_prompt=True, short_history_keys=True)
+    await processor.execute_command(2, {"a": 2, "b": 3}, "multiply")
+
+    history = json.loads(processor.prompt_builder.render_history(processor.execution_history))
+    assert history[0]["cmd"] == "multiply"
+    assert history[0]["res"]["value"] == 6
+    assert json.dumps(processor.functions, separators=(",", ":")) in processor.generate_prompt()
+
+
+@pytest.mark.asyncio
+async def test_cached_layout_keeps_a_stable_system_prefix():
+    client = FakeAsyncClient(default=action_reply(1, {"a": 1, "b": 1}))
+    processor = make_processor(client, prompt_layout="cached")
+
+    for step in range(3):
+        response = await processor.get_next_action()
+        action = response['action']
+        await processor.execute_command(action['command_id'], action['parameters'], "step")
+        processor.best_practices = f"- knowledge after step {step}"
+
+    systems = [call["messages"][0] for call in client.calls]
+    assert all(m["role"] == "system" for m in systems)
+    assert len({m["content"] for m in systems}) == 1
+    assert "Best Practices" not in systems[0]["content"]
+    assert client.calls[-1]["messages"][1]["role"] == "user"
+
+    # The whole system prefix is reported as cached after the first request
+    assert processor.last_usage["cached_tokens"] >= len(systems[0]["content"]) // 4
+    assert processor.usage_totals["uncached_tokens"] < processor.usage_totals["prompt_tokens"]
+
+
+@pytest.mark.asyncio
+async def test_background_summary_is_committed_at_the_next_interval():
+    import asyncio
+
+    release = asyncio.Event()
+    client = FakeAsyncClient(default="- learned something")
+    original_create = client._create
+
+    async def gated_create(**kwargs):
+        await release.wait()
+        return await original_create(**kwargs)
+
+    client.chat.completions.create = gated_create
+    processor = make_processor(client, summary_interval=2)
+
+    for a in range(3):
+        await processor.execute_command(1, {"a": a, "b": 1}, "step")
+        await asyncio.sleep(0)
+
+    # Steps kept going while the first summary was waiting on the LLM
+    assert len(processor.execution_history) == 3
+    assert processor.best_practices == ""
+
+    release.set()
+    await asyncio.sleep(0.01)
+    # Finished, but not swapped in before the next interval
+    assert processor.best_practices == ""
+    await processor.execute_command(1, {"a": 3, "b": 1}, "step")
+    assert processor.best_practices == "- learned something"
+    assert processor._summary_mark == 2
+
+    await processor.flush_best_practices()
+    assert processor._summary_mark == 4
+    # The second summary builds on the committed first one
+    assert len(client.calls) == 2
+    assert "- learned something" in client.calls[1]["messages"][0]["content"]
+
+
+@pytest.mark.asyncio
+async def test_summary_only_sends_steps_since_last_update():
+    client = FakeAsyncClient(default="- knowledge")
+    processor = make_processor(client, summary_interval=2, summary_window=15,
+                               background_summary=False)
+
+    for a in range(4):
+        await processor.execute_command(1, {"a": a, "b": 1}, f"context {a}")
+
+    assert len(client.calls) == 2
+    second_prompt = client.calls[1]["messages"][0]["content"]
+    assert "context 2" in second_prompt and "context 3" in second_prompt
+    assert "context 1" not in second_prompt
+    assert "- knowledge" in second_prompt
+    assert processor._summary_mark == 4
+
+
+def plan_reply(*actions) -> str:
+    import json
+
+    return json.dumps({
+        "analysis": {"reasoning": "plan"},
+        "actions": [{"command_id": cid, "parameters": params} for cid, params in actions],
+    })
+
+
+def submitted_14(history) -> bool:
+    return any(e.command_name == 'submit_result' and e.parameters.get('value') == 14 for e in history)
+
+
+@pytest.mark.asyncio
+async def test_multi_action_plan_runs_in_one_llm_call():
+    client = FakeAsyncClient([plan_reply((1, {"a": 4, "b": 3}), (2, {"a": 7, "b": 2}),
+                                         (3, {"value": 14}), (1, {"a": 0, "b": 0}))])
+    processor = make_processor(client, multi_action=True)
+
+    response, result = await processor.step(goal_predicate=submitted_14)
+
+    assert len(client.calls) == 1
+    assert "actions" in client.calls[0]["messages"][0]["content"]
+    assert response["action"]["command_id"] == 1
+    assert [e.command_name for e in processor.execution_history] == ['add', 'multiply', 'submit_result']
+    assert result["value"] == 14
+
+
+@pytest.mark.asyncio
+async def test_multi_action_plan_stops_at_first_failure():
+    client = FakeAsyncClient([plan_reply((1, {"a": "4", "b": 3}), (2, {"a": 7, "b": 2}))])
+    processor = make_processor(client, multi_action=True)
+
+    _, result = await processor.step()
+
+    assert result["status"] == "error"
+    assert len(processor.execution_history) == 1
+
+
+@pytest.mark.asyncio
+async def test_token_budget_bounds_prompt_size_regardless_of_result_size():
+    from core.tokens import estimate_tokens
+
+    processor = make_processor(FakeAsyncClient(), history_size=3, max_prompt_tokens=1500,
+                               max_result_chars=200)
+
+    async def add(params):
+        return {"status": "success", "value": params['a'] + params['b'], "blob": "x" * params['a']}
+
+    processor.register_function('add', add)
+    for a in range(1, 40):
+        await processor.execute_command(1, {"a": a, "b": 0}, "small step")
+    small_window = processor._history_window()
+    # Tiny entries: the budget fits more than history_size of them
+    assert len(small_window) > 3
+    assert estimate_tokens(processor.generate_prompt()) <= 1500
+
+    for _ in range(5):
+        await processor.execute_command(1, {"a": 50000, "b": 0}, "huge result " * 200)
+    prompt = processor.generate_prompt()
+    assert estimate_tokens(prompt) <= 1500
+    assert '"original_chars": ' in prompt
+    assert "x" * 300 not in prompt
+    assert processor._history_window()[-1] is processor.execution_history[-1]
+
+
+@pytest.mark.asyncio
+async def test_compressed_history_collapses_runs_and_diffs_results():
+    import json
+
+    processor = make_processor(FakeAsyncClient(), history_size=20, compress_history=True)
+
+    async def add(params):
+        return {"status": "success", "value": params['a'] + params['b'],
+                "cells": {"north": "#", "south": ".", "east": ".", "west": "#"}}
+
+    processor.register_function('add', add)
+    for _ in range(5):
+        await processor.execute_command(1, {"a": 1, "b": 1}, "same call")
+    await processor.execute_command(1, {"a": 2, "b": 1}, "different value")
+
+    history = json.loads(processor.prompt_builder.render_history(processor.execution_history))
+
+    assert len(history) == 2
+    assert history[0]["repeat"] == 5
+    assert history[0]["result"]["value"] == 2
+    assert "result" not in history[1]
+    assert history[1]["result_diff"] == {"changed": {"value": 3}}
+    assert "repeat" in processor.generate_prompt()
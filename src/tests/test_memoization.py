@@ -0,0 +1,85 @@
+import pytest
+import json
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.llm_processor import LLMProcessor
+from tests.fakes import FakeAsyncClient
+
+MAZE_CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                               'examples', 'maze_solver', 'config')
+
+
+def make_maze_processor(functions_file=None, **kwargs):
+    processor = LLMProcessor(
+        functions_file or os.path.join(MAZE_CONFIG_DIR, 'functions.json'),
+        os.path.join(MAZE_CONFIG_DIR, 'goal.yaml'),
+        client=FakeAsyncClient(),
+        **kwargs
+    )
+    state = {"x": 0, "looks": 0}
+
+    async def look_around(params):
+        state["looks"] += 1
+        return {"status": "success", "cells": {"east": "." if state["x"] < 2 else "#"}}
+
+    async def move(params):
+        if params["direction"] != "east" or state["x"] >= 2:
+            return {"status": "error", "message": "Cannot move into wall"}
+        state["x"] += 1
+        return {"status": "success", "position": [state["x"], 0]}
+
+    async def check_status(params):
+        return {"status": "success", "position": [state["x"], 0]}
+
+    processor.register_function('look_around', look_around)
+    processor.register_function('move', move)
+    processor.register_function('check_status', check_status)
+    return processor, state
+
+
+@pytest.mark.asyncio
+async def test_read_only_results_are_reused_until_a_mutating_command_succeeds():
+    processor, state = make_maze_processor(memoize_read_only=True)
+
+    first = await processor.execute_command(0, {}, "look")
+    again = await processor.execute_command(0, {}, "look again")
+    assert again == first and state["looks"] == 1
+
+    # A failed move changes nothing
+    await processor.execute_command(1, {"direction": "west"}, "bump")
+    await processor.execute_command(0, {}, "look")
+    assert state["looks"] == 1
+
+    await processor.execute_command(1, {"direction": "east"}, "move")
+    await processor.execute_command(0, {}, "look")
+    assert state["looks"] == 2
+    assert (processor.memo_hits, processor.memo_misses) == (2, 2)
+    # Every call is still a step the model sees
+    assert [e.command_name for e in processor.execution_history].count('look_around') == 4
+    assert processor.get_stats()["commands"]["look_around"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_memoization_is_opt_in_and_respects_non_mutating_commands(tmp_path):
+    processor, state = make_maze_processor()
+    for _ in range(2):
+        await processor.execute_command(0, {}, "look")
+    assert state["looks"] == 2
+
+    with open(os.path.join(MAZE_CONFIG_DIR, 'functions.json')) as f:
+        functions = json.load(f)
+    functions["functions"][1]["mutating"] = False  # pretend moves are invisible to look_around
+    functions_file = tmp_path / "functions.json"
+    functions_file.write_text(json.dumps(functions))
+
+    processor, state = make_maze_processor(str(functions_file), memoize_read_only=True)
+    assert not processor.commands.get_by_name('move').mutating
+    assert processor.commands.get_by_name('look_around').mutating is False
+    await processor.execute_command(0, {}, "look")
+    await processor.execute_command(1, {"direction": "east"}, "move")
+    await processor.execute_command(0, {}, "look")
+    assert state["looks"] == 1
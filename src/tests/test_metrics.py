@@ -0,0 +1,57 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.metrics import Metrics, MetricsRegistry, quantile
+from tests.fakes import FakeAsyncClient, action_reply
+from tests.test_llm_processor import make_processor
+
+
+def test_quantiles_and_prometheus_text():
+    registry = MetricsRegistry()
+    metrics = Metrics("worker \"a\"", registry=registry)
+    for ms in range(1, 101):
+        metrics.observe("tool", ms / 1000, command="add")
+    metrics.add_usage({"prompt_tokens": 100, "completion_tokens": 20})
+
+    assert quantile([1, 2, 3, 4], 0.5) == 2
+    assert quantile([], 0.99) == 0.0
+    stats = metrics.get_stats()["commands"]["add"]
+    assert stats["count"] == 100
+    assert (stats["p50"], stats["p95"], stats["p99"]) == (0.05, 0.095, 0.099)
+
+    text = registry.render_prometheus()
+    assert "# TYPE fluxllm_span_seconds summary" in text
+    assert 'fluxllm_command_seconds{processor="worker \\"a\\"",command="add",quantile="0.95"} 0.095' in text
+    assert 'fluxllm_command_seconds_count{processor="worker \\"a\\"",command="add"} 100' in text
+    assert 'fluxllm_tokens_sum{processor="worker \\"a\\"",kind="prompt_tokens"} 100' in text
+
+
+@pytest.mark.asyncio
+async def test_processor_records_step_spans_and_tokens():
+    client = FakeAsyncClient([action_reply(1, {"a": 4, "b": 3}), action_reply(2, {"a": 7, "b": 2})],
+                             default="- knowledge")
+    processor = make_processor(client, summary_interval=2, background_summary=False)
+    for _ in range(2):
+        await processor.step()
+
+    stats = processor.get_stats()
+    assert set(stats["spans"]) == {"prompt_build", "queue_wait", "llm", "parse", "tool", "summary"}
+    assert stats["spans"]["llm"]["count"] == 3  # two actions and one summary
+    assert stats["spans"]["parse"]["count"] == 2
+    assert set(stats["commands"]) == {"add", "multiply"}
+    assert stats["tokens"]["prompt_tokens"]["sum"] == stats["usage_totals"]["prompt_tokens"] > 0
+    assert stats["steps"] == 2
+    await processor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_disabled_metrics_record_nothing():
+    processor = make_processor(FakeAsyncClient([action_reply(1, {"a": 4, "b": 3})]), metrics=False)
+    await processor.step()
+    stats = processor.get_stats()
+    assert stats["spans"] == {} and stats["commands"] == {} and stats["tokens"] == {}
+    await processor.aclose()
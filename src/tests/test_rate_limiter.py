@@ -0,0 +1,121 @@
+import pytest
+import asyncio
+import time
+import sys
+import os
+from types import SimpleNamespace
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.rate_limiter import (
+    RateLimiter,
+    RateLimitExceeded,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BACKGROUND,
+)
+
+
+class FakeRateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_delays_requests_over_the_limit(monkeypatch):
+    from core import rate_limiter
+
+    clock = [100.0]
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    # 6000 tokens per minute refill at 100 tokens per second
+    limiter = RateLimiter(tokens_per_minute=6000)
+    await limiter.acquire(6000)
+    assert limiter._wait_time(5) == pytest.approx(0.05)
+
+    waiting = asyncio.create_task(limiter.acquire(5))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    # No tokens are refilled while the clock stands still
+    assert not waiting.done()
+
+    clock[0] += 0.06
+    await asyncio.wait_for(waiting, timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_ahead_of_background():
+    limiter = RateLimiter(requests_per_minute=600)  # one request per 0.1s
+    for _ in range(600):
+        await limiter.acquire()
+
+    order = []
+
+    async def call(name, priority):
+        await limiter.acquire(priority=priority)
+        order.append(name)
+
+    background = asyncio.create_task(call("background", PRIORITY_BACKGROUND))
+    await asyncio.sleep(0.01)
+    interactive = asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE))
+    await asyncio.gather(background, interactive)
+
+    assert order == ["interactive", "background"]
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_are_retried_honouring_retry_after():
+    limiter = RateLimiter(max_retries=3)
+    attempts = []
+
+    async def request():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise FakeRateLimitError(retry_after=0.05)
+        return "ok"
+
+    assert await limiter.run(request) == "ok"
+    assert limiter.throttled_count == 2
+    assert attempts[1] - attempts[0] >= 0.05
+
+    async def always_throttled():
+        raise FakeRateLimitError(retry_after=0)
+
+    with pytest.raises(RateLimitExceeded):
+        await limiter.run(always_throttled)
+
+
+@pytest.mark.asyncio
+async def test_processor_does_not_turn_throttling_into_an_action():
+    from tests.fakes import FakeAsyncClient
+    from tests.test_llm_processor import make_processor
+
+    client = FakeAsyncClient()
+
+    async def throttled(**kwargs):
+        raise FakeRateLimitError(retry_after=0)
+
+    client.chat.completions.create = throttled
+    processor = make_processor(client, rate_limiter=RateLimiter(max_retries=1))
+
+    with pytest.raises(RateLimitExceeded):
+        await processor.get_next_action()
+    assert len(processor.execution_history) == 0
+
+
+@pytest.mark.parametrize("share_client", [False, True])
+def test_created_clients_leave_retries_to_the_limiter(monkeypatch, share_client):
+    from core import llm_processor
+    from tests.test_llm_processor import make_processor
+
+    created = []
+    factory = "get_shared_client" if share_client else "create_async_client"
+    monkeypatch.setattr(llm_processor, factory, lambda model_type, **options: created.append(options))
+
+    make_processor(None, share_client=share_client)._get_client()
+    make_processor(None, share_client=share_client, rate_limiter=RateLimiter())._get_client()
+
+    assert "max_retries" not in created[0]
+    assert created[1]["max_retries"] == 0
@@ -0,0 +1,73 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.response_cache import ResponseCache, CacheMiss
+from tests.fakes import FakeAsyncClient, action_reply, OfflineClient, SlowClient
+from tests.test_llm_processor import make_processor
+
+
+async def run_episode(processor, steps: int):
+    for _ in range(steps):
+        await processor.step()
+    return [(e.command_name, e.parameters) for e in processor.execution_history]
+
+
+@pytest.mark.asyncio
+async def test_recorded_episode_replays_offline(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    replies = [action_reply(1, {"a": 4, "b": 3}), action_reply(2, {"a": 7, "b": 2}),
+               action_reply(3, {"value": 14})]
+
+    recorder = make_processor(FakeAsyncClient(list(replies)),
+                              response_cache=ResponseCache(path, "record"))
+    recorded = await run_episode(recorder, 3)
+    assert recorder.response_cache.misses == 3
+
+    replayer = make_processor(OfflineClient(), response_cache=ResponseCache(path, "replay"))
+    assert await run_episode(replayer, 3) == recorded
+    assert replayer.response_cache.hits == 3
+
+
+@pytest.mark.asyncio
+async def test_prompt_drift_is_a_cache_miss_in_replay(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    recorder = make_processor(FakeAsyncClient([action_reply(1, {"a": 1, "b": 1})]),
+                              response_cache=ResponseCache(path, "record"))
+    await recorder.step()
+
+    replayer = make_processor(OfflineClient(), response_cache=ResponseCache(path, "replay"))
+    replayer.best_practices = "- something the recording never saw"
+    with pytest.raises(CacheMiss):
+        await replayer.get_next_action()
+
+
+def test_cache_key_ignores_timestamps_but_not_content():
+    key = ResponseCache.make_key
+    first = [{"role": "user", "content": '"timestamp": "2024-01-01T10:00:00.123456"'}]
+    second = [{"role": "user", "content": '"timestamp": "2025-06-30T23:59:59.000001"'}]
+    assert key("m", first, {}) == key("m", second, {})
+    assert key("m", first, {}) != key("m", first, {"temperature": 0})
+    assert key("m", first, {}) != key("other", first, {})
+
+
+@pytest.mark.asyncio
+async def test_background_summaries_replay_regardless_of_llm_latency(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    reply = action_reply(1, {"a": 4, "b": 3})
+
+    # A slow recording: summaries finish several steps after they started
+    recorder = make_processor(SlowClient(0.02, default=reply), summary_interval=2,
+                              response_cache=ResponseCache(path, "record"))
+    recorded = await run_episode(recorder, 8)
+    await recorder.aclose()
+
+    # Replayed answers are instant, but the knowledge changes at the same steps
+    replayer = make_processor(OfflineClient(), summary_interval=2,
+                              response_cache=ResponseCache(path, "replay"))
+    assert await run_episode(replayer, 8) == recorded
+    await replayer.aclose()
+    assert replayer.response_cache.hits == recorder.response_cache.hits + recorder.response_cache.misses
@@ -0,0 +1,100 @@
+import pytest
+import asyncio
+import json
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.llm_processor import LLMProcessor
+from tests.fakes import FakeStreamingClient, action_reply, SlowClient
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                          'examples', 'maze_solver', 'config')
+
+
+def make_maze_processor(client: SlowClient, **kwargs):
+    processor = LLMProcessor(
+        os.path.join(CONFIG_DIR, 'functions.json'),
+        os.path.join(CONFIG_DIR, 'goal.yaml'),
+        client=client,
+        speculative=True,
+        **kwargs
+    )
+    position = {"x": 1}
+
+    async def look_around(params):
+        client.events.append("tool started")
+        await asyncio.sleep(0.05)  # slow observation tool
+        client.events.append("tool finished")
+        return {"status": "success", "cells": {"east": "." if position["x"] < 3 else "#"}}
+
+    async def move(params):
+        position["x"] += 1
+        return {"status": "success", "position": [position["x"], 1]}
+
+    async def check_status(params):
+        return {"status": "success", "position": [position["x"], 1]}
+
+    processor.register_function('look_around', look_around)
+    processor.register_function('move', move)
+    processor.register_function('check_status', check_status)
+    return processor
+
+
+@pytest.mark.asyncio
+async def test_matching_observation_keeps_the_speculative_response():
+    client = SlowClient(0.05, default=action_reply(1, {"direction": "east"}))
+    processor = make_maze_processor(client)
+
+    await processor.execute_command(0, {}, "first look, nothing to predict from")
+    assert processor.speculation_hits == 0
+
+    client.events.clear()
+    await processor.execute_command(0, {}, "same place, same view")
+    response = await processor.get_next_action()
+
+    assert processor.speculation_hits == 1
+    assert response["action"]["parameters"] == {"direction": "east"}
+    assert len(client.calls) == 1
+    # The LLM was asked while the tool was still running, and not again afterwards
+    assert client.events.count("llm requested") == 1
+    assert client.events.index("tool started") < client.events.index("llm requested") \
+        < client.events.index("tool finished")
+    await processor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_changed_observation_discards_the_speculative_response():
+    client = SlowClient(0.01, default=action_reply(0))
+    processor = make_maze_processor(client)
+
+    await processor.execute_command(0, {}, "look")
+    await processor.execute_command(1, {"direction": "east"}, "move")
+    await processor.execute_command(1, {"direction": "east"}, "move")
+    await processor.execute_command(0, {}, "the view changed after moving")
+    assert processor.speculation_misses == 1
+
+    await processor.get_next_action()
+    # The prompt sent holds the real observation, not the stale prediction
+    last_prompt = client.calls[-1]["messages"][0]["content"]
+    assert '"east": "#"' in last_prompt
+    await processor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_streamed_reasoning_is_recorded_on_a_matching_observation():
+    look = json.dumps({"action": {"command_id": 0, "parameters": {}},
+                       "analysis": {"reasoning": "Look again before moving"}})
+    client = FakeStreamingClient([look], chunk_size=8, chunk_delay=0.002, default=look)
+    client.events = []
+    processor = make_maze_processor(client, stream=True)
+
+    await processor.execute_command(0, {}, "first look")
+    await processor.step()
+
+    # The observation matched, but the prediction was made before the reasoning arrived
+    assert processor.execution_history[-1].context == "Look again before moving"
+    assert processor.speculation_misses == 1
+    await processor.aclose()
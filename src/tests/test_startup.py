@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from benchmarks.bench_startup import LAZY_MODULES
+from core.config_cache import load_commands, load_json
+from tests.fakes import FakeAsyncClient
+from tests.test_llm_processor import make_processor, CONFIG_DIR
+
+
+def test_import_does_not_load_heavy_dependencies():
+    script = ("import sys, core.llm_processor; "
+              f"print([m for m in {LAZY_MODULES!r} if m in sys.modules])")
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.dirname(__file__))).stdout
+    assert output.strip() == "[]"
+
+
+def test_config_is_compiled_once_per_file_version(tmp_path):
+    first = make_processor(FakeAsyncClient())
+    second = make_processor(FakeAsyncClient())
+    assert second.commands is first.commands
+    assert second.functions is first.functions and second.goal is first.goal
+
+    path = tmp_path / "functions.json"
+    with open(os.path.join(CONFIG_DIR, 'functions.json')) as f:
+        functions = json.load(f)
+    path.write_text(json.dumps(functions))
+    registry = load_commands(str(path))
+    assert load_commands(str(path)) is registry
+
+    functions["functions"][0]["read_only"] = True
+    path.write_text(json.dumps(functions))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert load_commands(str(path)).get(1).read_only
+    assert load_json(str(path))["functions"][0]["read_only"] is True
@@ -0,0 +1,153 @@
+import pytest
+import asyncio
+import json
+import sys
+import os
+from types import SimpleNamespace
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.json_stream import ActionStreamParser
+from tests.fakes import FakeStreamingClient
+from tests.test_llm_processor import make_processor
+
+REPLY = """Here is my decision.
+
+```json
+{
+  "analysis": {
+    "current_situation": "Nothing computed yet, braces like } or { in text are fine",
+    "history_consideration": "No history",
+    "reasoning": "Start with the addition"
+  },
+  "action": {
+    "command_id": 1,
+    "parameters": {"a": 4, "b": 3}
+  },
+  "expected_outcome": "7, which is then multiplied by 2 to reach the final result of the task"
+}
+```
+That should move us closer to the goal of computing (4 + 3) * 2."""
+
+
+def test_parser_returns_action_as_soon_as_it_closes():
+    parser = ActionStreamParser()
+    action = None
+    fed = 0
+    for i in range(0, len(REPLY), 5):
+        fed = i + 5
+        action = parser.feed(REPLY[i:i + 5])
+        if action is not None:
+            break
+
+    assert action == {"command_id": 1, "parameters": {"a": 4, "b": 3}}
+    assert parser.values["analysis"]["reasoning"] == "Start with the addition"
+    assert fed < REPLY.index("expected_outcome")
+
+
+@pytest.mark.asyncio
+async def test_streaming_dispatches_action_before_the_stream_ends():
+    client = FakeStreamingClient([REPLY], chunk_size=8, chunk_delay=0.002)
+    processor = make_processor(client, stream=True)
+
+    response = await processor.get_next_action()
+
+    assert response["action"]["command_id"] == 1
+    assert response["analysis"]["reasoning"] == "Start with the addition"
+    assert client.streams_finished == 0
+    assert processor.last_time_to_action is not None
+
+    result = await processor.execute_command(response["action"]["command_id"],
+                                             response["action"]["parameters"],
+                                             response["analysis"]["reasoning"])
+    assert result["value"] == 7
+
+    await processor.aclose()
+    assert client.streams_finished == 1
+    assert processor.last_usage["completion_tokens"] == len(REPLY) // 4
+
+
+@pytest.mark.asyncio
+async def test_streaming_falls_back_to_full_parse_without_an_action_object():
+    reply = json.dumps({"analysis": {"reasoning": "flat"}, "action": "wait"})
+    client = FakeStreamingClient([reply, reply])
+    processor = make_processor(client, stream=True)
+
+    response = await processor.get_next_action()
+
+    # The full reply is parsed, but an action without a command is never executed
+    assert response["action"]["command_id"] is None
+    assert "no action with a command_id" in response["error"]
+    assert len(client.calls) == 2
+
+
+REASONING_LAST = json.dumps({
+    "action": {"command_id": 1, "parameters": {"a": 4, "b": 3}},
+    "analysis": {"current_situation": "Start", "history_consideration": "None",
+                 "reasoning": "Written after the action"},
+})
+
+
+@pytest.mark.asyncio
+async def test_step_records_reasoning_that_streams_after_the_action():
+    client = FakeStreamingClient([REASONING_LAST, REASONING_LAST], chunk_size=8, chunk_delay=0.002)
+    processor = make_processor(client, stream=True)
+
+    await processor.step()
+    await processor.step()
+
+    assert [e.context for e in processor.execution_history] == ["Written after the action"] * 2
+    await processor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_aclose_waits_for_every_stream_tail():
+    from core.rate_limiter import RateLimiter
+
+    limiter = RateLimiter(tokens_per_minute=100_000)
+    recorded = []
+    limiter.record_usage = lambda estimated, actual: recorded.append(actual)
+    client = FakeStreamingClient([REPLY, REPLY], chunk_size=8)
+    processor = make_processor(client, stream=True, rate_limiter=limiter)
+    # Streams stay open after the action until released
+    release = asyncio.Event()
+    chunks = client._chunks
+
+    async def held_chunks(content, usage):
+        async for chunk in chunks(content[:-1], usage):
+            if not chunk.choices:
+                await release.wait()
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[-1]))],
+                                      usage=None)
+            yield chunk
+
+    client._chunks = held_chunks
+    await processor.get_next_action()
+    await processor.get_next_action()
+    assert len(processor._stream_tails) == 2
+
+    release.set()
+    await processor.aclose()
+    assert client.streams_finished == 2
+    assert not processor._stream_tails
+    # Streamed requests correct the token bucket like non-streamed ones
+    assert len(recorded) == 2 and all(actual > 0 for actual in recorded)
+
+
+@pytest.mark.parametrize("action", [{"command_id": 99, "parameters": {}}, {"parameters": {"a": 1}}])
+@pytest.mark.asyncio
+async def test_unusable_streamed_action_is_retried_not_executed(action):
+    bad = json.dumps({"action": action, "analysis": {"reasoning": "guess"}})
+    client = FakeStreamingClient([bad, REPLY], chunk_size=8)
+    processor = make_processor(client, stream=True)
+
+    response, result = await processor.step()
+
+    assert response["action"]["command_id"] == 1
+    assert result["value"] == 7
+    # The retry shows the model its whole previous reply
+    retry = client.calls[1]["messages"]
+    assert retry[-2] == {"role": "assistant", "content": bad}
+    assert "could not be used" in retry[-1]["content"]
+    await processor.aclose()
@@ -0,0 +1,140 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.json_repair import JSONRepairError, repair_json
+from core.llm_processor import NO_ACTION
+from tests.fakes import FakeAsyncClient, action_reply, tool_call_reply
+from tests.test_llm_processor import make_processor
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('Sure!\n```json\n{"a": 1, "b": [1, 2,],}\n```\nHope this helps.', {"a": 1, "b": [1, 2]}),
+    ('I will add. {"action": {"command_id": 1}} Done.', {"action": {"command_id": 1}}),
+    ('{"action": {"command_id": 1, "parameters": {\n  // Parameters\n  "a": 4}}}',
+     {"action": {"command_id": 1, "parameters": {"a": 4}}}),
+    ('{"action": {"command_id": 1, "parameters": {"a": 4, "b": 3}}, "analysis": {"reasoning": "cut',
+     {"action": {"command_id": 1, "parameters": {"a": 4, "b": 3}}, "analysis": {"reasoning": "cut"}}),
+    ('{"action": {"command_id": 1}, "analysis": {"reas', {"action": {"command_id": 1}}),
+])
+def test_repair_json(text, expected):
+    assert repair_json(text) == expected
+
+
+def test_repair_json_without_json():
+    with pytest.raises(JSONRepairError):
+        repair_json("I am not sure what to do next.")
+
+
+@pytest.mark.parametrize("text", [
+    '{"action": {"command_id": 1, "parameters": {"a": 4, "b":',
+    '{"analysis": {"reasoning": "add"}, "action": {"command_id": 12',
+    '{"actions": [{"command_id": 1, "parameters": {}}, {"command_id": 2, "para',
+])
+def test_repair_json_does_not_cut_into_complete_keys(text):
+    # Without the restriction these would repair into actions with lost parameters
+    assert repair_json(text)
+    with pytest.raises(JSONRepairError, match="cut off inside"):
+        repair_json(text, complete_keys=("action", "actions"))
+    with pytest.raises(JSONRepairError, match="cut off"):
+        repair_json(text, allow_truncation=False)
+
+
+@pytest.mark.asyncio
+async def test_reply_cut_off_inside_the_action_is_retried():
+    client = FakeAsyncClient(['{"action": {"command_id": 1, "parameters": {"a": 4, "b":',
+                              action_reply(1, {"a": 4, "b": 3})])
+    processor = make_processor(client)
+
+    response, result = await processor.step()
+
+    assert result["value"] == 7
+    assert len(client.calls) == 2
+    assert 'cut off inside "action"' in client.calls[1]["messages"][-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_unusable_reply_is_retried_once_with_the_problem():
+    client = FakeAsyncClient(["I think adding is best.", action_reply(1, {"a": 4, "b": 3})])
+    processor = make_processor(client)
+
+    response, result = await processor.step()
+
+    assert result["value"] == 7
+    assert len(client.calls) == 2
+    retry = client.calls[1]["messages"]
+    assert retry[-2] == {"role": "assistant", "content": "I think adding is best."}
+    assert "could not be used" in retry[-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_failed_parse_records_a_no_op_instead_of_running_a_command():
+    calls = []
+    client = FakeAsyncClient(["no json", action_reply(99)])
+    processor = make_processor(client)
+    original_add = processor.implementations['add']
+
+    async def tracked_add(params):
+        calls.append(params)
+        return await original_add(params)
+    processor.register_function('add', tracked_add)
+
+    response, result = await processor.step()
+
+    assert response["action"]["command_id"] is None
+    assert "Unknown command_id: 99" in response["error"]
+    assert result["status"] == "error"
+    assert calls == []
+    entry = processor.execution_history[-1]
+    assert (entry.command_id, entry.command_name, entry.status) == (None, NO_ACTION, "failed")
+    # The failed step is visible to the model in the next prompt
+    assert NO_ACTION in processor.generate_prompt()
+
+
+@pytest.mark.asyncio
+async def test_tools_mode_sends_commands_and_reads_tool_calls():
+    client = FakeAsyncClient([tool_call_reply(("add", {"a": 4, "b": 3}), content="Add first.")])
+    processor = make_processor(client, output_mode="tools")
+
+    response, result = await processor.step()
+
+    request = client.calls[0]
+    assert [tool["function"]["name"] for tool in request["tools"]] == ["add", "multiply", "submit_result"]
+    assert request["tools"][0]["function"]["parameters"]["type"] == "object"
+    assert request["tool_choice"] == "required" and request["parallel_tool_calls"] is False
+    assert response["action"] == {"command_id": 1, "parameters": {"a": 4, "b": 3}}
+    assert response["analysis"]["reasoning"] == "Add first."
+    assert result["value"] == 7
+    assert "call the tool" in processor.generate_prompt()
+
+
+@pytest.mark.asyncio
+async def test_tools_mode_plans_and_repairs_arguments():
+    client = FakeAsyncClient([tool_call_reply(("add", '{"a": 4, "b": 3,}'), ("multiply", {"a": 7, "b": 2}))])
+    processor = make_processor(client, output_mode="tools", multi_action=True)
+
+    response, result = await processor.step()
+
+    assert [a["command_id"] for a in response["actions"]] == [1, 2]
+    assert result["value"] == 14
+    assert "parallel_tool_calls" not in client.calls[0]
+
+
+@pytest.mark.asyncio
+async def test_json_schema_mode_constrains_the_reply():
+    client = FakeAsyncClient([action_reply(1, {"a": 4, "b": 3})], default="- knowledge")
+    processor = make_processor(client, output_mode="json_schema", summary_interval=1,
+                               background_summary=False)
+
+    await processor.step()
+
+    response_format = client.calls[0]["response_format"]
+    schema = response_format["json_schema"]["schema"]
+    options = schema["properties"]["action"]["anyOf"]
+    assert [o["properties"]["command_id"]["enum"] for o in options] == [[1], [2], [3]]
+    assert list(options[0]["properties"]["parameters"]["properties"]) == ["a", "b"]
+    # Summaries stay plain text requests
+    assert "response_format" not in client.calls[1]
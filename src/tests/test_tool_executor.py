@@ -0,0 +1,86 @@
+import pytest
+import asyncio
+import json
+import sys
+import os
+import threading
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.command_registry import CommandRegistry
+from tests.fakes import FakeAsyncClient
+from tests.test_llm_processor import make_processor, CONFIG_DIR
+
+
+def process_id(params):
+    # Module level so that it can be sent to a process pool
+    return {"status": "success", "value": os.getpid()}
+
+
+@pytest.mark.asyncio
+async def test_slow_sync_tool_does_not_block_the_event_loop():
+    slow = make_processor(FakeAsyncClient())
+    fast = make_processor(FakeAsyncClient())
+
+    # The slow tool only returns once the other agent got its steps done
+    fast_done = threading.Event()
+
+    def slow_add(params):
+        waited = fast_done.wait(timeout=5)
+        return {"status": "success", "value": params['a'] + params['b'], "thread": threading.get_ident(),
+                "fast_done": waited}
+    slow.register_function('add', slow_add)
+
+    async def fast_agent():
+        for i in range(5):
+            await fast.execute_command(1, {"a": i, "b": 1}, "fast")
+        fast_done.set()
+
+    slow_result, _ = await asyncio.gather(
+        slow.execute_command(1, {"a": 4, "b": 3}, "slow"), fast_agent()
+    )
+
+    assert slow_result["value"] == 7
+    assert slow_result["thread"] != threading.get_ident()
+    # On the event loop the tool would have blocked the other agent until its timeout
+    assert slow_result["fast_done"]
+    assert len(fast.execution_history) == 5
+    await slow.aclose()
+    await fast.aclose()
+
+
+@pytest.mark.asyncio
+async def test_executor_from_functions_json_and_register_function(tmp_path):
+    with open(os.path.join(CONFIG_DIR, 'functions.json')) as f:
+        functions = json.load(f)
+    functions["functions"][0]["executor"] = "inline"
+    functions_file = tmp_path / "functions.json"
+    functions_file.write_text(json.dumps(functions))
+
+    from core.llm_processor import LLMProcessor
+    processor = LLMProcessor(str(functions_file), os.path.join(CONFIG_DIR, 'goal.yaml'),
+                             client=FakeAsyncClient(), process_pool_size=1)
+
+    def add(params):
+        return {"status": "success", "value": threading.get_ident()}
+    processor.register_function('add', add)
+    processor.register_function('multiply', process_id, executor="process")
+
+    assert (await processor.execute_command(1, {"a": 1, "b": 2}, ""))["value"] == threading.get_ident()
+    assert (await processor.execute_command(2, {"a": 1, "b": 2}, ""))["value"] != os.getpid()
+
+    await processor.aclose()
+    assert processor.tool_executor._pools == {}
+
+
+def test_invalid_executors_are_rejected():
+    with pytest.raises(ValueError, match="Unknown executor"):
+        CommandRegistry({"functions": [{"id": 1, "name": "a", "executor": "gpu"}]})
+
+    processor = make_processor(FakeAsyncClient())
+
+    async def add(params):
+        return {"status": "success"}
+    with pytest.raises(ValueError, match="event loop"):
+        processor.register_function('add', add, executor="thread")
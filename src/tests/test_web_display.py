@@ -0,0 +1,105 @@
+import pytest
+import sys
+import os
+import json
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from core.web_display import EventHub, PromptDisplay, apply_prompt_diff, prompt_diff
+from tests.fakes import FakeAsyncClient, action_reply
+from tests.test_llm_processor import make_processor
+
+
+def parse_sse(message: str):
+    lines = message.strip().split("\n")
+    return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+
+@pytest.mark.parametrize("old,new", [
+    ("", "abc"),
+    ("abc", ""),
+    ("header [1, 2] footer", "header [1, 2, 3] footer"),
+    ("aaaa", "aa"),
+    ("same", "same"),
+    ("history: x\nend", "history: y\nend"),
+])
+def test_prompt_diff_round_trip(old, new):
+    diff = prompt_diff(old, new)
+    assert apply_prompt_diff(old, diff) == new
+    assert len(diff["text"]) <= len(new)
+
+
+def test_prompt_diff_finds_the_changed_span_of_a_long_prompt():
+    old = "x" * 100_000 + "[1, 2]" + "y" * 100_000
+    new = "x" * 100_000 + "[1, 2, 3]" + "y" * 100_000
+    assert prompt_diff(old, new) == {"start": 100_005, "suffix": 100_001, "text": ", 3"}
+
+
+def test_shared_display_rejects_a_conflicting_headless_flag(monkeypatch):
+    from core import web_display
+
+    display = PromptDisplay(port=5123, headless=True)
+    monkeypatch.setitem(web_display._shared_displays, 5123, display)
+    assert web_display.get_shared_display(5123, headless=True) is display
+    with pytest.raises(ValueError, match="headless=True"):
+        web_display.get_shared_display(5123, headless=False)
+
+
+def test_subscribers_get_snapshot_then_diffs():
+    hub = EventHub()
+    channel = hub.channel()
+    channel.prompt("static prefix\n[]")
+
+    stream = hub.stream(channel.name, heartbeat=0.01)
+    event, data = parse_sse(next(stream))
+    assert event == "snapshot" and data["prompt"] == "static prefix\n[]"
+
+    channel.prompt("static prefix\n[1]")
+    event, diff = parse_sse(next(stream))
+    assert event == "prompt"
+    assert diff["text"] == "1"
+    assert apply_prompt_diff(data["prompt"], diff) == "static prefix\n[1]"
+
+    channel.event("result", step=1)
+    assert parse_sse(next(stream))[0] == "result"
+    assert next(stream) == ": keep-alive\n\n"
+
+    stream.close()
+    assert hub._subscribers[channel.name] == []
+
+
+def test_overflowed_subscriber_is_resynchronized():
+    hub = EventHub(max_queue=2)
+    channel = hub.channel("a")
+    stream = hub.stream("a", heartbeat=0.01)
+    next(stream)
+    for i in range(5):
+        channel.prompt(f"prompt {i}")
+    event, data = parse_sse(next(stream))
+    assert event == "snapshot" and data["prompt"] == "prompt 4"
+    stream.close()
+
+
+@pytest.mark.asyncio
+async def test_processors_publish_to_their_own_channels():
+    # The display is not started: events still go through the hub
+    display = PromptDisplay(headless=True)
+    first = make_processor(FakeAsyncClient([action_reply(1, {"a": 4, "b": 3})]), display=display)
+    second = make_processor(FakeAsyncClient([action_reply(2, {"a": 7, "b": 2})]),
+                            display=display, ui_channel="multiplier")
+    assert display.hub.channels() == ["agent-1", "multiplier"]
+
+    stream = display.hub.stream("multiplier", heartbeat=0.01)
+    next(stream)
+    await first.step()
+    await second.step()
+
+    events = [parse_sse(next(stream)) for _ in range(3)]
+    assert [event for event, _ in events] == ["prompt", "action", "result"]
+    assert events[1][1]["action"]["command_id"] == 2
+    assert events[2][1]["command"] == "multiply" and events[2][1]["result"]["value"] == 14
+    # The latest prompt of each processor is kept for /prompt and new subscribers
+    prompt = first.generate_prompt()
+    assert display.hub.prompt("agent-1") == prompt
+    stream.close()